@@ -1,3 +1,30 @@
-from ._version import get_versions
-__version__ = get_versions()['version']
-del get_versions
+try:
+    # Written by setup.py when the package is built, so that an installed package never runs git to find its version
+    from ._version_static import __version__
+except ImportError:
+    # A development checkout, whose version is only computed when asked for, since computing it runs git
+    pass
+
+
+def get_version():
+    """
+    Get the version of the package. In a development checkout, it is computed from git the first time.
+
+    Returns : str
+    -------
+        The version
+    """
+    version = globals().get("__version__")
+    if version is None:
+        from ._version import get_versions
+        version = get_versions()['version']
+        globals()["__version__"] = version
+    return version
+
+
+def __getattr__(name):
+    # Module __getattr__ is only called on Python 3.7 or newer. On older versions, a development checkout has no
+    # __version__ attribute until get_version() is called.
+    if name == "__version__":
+        return get_version()
+    raise AttributeError("module '{0}' has no attribute '{1}'".format(__name__, name))
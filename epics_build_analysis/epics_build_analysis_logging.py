@@ -1,18 +1,81 @@
 import os
+import errno
+import atexit
 import logging
+import logging.handlers
 
 try:
-    os.makedirs("logs")
-except os.error as err:
-    # It's OK if the log directory exists. This is to be compatible with Python 2.7
-    if err.errno != os.errno.EEXIST:
-        raise err
-
-logging.basicConfig(level=logging.INFO, filename="logs/epics_build_analysis.log",
-                    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-
-# Override the basic configs for cleaner console output
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.DEBUG)
-console_handler.setFormatter(logging.Formatter("%(message)s"))
-logger = logging.getLogger('').addHandler(console_handler)
+    import queue
+except ImportError:
+    import Queue as queue
+
+_queue_handler = None
+_listener = None
+
+
+def configure_logging(log_dir="logs", console_level=logging.DEBUG, console_stream=None):
+    """
+    Log to '<log_dir>/epics_build_analysis.log', and to the console.
+
+    The log records are put in a queue, and written to the log file and to the console by a background thread, so that
+    logging does not slow down the analysis when the log file is on a slow filesystem, e.g. AFS.
+
+    This is only called by the command line entry point, so that importing the package neither creates the log
+    directory nor changes the logging configuration of the importing application.
+
+    Parameters
+    ----------
+    log_dir : str
+        The directory to write the log file to
+    console_level : int
+        The lowest level of the records to write to the console, e.g. logging.WARNING to only show the problems
+    console_stream : file
+        The stream to write the console log records to, e.g. one keeping them apart from a progress status line. If
+        None, sys.stderr is used.
+    """
+    global _queue_handler, _listener
+    if _listener is not None:
+        return
+
+    try:
+        os.makedirs(log_dir)
+    except os.error as err:
+        # It's OK if the log directory exists. This is to be compatible with Python 2.7
+        if err.errno != errno.EEXIST:
+            raise err
+
+    file_handler = logging.FileHandler(os.path.join(log_dir, "epics_build_analysis.log"))
+    file_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+    # Override the basic configs for cleaner console output
+    console_handler = logging.StreamHandler(console_stream)
+    console_handler.setLevel(console_level)
+    console_handler.setFormatter(logging.Formatter("%(message)s"))
+
+    log_queue = queue.Queue(-1)
+    root_logger = logging.getLogger('')
+    root_logger.setLevel(logging.INFO)
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    root_logger.addHandler(_queue_handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(flush_logging)
+
+
+def flush_logging():
+    """
+    Write all the queued log records, and stop the background logging thread.
+
+    This is called when the program exits. Logging can be configured again afterwards.
+    """
+    global _queue_handler, _listener
+    if _listener is None:
+        return
+
+    logging.getLogger('').removeHandler(_queue_handler)
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _queue_handler = None
+    _listener = None
@@ -0,0 +1,14 @@
+import sys
+
+if sys.version_info < (3, 7):
+    # Module __getattr__ is only called on Python 3.7 or newer, so older versions import the analyzer right away
+    from epics_build_analysis_launcher.build_analyzer import BuildAnalyzer
+
+
+def __getattr__(name):
+    # The analyzer is only imported when used, so that importing a submodule, e.g. to run the command line, stays fast
+    if name == "BuildAnalyzer":
+        from epics_build_analysis_launcher.build_analyzer import BuildAnalyzer
+        globals()["BuildAnalyzer"] = BuildAnalyzer
+        return BuildAnalyzer
+    raise AttributeError("module '{0}' has no attribute '{1}'".format(__name__, name))
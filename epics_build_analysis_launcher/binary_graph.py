@@ -0,0 +1,216 @@
+import os
+import sys
+import mmap
+import struct
+from array import array
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+MAGIC = b"EBAGRAPH"
+FORMAT_VERSION = 1
+
+# magic, format version, flags, node count, edge count, and the file offsets of the string offsets, the string data,
+# the CSR offsets and the CSR targets sections
+HEADER = struct.Struct("<8sIIQQQQQQ")
+SECTION_ALIGNMENT = 8
+
+# Set in the header flags if the dependencies already implied by other dependencies were left out of the graph
+FLAG_TRANSITIVE_REDUCTION = 0x1
+
+
+def _to_little_endian_bytes(typecode, values):
+    values = array(typecode, values)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _pad(size):
+    return b"\0" * (-size % SECTION_ALIGNMENT)
+
+
+def write_binary_graph(filename, data, transitive_reduction=False):
+    """
+    Write a dependency graph in a compact binary format, meant to be memory-mapped by its consumers.
+
+    The file consists of a fixed-size header and four sections of little-endian arrays, each aligned to 8 bytes:
+
+    * the string offsets (uint64, node count + 1), delimiting the UTF-8 name of each node in the string data
+    * the string data, with the node names sorted, so that a node can be found by a binary search
+    * the CSR offsets (uint64, node count + 1), delimiting the direct dependencies of each node in the CSR targets
+    * the CSR targets (uint32, edge count), the indexes of the direct dependencies of each node
+
+    Parameters
+    ----------
+    filename : str
+        The name of the file to produce
+    data : dict
+        A dictionary of nodes as keys, and for each key, a list of the nodes it depends on
+    transitive_reduction : bool
+        True if the dependencies already implied by other dependencies were left out of the data, which is recorded in
+        the header flags
+    """
+    names = set(data.keys())
+    for deps in data.values():
+        names.update(deps)
+    names = sorted(names)
+    index_of = dict((name, i) for i, name in enumerate(names))
+
+    encoded = [name.encode("utf-8") for name in names]
+    string_offsets = [0]
+    for name in encoded:
+        string_offsets.append(string_offsets[-1] + len(name))
+
+    csr_offsets = [0]
+    csr_targets = []
+    for name in names:
+        targets = OrderedDict((index_of[dep], None) for dep in data.get(name, ()))
+        csr_targets.extend(targets)
+        csr_offsets.append(len(csr_targets))
+
+    sections = [
+        _to_little_endian_bytes("Q", string_offsets),
+        b"".join(encoded),
+        _to_little_endian_bytes("Q", csr_offsets),
+        _to_little_endian_bytes("I", csr_targets),
+    ]
+    positions = []
+    position = HEADER.size
+    for section in sections:
+        positions.append(position)
+        position += len(section) + len(_pad(len(section)))
+
+    flags = FLAG_TRANSITIVE_REDUCTION if transitive_reduction else 0
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, flags, len(names), len(csr_targets), *positions)
+    temp_filename = "{0}.{1}.tmp".format(filename, os.getpid())
+    with open(temp_filename, 'wb') as output_file:
+        output_file.write(header)
+        for section in sections:
+            output_file.write(section)
+            output_file.write(_pad(len(section)))
+    os.replace(temp_filename, filename)
+
+
+class BinaryGraph:
+    """
+    A read-only, memory-mapped view of a dependency graph written by write_binary_graph.
+
+    Opening the file only reads its header; the arrays are used in place, as NumPy views if NumPy is installed, or as
+    memoryviews otherwise. Without NumPy, a big-endian host reads byte-swapped copies of the arrays instead. The node
+    names are only decoded when asked for.
+    """
+    def __init__(self, filename):
+        with open(filename, 'rb') as graph_file:
+            self._mmap = mmap.mmap(graph_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, flags, self.node_count, self.edge_count, string_offsets_pos, string_data_pos, csr_offsets_pos, \
+            csr_targets_pos = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError("'{0}' is not a binary dependency graph file.".format(filename))
+        if version != FORMAT_VERSION:
+            self.close()
+            raise ValueError("'{0}' has the unsupported binary graph format version {1}.".format(filename, version))
+
+        self.transitive_reduction = bool(flags & FLAG_TRANSITIVE_REDUCTION)
+        self._string_data_pos = string_data_pos
+        self.string_offsets = self._view("<u8", "Q", string_offsets_pos, self.node_count + 1)
+        self.csr_offsets = self._view("<u8", "Q", csr_offsets_pos, self.node_count + 1)
+        self.csr_targets = self._view("<u4", "I", csr_targets_pos, self.edge_count)
+
+    def _view(self, dtype, typecode, position, count):
+        if np is not None:
+            return np.frombuffer(self._mmap, dtype=np.dtype(dtype), count=count, offset=position)
+        size = array(typecode).itemsize
+        if sys.byteorder != "little":
+            # The arrays cannot be used in place on a big-endian host, so they are decoded into swapped copies
+            values = array(typecode, self._mmap[position:position + count * size])
+            values.byteswap()
+            return values
+        return memoryview(self._mmap)[position:position + count * size].cast(typecode)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.node_count
+
+    def close(self):
+        # The views must be released before the memory map can be closed
+        self.string_offsets = self.csr_offsets = self.csr_targets = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def name(self, index):
+        """
+        Get the name of a node.
+
+        Parameters
+        ----------
+        index : int
+            The index of the node
+
+        Returns : str
+        -------
+            The 'name/version' identifier of the node
+        """
+        start = self._string_data_pos + int(self.string_offsets[index])
+        end = self._string_data_pos + int(self.string_offsets[index + 1])
+        return self._mmap[start:end].decode("utf-8")
+
+    def find(self, name):
+        """
+        Find the index of a node by a binary search over the sorted names.
+
+        Parameters
+        ----------
+        name : str
+            The 'name/version' identifier of the node
+
+        Returns : int
+        -------
+            The index of the node, or -1 if the graph does not have the node
+        """
+        low, high = 0, self.node_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.name(middle) < name:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < self.node_count and self.name(low) == name else -1
+
+    def successors(self, index):
+        """
+        Get the direct dependencies of a node.
+
+        Parameters
+        ----------
+        index : int
+            The index of the node
+
+        Returns
+        -------
+            The indexes of the node's direct dependencies, as a view into the file
+        """
+        return self.csr_targets[int(self.csr_offsets[index]):int(self.csr_offsets[index + 1])]
+
+    def to_dict(self):
+        """
+        Decode the whole graph.
+
+        Returns : OrderedDict
+        -------
+            A dictionary of node names as keys, and for each key, a list of the names of its direct dependencies
+        """
+        names = [self.name(i) for i in range(self.node_count)]
+        return OrderedDict((names[i], [names[t] for t in self.successors(i)]) for i in range(self.node_count))
@@ -0,0 +1,957 @@
+import os
+import glob
+import errno
+from collections import OrderedDict, defaultdict
+
+from epics_build_analysis.epics_build_analysis_logging import logging
+logger = logging.getLogger(__name__)
+
+from epics_build_analysis_launcher.epics_item import Item, ItemType
+from epics_build_analysis_launcher.dependency_graph import collapse_versions, get_module_name, transitive_reduction
+from epics_build_analysis_launcher.graph_rendering import generate_graph, render_graph, write_svg
+from epics_build_analysis_launcher.module_listing import EPICS_SITE_TOP, get_epics_modules_top
+from epics_build_analysis_launcher.versions import module_sort_key, VersionIndex
+from epics_build_analysis_launcher.timings import Timings
+
+PACKAGE_TOP = os.path.join('/', "afs", "slac", "g", "lcls", "package")
+
+# The files of the configure directory of a module version which its dependencies are parsed from
+_DEPENDENCY_FILE_PATTERNS = ("RELEASE*", "CONFIG_SITE*")
+
+
+def _create_directory(dir_name):
+    try:
+        os.makedirs(dir_name)
+    except os.error as err:
+        # It's OK if the output directory exists. This is to be compatible with Python 2.7
+        if err.errno != errno.EEXIST:
+            raise err
+
+
+def _get_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _list_directories(path):
+    """
+    List the subdirectories of a directory.
+
+    Parameters
+    ----------
+    path : str
+        The directory to list
+
+    Returns : list
+    -------
+        The names of the subdirectories, or None if the directory could not be listed, e.g. if it was just removed
+    """
+    try:
+        with os.scandir(path) as entries:
+            return [entry.name for entry in entries if entry.is_dir()]
+    except OSError:
+        return None
+
+
+def _get_dependency_file_mtimes(item, previous=None):
+    """
+    Get the modification times of the configure directory of an item, and of its dependency files, which change when
+    the dependency files are edited, added or removed.
+
+    Parameters
+    ----------
+    item : Item
+        The item
+    previous : tuple
+        The modification times returned for the item the previous time, whose list of dependency files is reused if
+        the configure directory did not change, to save listing it
+
+    Returns : tuple
+    -------
+        The modification time of the configure directory, and the path and the modification time of each dependency
+        file, in sorted order
+    """
+    configure_dir = os.path.join(item.path, "configure")
+    configure_dir_mtime = _get_mtime(configure_dir)
+    if previous is not None and previous[0] == configure_dir_mtime:
+        filenames = [filename for filename, _ in previous[1]]
+    else:
+        filenames = sorted(filename for pattern in _DEPENDENCY_FILE_PATTERNS
+                           for filename in glob.glob(os.path.join(configure_dir, pattern)))
+    return configure_dir_mtime, tuple((filename, _get_mtime(filename)) for filename in filenames)
+
+
+def discover_items(top, item_type, timings, mtimes=None, names=None):
+    """
+    Find the items of a root directory, laid out as '<top>/<name>/<version>', e.g. the modules directory.
+
+    Parameters
+    ----------
+    top : str
+        The root directory
+    item_type : ItemType
+        The type of the items in the root directory
+    timings : Timings
+        The timings to add the directory listing times to
+    mtimes : dict
+        A dictionary to record the modification time of each directory listed in, keyed by its path, to find out later
+        whether the directory changed. If None, the modification times are not recorded.
+    names : set
+        A set to add the names of the root directory to as soon as it is listed, before the first item is yielded. If
+        None, the names are not recorded.
+
+    Yields : Item
+    -------
+        Each item, as soon as the directory of its name is listed
+    """
+    with timings.measure("discovery", top) as measurement:
+        # The modification time is read before the listing, so that a change during the listing is not missed
+        if mtimes is not None:
+            mtimes[top] = _get_mtime(top)
+        top_names = next(os.walk(top))[1]
+        measurement.count = 0
+    if names is not None:
+        names.update(top_names)
+    for name in top_names:
+        with timings.measure("discovery", os.path.join(top, name)) as measurement:
+            if mtimes is not None:
+                mtimes[os.path.join(top, name)] = _get_mtime(os.path.join(top, name))
+            versions = next(os.walk(os.path.join(top, name)))[1]
+            measurement.count = len(versions)
+        for version in versions:
+            yield Item(path=os.path.join(top, name, version), name=name, version=version, item_type=item_type)
+
+
+def get_dependency_ids(item, epics_base_version, include_packages=True):
+    """
+    Get the 'name/version' identifiers of the modules and packages an item directly depends on.
+
+    Parameters
+    ----------
+    item : Item
+        The item to get the dependencies of
+    epics_base_version : str
+        The EPICS version being analyzed, which is the version of the base module
+    include_packages : bool
+        True to include the system packages the item depends on, False for the modules only
+
+    Returns : list
+    -------
+        The identifiers of the item's dependencies
+    """
+    dep_ids = []
+    for k, v in item.get_modules_dependencies().items():
+        if v == "BASE_MODULE_VERSION":
+            v = epics_base_version
+        dep_ids.append('{}/{}'.format(k, v))
+    if include_packages:
+        for k, v in item.get_package_dependencies().items():
+            dep_ids.append('{}/{}'.format(k, v))
+    return dep_ids
+
+
+def get_item_dependency_tree(item, universe, epics_base_version, unresolved=None):
+    """
+    Resolve the dependencies of an item, and of its dependencies, recursively.
+
+    Parameters
+    ----------
+    item : Item
+        The item to resolve the dependencies of
+    universe : dict
+        The items of the analyzed build, keyed by their 'name/version' identifier
+    epics_base_version : str
+        The EPICS version being analyzed, which is the version of the base module
+    unresolved : dict
+        For each kind of dependency, "module" or "package", a dictionary to add the identifiers of the dependencies
+        not found in the universe to, as keys, with the set of identifiers of the items needing them. If None, the
+        dependencies not found are not recorded.
+
+    Returns : dict
+    -------
+        A dictionary of the identifiers of the item and of the items it depends on as keys, and for each key, a list of
+        the identifiers of the dependencies of that item
+    """
+    deps = dict()
+    deps[str(item)] = []
+
+    for k, v in item.get_modules_dependencies().items():
+        try:
+            if v == "BASE_MODULE_VERSION":
+                v = epics_base_version
+
+            d = universe['{}/{}'.format(k, v)]
+            deps[str(item)].append(str(d))
+            deps.update(get_item_dependency_tree(d, universe, epics_base_version, unresolved))
+        except KeyError:
+            d = '{}/{}'.format(k, v)
+            deps[str(item)].append(d)
+            if unresolved is not None:
+                unresolved["module"][d].add(str(item))
+
+    for k, v in item.get_package_dependencies().items():
+        try:
+            d = universe['{}/{}'.format(k, v)]
+            deps[str(item)].append(str(d))
+            deps.update(get_item_dependency_tree(d, universe, epics_base_version, unresolved))
+        except KeyError:
+            d = '{}/{}'.format(k, v)
+            deps[str(item)].append(d)
+            if unresolved is not None:
+                unresolved["package"][d].add(str(item))
+    return deps
+
+
+class BuildAnalyzer:
+    """
+    The dependency analysis of an EPICS version, kept in memory, so that a long-running tool can answer many questions
+    and render many graphs without listing the build and parsing its dependency files again each time.
+
+    The analyzer owns the items of the build, i.e. the universe, whose parsed dependency files are cached by each item,
+    the resolved dependencies, and the query index built from them. Each of them is computed when first needed, e.g.
+
+        analyzer = BuildAnalyzer("R7.0.3.1-1.0")
+        analyzer.discover()
+        print(analyzer.dependents("asyn/R4.39-1.0.1", direct=True))
+        analyzer.render_module_graph("asyn/R4.39-1.0.1")
+    """
+    def __init__(self, epics_version, epics_site_top=EPICS_SITE_TOP, modules_top=None, ioc_top=None,
+                 package_top=PACKAGE_TOP, kernel_modules_top=None, output_dir="output", render_cache=None,
+                 layout_engine="dot", reduce_transitive_edges=False, track_changes=False, timings=None):
+        """
+        Parameters
+        ----------
+        epics_version : str
+            The EPICS version to analyze, which is also the version of its base module, e.g. "R7.0.3.1-1.0"
+        epics_site_top : str
+            The directory holding the EPICS versions
+        modules_top : str
+            The modules directory to analyze. If None, the modules directory of the EPICS version is analyzed.
+        ioc_top : str
+            The IOC directory, only listed to count its items. If None, the 'iocTop' directory next to the EPICS
+            version's directory is listed.
+        package_top : str
+            The system package directory, only listed to count its items
+        kernel_modules_top : str
+            The kernel driver directory, only listed to count its items. If None, the 'linuxKernel_Modules' directory
+            of the system package directory is listed.
+        output_dir : str
+            The directory to write the outputs to, in a subdirectory named after the EPICS version
+        render_cache : RenderCache
+            The cache of previous renderings. If None, the graphs are always rendered.
+        layout_engine : str
+            "dot" to render PNG images with graphviz, or "builtin" to write SVG images with the built-in layout engine
+        reduce_transitive_edges : bool
+            True to leave out the dependencies already implied by other dependencies from the resolved dependencies
+        track_changes : bool
+            True to record the modification times of the dependency files of each item when it is discovered or
+            parsed, so that poll() finds the changes made since. Otherwise, poll() only finds the changes made since it
+            was first called.
+        timings : Timings
+            The timings to record the discovery, parsing, resolution and rendering times, and the counts, in. If None,
+            they are recorded in timings of the analyzer's own.
+        """
+        self.epics_version = epics_version
+        self.modules_top = modules_top or get_epics_modules_top(epics_version, epics_site_top)
+        self.ioc_top = ioc_top or os.path.join(epics_site_top, epics_version, "..", "iocTop")
+        self.package_top = package_top
+        self.kernel_modules_top = kernel_modules_top or os.path.join(package_top, "linuxKernel_Modules")
+        self.output_dir = output_dir
+        self.render_cache = render_cache
+        self.layout_engine = layout_engine
+        self.reduce_transitive_edges = reduce_transitive_edges
+        self.track_changes = track_changes
+        self.timings = timings if timings is not None else Timings()
+
+        # The module versions of the build, keyed by their 'name/version' identifier
+        self.universe = OrderedDict()
+        # The resolved dependency trees of the module versions resolved so far, merged
+        self.data = OrderedDict()
+        # For each kind of dependency, the dependencies not found in the universe, and the items needing them
+        self.unresolved = {"module": defaultdict(set), "package": defaultdict(set)}
+        # The module versions whose dependency tree is entirely discovered
+        self._resolvable = set()
+        # While discover_modules() is listing the modules directory, the names of its modules whose versions may not
+        # all be in the universe yet, and the name of the module last added to the universe
+        self._undiscovered_names = set()
+        self._last_added_name = None
+        self._version_index = None
+        self._dependency_graph = None
+        # The modification times of the modules directory and of its module directories, keyed by their path
+        self._directory_mtimes = dict()
+        # The modification times of the dependency files of each module version, keyed by its identifier
+        self._dependency_file_mtimes = dict()
+
+    def get_output_path(self, *parts):
+        """
+        Get the path to an output of the analyzed EPICS version.
+
+        Parameters
+        ----------
+        parts : str
+            The path components below the EPICS version's output directory, e.g. "html"
+
+        Returns : str
+        -------
+            The path, e.g. 'output/<epics_version>/html'
+        """
+        return os.path.join(self.output_dir, self.epics_version, *parts)
+
+    def discover_modules(self):
+        """
+        Find the module versions of the modules directory, and count them once they are all found. The module
+        versions are not added to the universe; see add_item() and discover().
+
+        Yields : Item
+        -------
+            Each module version, as soon as the directory of its module is listed
+        """
+        module_count = 0
+        self._undiscovered_names = set()
+        self._last_added_name = None
+        for itm in discover_items(self.modules_top, ItemType.epics_module, self.timings,
+                                  mtimes=self._directory_mtimes, names=self._undiscovered_names):
+            module_count += 1
+            yield itm
+        self.timings.add_count("items_discovered", module_count, labels={"item_type": ItemType.epics_module.value})
+
+    def discover(self):
+        """
+        Find the module versions of the modules directory, and make them the universe. The module versions already
+        known are kept, with their parsed dependency files, so that discovering the build again is cheap.
+
+        Returns : tuple
+        -------
+            The sorted identifiers of the module versions added to the universe, and of the ones removed from it
+        """
+        universe = OrderedDict()
+        for itm in self.discover_modules():
+            module_id = str(itm)
+            universe[module_id] = self.universe.get(module_id, itm)
+            self._record_dependency_file_mtimes(universe[module_id])
+
+        self.end_discovery()
+
+        added_ids = sorted(set(universe) - set(self.universe), key=module_sort_key)
+        removed_ids = sorted(set(self.universe) - set(universe), key=module_sort_key)
+        for module_id in removed_ids:
+            self._dependency_file_mtimes.pop(module_id, None)
+        self.universe = universe
+        if added_ids or removed_ids:
+            self._invalidate()
+        return added_ids, removed_ids
+
+    def discover_other_items(self):
+        """
+        List the IOC, system package and kernel driver directories, which are not analyzed, to count their items.
+
+        Returns : OrderedDict
+        -------
+            The number of items of each item type
+        """
+        counts = OrderedDict()
+        for top, item_type in ((self.ioc_top, ItemType.epics_ioc), (self.package_top, ItemType.system_package),
+                               (self.kernel_modules_top, ItemType.kernel_driver)):
+            counts[item_type] = sum(1 for _ in discover_items(top, item_type, self.timings))
+            self.timings.add_count("items_discovered", counts[item_type], labels={"item_type": item_type.value})
+        return counts
+
+    def add_item(self, item):
+        """
+        Add an item to the universe, e.g. one found by discover_modules(). The items found by discover_modules() must
+        be added in the order they are found, until end_discovery() is called.
+
+        Parameters
+        ----------
+        item : Item
+            The item to add
+        """
+        self.universe[str(item)] = item
+        self._version_index = None
+        self._record_dependency_file_mtimes(item)
+        # The modules directory is listed module by module, so all the versions of the previous module are discovered
+        if item.name != self._last_added_name:
+            self._undiscovered_names.discard(self._last_added_name)
+            self._last_added_name = item.name
+
+    def _record_dependency_file_mtimes(self, item):
+        # The modification times are recorded before the dependency files are parsed, so that no change is missed
+        if self.track_changes and str(item) not in self._dependency_file_mtimes:
+            self._dependency_file_mtimes[str(item)] = _get_dependency_file_mtimes(item)
+
+    def end_discovery(self):
+        """
+        Record that all the module versions found by discover_modules() were added to the universe, so that the
+        dependencies still missing from it are missing from the build.
+        """
+        self._undiscovered_names = set()
+        self._last_added_name = None
+
+    def poll(self):
+        """
+        Find the module versions added to or removed from the modules directory, and the ones whose dependency files
+        changed, since they were discovered or last polled, and update the universe. Only the modification times of the
+        directories and of the dependency files are read, which is cheap even on file systems without change
+        notifications, such as AFS. The changed module versions are parsed again when next needed; see update() to
+        patch the resolved dependencies.
+
+        Returns : tuple
+        -------
+            The sorted identifiers of the module versions added, removed and changed
+        """
+        with self.timings.measure("polling") as measurement:
+            modules_top_mtime = _get_mtime(self.modules_top)
+            if modules_top_mtime is None:
+                # Rather than losing the whole universe on a transient file system error, wait for the next poll
+                logger.warning("Could not read the modules directory '%s'.", self.modules_top)
+                return [], [], []
+
+            ids_by_name = defaultdict(set)
+            for module_id, itm in self.universe.items():
+                ids_by_name[itm.name].add(module_id)
+            known_names = set(ids_by_name).union(os.path.basename(path) for path in self._directory_mtimes
+                                                 if path != self.modules_top)
+            names = known_names
+            if modules_top_mtime != self._directory_mtimes.get(self.modules_top):
+                listed_names = _list_directories(self.modules_top)
+                if listed_names is None:
+                    logger.warning("Could not list the modules directory '%s'.", self.modules_top)
+                    return [], [], []
+                # The modification time is only recorded once listed, so that a failed listing is tried again
+                self._directory_mtimes[self.modules_top] = modules_top_mtime
+                names = set(listed_names)
+
+            added_ids, removed_ids = set(), set()
+            for name in known_names - names:
+                self._directory_mtimes.pop(os.path.join(self.modules_top, name), None)
+                removed_ids.update(ids_by_name.get(name, ()))
+            for name in names:
+                path = os.path.join(self.modules_top, name)
+                mtime = _get_mtime(path)
+                if mtime is None or mtime == self._directory_mtimes.get(path):
+                    continue
+                versions = _list_directories(path)
+                if versions is None:
+                    # The module directory was removed since the modules directory was listed. The next poll lists
+                    # the modules directory again, which changed.
+                    continue
+                self._directory_mtimes[path] = mtime
+                module_ids = set("{0}/{1}".format(name, version) for version in versions)
+                added_ids.update(module_ids - ids_by_name.get(name, set()))
+                removed_ids.update(ids_by_name.get(name, set()) - module_ids)
+
+            changed_ids = set()
+            for module_id, itm in self.universe.items():
+                if module_id in removed_ids:
+                    continue
+                previous = self._dependency_file_mtimes.get(module_id)
+                mtimes = _get_dependency_file_mtimes(itm, previous)
+                self._dependency_file_mtimes[module_id] = mtimes
+                if previous is not None and mtimes != previous:
+                    changed_ids.add(module_id)
+            measurement.count = len(self.universe)
+
+        for module_id in removed_ids:
+            del self.universe[module_id]
+            self._dependency_file_mtimes.pop(module_id, None)
+        for module_id in sorted(added_ids, key=module_sort_key):
+            name, version = module_id.split('/')
+            itm = Item(path=os.path.join(self.modules_top, name, version), name=name, version=version,
+                       item_type=ItemType.epics_module)
+            self._dependency_file_mtimes[module_id] = _get_dependency_file_mtimes(itm)
+            self.universe[module_id] = itm
+        for module_id in changed_ids:
+            # A new item, which parses the dependency files again when they are next needed
+            itm = self.universe[module_id]
+            self.universe[module_id] = Item(path=itm.path, name=itm.name, version=itm.version, item_type=itm.item_type)
+        if added_ids or removed_ids or changed_ids:
+            self._version_index = None
+            self._resolvable = set()
+        return (sorted(added_ids, key=module_sort_key), sorted(removed_ids, key=module_sort_key),
+                sorted(changed_ids, key=module_sort_key))
+
+    def update(self, changed_ids, module_ids=None):
+        """
+        Patch the resolved dependencies, the unresolved dependencies and the query index in place after the universe
+        changed, e.g. after poll(). Only the module versions whose dependency tree includes a changed module version
+        are resolved again.
+
+        Parameters
+        ----------
+        changed_ids : iterable
+            The 'name/version' identifiers of the module versions added to, removed from, or changed in the universe
+        module_ids : iterable
+            The identifiers of the module versions to keep resolved, e.g. the selected ones, which must include their
+            dependencies. The other module versions resolved so far are left out. If None, all the module versions of
+            the universe are kept resolved.
+
+        Returns : list
+        -------
+            The sorted identifiers of the module versions resolved again, or for the first time
+        """
+        from epics_build_analysis_launcher.graph_query import DependencyGraph
+
+        module_ids = set(self.universe.keys() if module_ids is None else module_ids)
+        if self._dependency_graph is None:
+            self._dependency_graph = DependencyGraph(self.data)
+        graph = self._dependency_graph
+
+        affected_ids = set()
+        for module_id in changed_ids:
+            if module_id in graph.successors:
+                affected_ids.add(module_id)
+                affected_ids.update(graph.dependents(module_id))
+        stale_ids = set(module_id for module_id in self.data
+                        if module_id not in module_ids or module_id in affected_ids)
+        resolved_ids = sorted(module_ids.difference(self.data).union(stale_ids.intersection(module_ids)),
+                              key=module_sort_key)
+
+        for kind in ("module", "package"):
+            for dependency, item_ids in list(self.unresolved[kind].items()):
+                item_ids.difference_update(stale_ids)
+                if not item_ids:
+                    del self.unresolved[kind][dependency]
+
+        # The former dependencies of the stale module versions are left out of the graph unless still needed
+        orphan_ids = set(stale_ids)
+        for module_id in stale_ids:
+            orphan_ids.update(graph.successors.get(module_id, ()))
+            graph.set_dependencies(module_id, [])
+            del self.data[module_id]
+
+        for module_id in resolved_ids:
+            # The module version may already be resolved again as a dependency of another one
+            if module_id in self.data:
+                continue
+            for node, deps in self.resolve(module_id, keep=False).items():
+                self.data[node] = deps
+                graph.set_dependencies(node, deps)
+
+        for node in orphan_ids:
+            if node not in self.data:
+                graph.remove_node(node)
+        self.sort_data()
+        return resolved_ids
+
+    def _invalidate(self):
+        # The dependency trees may now resolve differently, so everything resolved is resolved again when needed
+        self.data = OrderedDict()
+        self.unresolved = {"module": defaultdict(set), "package": defaultdict(set)}
+        self._resolvable = set()
+        self._version_index = None
+        self._dependency_graph = None
+
+    def get_version_index(self):
+        """
+        Get the index of the versions of the universe's modules.
+
+        Returns : VersionIndex
+        -------
+            The version index, built when first needed after the universe changed
+        """
+        if self._version_index is None:
+            self._version_index = VersionIndex(self.universe.keys())
+        return self._version_index
+
+    def get_invalid_module_ids(self):
+        """
+        Get the module versions of the universe whose version tag is not a valid EPICS version tag.
+
+        Returns : list
+        -------
+            The sorted 'name/version' identifiers of the module versions with an invalid version tag
+        """
+        return self.get_version_index().get_invalid_module_ids()
+
+    def parse(self, item):
+        """
+        Parse the dependency files of an item, which the item keeps for the later lookups.
+
+        Parameters
+        ----------
+        item : Item
+            The item to parse the dependency files of
+
+        Returns : Item
+        -------
+            The item
+        """
+        with self.timings.measure("parsing", str(item)):
+            if self.track_changes:
+                self._dependency_file_mtimes[str(item)] = _get_dependency_file_mtimes(item)
+            item.get_modules_dependencies()
+            item.get_package_dependencies()
+        return item
+
+    def get_dependency_ids(self, module_id):
+        """
+        Get the 'name/version' identifiers of the modules and packages a module version directly depends on.
+
+        Parameters
+        ----------
+        module_id : str
+            The 'name/version' identifier of a module version of the universe
+
+        Returns : list
+        -------
+            The identifiers of the module version's dependencies
+        """
+        return get_dependency_ids(self.universe[module_id], self.epics_version)
+
+    def get_closure(self, module_ids):
+        """
+        Find the module versions that a set of module versions directly or transitively depend on.
+
+        Parameters
+        ----------
+        module_ids : iterable
+            The 'name/version' identifiers of the module versions to start from
+
+        Returns : set
+        -------
+            The identifiers of the given module versions, and of all the module versions of the universe they depend on
+        """
+        closure = set()
+        stack = list(module_ids)
+        while stack:
+            module_id = stack.pop()
+            if module_id in closure:
+                continue
+            closure.add(module_id)
+            stack.extend(dep_id for dep_id in self.get_dependency_ids(module_id) if dep_id in self.universe)
+        return closure
+
+    def select_modules(self, latest=None, since_version=None):
+        """
+        Select the module versions to analyze: the newest versions of each module, and all the module versions they
+        depend on. Only the dependency files of the selected module versions are parsed. The versions with an invalid
+        tag, e.g. 'master', cannot be ordered, so they are always selected.
+
+        Parameters
+        ----------
+        latest : int
+            The number of newest versions to select for each module. If None, select all the versions.
+        since_version : str
+            The oldest version tag to select. If None, select the versions regardless of their age.
+
+        Returns : list
+        -------
+            The identifiers of the selected module versions, in sorted order
+        """
+        if latest is None and since_version is None:
+            return sorted(self.universe.keys(), key=module_sort_key)
+
+        version_index = self.get_version_index()
+        roots = []
+        for name in version_index.get_modules():
+            if since_version is not None:
+                versions = version_index.get_versions_since(name, since_version)
+            else:
+                versions = version_index.get_versions(name)
+            if latest is not None:
+                versions = versions[-latest:]
+            roots.extend("{0}/{1}".format(name, version) for version in versions)
+        invalid_module_ids = version_index.get_invalid_module_ids()
+        if invalid_module_ids:
+            logger.info("Selected the %d module versions with an invalid version tag, which cannot be ordered.",
+                        len(invalid_module_ids))
+            roots.extend(invalid_module_ids)
+
+        selected = self.get_closure(roots)
+        logger.info("Selected %d module versions out of %d: %d matching versions, and %d of their dependencies.",
+                    len(selected), len(self.universe), len(roots), len(selected) - len(roots))
+        return sorted(selected, key=module_sort_key)
+
+    def find_undiscovered_dependency(self, module_id):
+        """
+        Find a module version of the dependency tree of a module version which is not discovered yet, if any, e.g.
+        while the modules directory is still being listed. The dependency trees without any are remembered, so that
+        each module version is only visited once.
+
+        Parameters
+        ----------
+        module_id : str
+            The 'name/version' identifier of a module version of the universe
+
+        Returns : str
+        -------
+            The identifier of a dependency not in the universe, or None if the whole dependency tree is discovered
+        """
+        visited = set()
+        stack = [module_id]
+        while stack:
+            dep_id = stack.pop()
+            if dep_id in self._resolvable or dep_id in visited:
+                continue
+            if dep_id not in self.universe:
+                # Only the modules of the modules directory not entirely added to the universe yet may still show up.
+                # The others, e.g. base when it is outside of the modules directory, are missing from the build.
+                if get_module_name(dep_id) in self._undiscovered_names:
+                    return dep_id
+                continue
+            visited.add(dep_id)
+            # The system packages are not in the modules directory
+            stack.extend(get_dependency_ids(self.universe[dep_id], self.epics_version, include_packages=False))
+        self._resolvable.update(visited)
+        return None
+
+    def resolve_discovered(self, items, keep=True):
+        """
+        Add the items found by discover_modules() to the universe as they are found, and resolve each module version as
+        soon as all the module versions of its dependency tree which may still be found are found. The module versions
+        waiting for a dependency which is not found at all are resolved last, without it.
+
+        Parameters
+        ----------
+        items : iterable
+            The items found by discover_modules(), in the order they are found
+        keep : bool
+            True to merge the dependency trees into the resolved dependencies, to query them later
+
+        Yields : tuple
+        -------
+            The 'name/version' identifier of each module version, and its dependency tree, as returned by resolve()
+        """
+        # The module versions waiting for a dependency, keyed by the name of the dependency's module
+        waiting = defaultdict(list)
+        for itm in items:
+            module_id = str(itm)
+            previous_name = self._last_added_name
+            self.add_item(itm)
+
+            # Check the module version again, and the ones waiting for a version of its module, or for a version of
+            # the previous module, which may now be missing from the build
+            candidates = [module_id] + waiting.pop(itm.name, [])
+            if previous_name is not None and previous_name != itm.name:
+                candidates.extend(waiting.pop(previous_name, []))
+            while candidates:
+                candidate_id = candidates.pop()
+                undiscovered_id = self.find_undiscovered_dependency(candidate_id)
+                if undiscovered_id is None:
+                    yield candidate_id, self.resolve(candidate_id, keep=keep)
+                else:
+                    waiting[get_module_name(undiscovered_id)].append(candidate_id)
+
+        # The discovery is over, so the dependencies still missing are unresolved
+        self.end_discovery()
+        for module_id in sorted((module_id for waiting_ids in waiting.values() for module_id in waiting_ids),
+                                key=module_sort_key):
+            yield module_id, self.resolve(module_id, keep=keep)
+
+    def resolve(self, module_id, keep=True):
+        """
+        Resolve the dependency tree of a module version. The dependencies not found in the universe are added to the
+        unresolved dependencies.
+
+        Parameters
+        ----------
+        module_id : str
+            The 'name/version' identifier of a module version of the universe
+        keep : bool
+            True to merge the dependency tree into the resolved dependencies, to query them later
+
+        Returns : dict
+        -------
+            The module version's dependency tree, as a dictionary of module names as keys, and for each key, a list of
+            names of the modules the current module depends on
+        """
+        with self.timings.measure("resolution", module_id):
+            module_dep_data = get_item_dependency_tree(self.universe[module_id], self.universe, self.epics_version,
+                                                       self.unresolved)
+            if self.reduce_transitive_edges:
+                # Each module's reduced dependencies only depend on its own dependency tree, so the reduced trees can
+                # still be merged into the complete data
+                module_dep_data = transitive_reduction(module_dep_data)
+        if keep:
+            self.data.update(module_dep_data)
+            self._dependency_graph = None
+        return module_dep_data
+
+    def get_dependency_tree(self, module_id):
+        """
+        Get the dependency tree of a module version from the resolved dependencies, without resolving it again.
+
+        Parameters
+        ----------
+        module_id : str
+            The 'name/version' identifier of a resolved module version
+
+        Returns : dict
+        -------
+            The module version's dependency tree, as returned by resolve()
+        """
+        tree = dict()
+        stack = [module_id]
+        while stack:
+            node = stack.pop()
+            if node in tree or node not in self.data:
+                continue
+            tree[node] = self.data[node]
+            # Visit the dependencies in the order resolve() does
+            stack.extend(reversed(self.data[node]))
+        return tree
+
+    def resolve_all(self, module_ids=None):
+        """
+        Resolve the dependency trees of module versions which are not resolved yet, and keep them.
+
+        Parameters
+        ----------
+        module_ids : iterable
+            The 'name/version' identifiers of the module versions to resolve. If None, all the module versions of the
+            universe are resolved.
+
+        Returns : OrderedDict
+        -------
+            The resolved dependencies of all the module versions resolved so far, sorted by module version
+        """
+        if module_ids is None:
+            module_ids = self.universe.keys()
+        for module_id in sorted(module_ids, key=module_sort_key):
+            # The dependency tree of each module version resolved so far includes its dependencies
+            if module_id not in self.data:
+                self.resolve(module_id)
+        self.sort_data()
+        return self.data
+
+    def sort_data(self):
+        """
+        Sort the resolved dependencies by module version, to keep the outputs in a stable order, whatever the order the
+        module versions were resolved in.
+        """
+        self.data = OrderedDict(sorted(self.data.items(), key=lambda entry: module_sort_key(entry[0])))
+
+    def get_dependency_graph(self):
+        """
+        Get the query index of the resolved dependencies. If no module version is resolved yet, the whole build is
+        discovered, if not done yet, and resolved first.
+
+        Returns : DependencyGraph
+        -------
+            The dependency graph, built when first needed after the resolved dependencies changed
+        """
+        from epics_build_analysis_launcher.graph_query import DependencyGraph
+
+        if self._dependency_graph is None:
+            if not self.universe:
+                self.discover()
+            if not self.data:
+                self.resolve_all()
+            self._dependency_graph = DependencyGraph(self.data)
+        return self._dependency_graph
+
+    def closure(self, module):
+        """
+        List all the direct and transitive dependencies of a module; see DependencyGraph.closure().
+        """
+        return self.get_dependency_graph().closure(module)
+
+    def dependents(self, module, direct=False):
+        """
+        List the modules depending on a module; see DependencyGraph.dependents().
+        """
+        return self.get_dependency_graph().dependents(module, direct=direct)
+
+    def why_depends(self, module, dependency, k=1):
+        """
+        Find the shortest dependency paths between two modules; see DependencyGraph.why_depends().
+        """
+        return self.get_dependency_graph().why_depends(module, dependency, k=k)
+
+    def search(self, prefix):
+        """
+        List the modules whose 'name/version' starts with a prefix; see DependencyGraph.search().
+        """
+        return self.get_dependency_graph().search(prefix)
+
+    def render_module_graph(self, module_id, module_dep_data=None):
+        """
+        Draw the dependency graph of a module version to '<output_dir>/<epics_version>/<name>/<version>_dependencies',
+        with the '.png' extension, or '.svg' with the built-in layout engine.
+
+        Parameters
+        ----------
+        module_id : str
+            The 'name/version' identifier of the module version
+        module_dep_data : dict
+            The module version's dependency tree, as returned by resolve(). If None, it is resolved.
+
+        Returns : str
+        -------
+            The path to the graph
+        """
+        if module_dep_data is None:
+            module_dep_data = self.resolve(module_id, keep=False)
+
+        name, version = module_id.split('/')
+        path = self.get_output_path(name)
+        _create_directory(os.path.abspath(path))
+
+        graph_name = version + "_dependencies"
+        if self.layout_engine == "builtin":
+            with self.timings.measure("rendering", module_id):
+                graph_filename = write_svg(module_dep_data, graph_name, path, universe=self.universe)
+            self.timings.add_count("graphs_rendered")
+            logger.info("Module '%s': Created the dependency graph '%s'.", name, graph_name + ".svg")
+            return graph_filename
+
+        with self.timings.measure("dot_generation", module_id):
+            module_dep_graph = generate_graph(module_dep_data, universe=self.universe, format='png')
+        with self.timings.measure("rendering", module_id):
+            cached = render_graph(module_dep_graph, graph_name, path, self.render_cache)
+        if cached:
+            self.timings.add_count("graphs_reused")
+            logger.info("Module '%s': Reused the cached dependency graph '%s'.", name, graph_name + ".png")
+        else:
+            self.timings.add_count("graphs_rendered")
+            logger.info("Module '%s': Created the dependency graph '%s'.", name, graph_name + ".png")
+        return os.path.join(path, graph_name + ".png")
+
+    def render_complete_graph(self, collapse_module_versions=False, cluster_by=None, reduce_complete_graph=False):
+        """
+        Draw the dependency graph of all the module versions resolved so far to
+        '<output_dir>/<epics_version>/all_dependencies', with the '.png' extension, or '.svg' with the built-in layout
+        engine.
+
+        Parameters
+        ----------
+        collapse_module_versions : bool
+            True to show a single node per module for all its versions
+        cluster_by : str
+            "type" to group the nodes into clusters by item type, "family" to group them by module name, or None not
+            to draw clusters. The built-in layout engine does not draw clusters.
+        reduce_complete_graph : bool
+            True to remove the edges already implied by other dependencies
+
+        Returns : str
+        -------
+            The path to the graph
+        """
+        complete_data = self.data
+        complete_universe = self.universe
+        if collapse_module_versions:
+            complete_data = collapse_versions(self.data)
+            complete_universe = OrderedDict((itm.name, itm) for itm in self.universe.values())
+        if reduce_complete_graph:
+            complete_data = transitive_reduction(complete_data)
+
+        graph_name = "all_dependencies"
+        path = self.get_output_path()
+        if self.layout_engine == "builtin":
+            if cluster_by:
+                logger.warning("The built-in layout engine does not draw clusters. Ignoring --cluster-by.")
+            with self.timings.measure("rendering", graph_name):
+                graph_filename = write_svg(complete_data, graph_name, path, universe=complete_universe)
+            self.timings.add_count("graphs_rendered")
+            logger.info("Created the dependency graph '%s'.", graph_name + ".svg")
+            return graph_filename
+
+        with self.timings.measure("dot_generation", graph_name):
+            g = generate_graph(complete_data, universe=complete_universe, cluster_by=cluster_by, format='png')
+        with self.timings.measure("rendering", graph_name):
+            cached = render_graph(g, graph_name, os.path.abspath(path), self.render_cache)
+        self.timings.add_count("graphs_reused" if cached else "graphs_rendered")
+        logger.info("Created the dependency graph '%s'.", graph_name + ".png")
+        return os.path.join(path, graph_name + ".png")
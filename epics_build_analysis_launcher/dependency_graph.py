@@ -0,0 +1,220 @@
+from collections import OrderedDict
+
+from epics_build_analysis_launcher.epics_item import ItemType
+
+
+NODE_FILL_COLORS = {
+    ItemType.epics_ioc: "blue",
+    ItemType.epics_module: "green",
+    ItemType.system_package: "red",
+    ItemType.kernel_driver: "yellow",
+}
+
+
+def get_module_name(node):
+    """
+    Get the module name part of a 'name/version' node.
+
+    Parameters
+    ----------
+    node : str
+        The node to get the module name from
+
+    Returns : str
+    -------
+        The module name
+    """
+    return node.split('/')[0]
+
+
+def get_node_fill_color(node, universe=None):
+    """
+    Get the color to fill a node with, depending on the type of its item.
+
+    Parameters
+    ----------
+    node : str
+        The node to color
+    universe : dict
+        The items of the analyzed build. If None, or if the node is not in the universe, the node is white.
+
+    Returns : str
+    -------
+        The fill color
+    """
+    if universe:
+        try:
+            return NODE_FILL_COLORS.get(universe[node].item_type, "white")
+        except KeyError:
+            pass
+    return "white"
+
+
+def collapse_versions(data):
+    """
+    Collapse all the versions of each module into a single node, merging their dependencies.
+
+    Parameters
+    ----------
+    data : dict
+        A dictionary of 'name/version' nodes as keys, and for each key, a list of the nodes it depends on
+
+    Returns : OrderedDict
+    -------
+        A dictionary of module names as keys, and for each key, a list of the module names it depends on
+    """
+    collapsed = OrderedDict()
+    for node, deps in data.items():
+        name = get_module_name(node)
+        targets = collapsed.setdefault(name, [])
+        for dep in deps:
+            dep_name = get_module_name(dep)
+            if dep_name != name and dep_name not in targets:
+                targets.append(dep_name)
+    return collapsed
+
+
+def _strongly_connected_components(data):
+    """
+    Find the strongly connected components of a graph with an iterative Tarjan's algorithm.
+
+    Parameters
+    ----------
+    data : dict
+        A dictionary of nodes as keys, and for each key, a list of the nodes it has edges to
+
+    Returns : list
+    -------
+        A list of components, each a list of nodes. The components come in reverse topological order, i.e. a component
+        is always listed after all the components it has edges to.
+    """
+    index_of = dict()
+    lowlink = dict()
+    stack = []
+    on_stack = set()
+    components = []
+
+    nodes = list(data.keys())
+    nodes.extend(dep for deps in data.values() for dep in deps)
+    for root in nodes:
+        if root in index_of:
+            continue
+
+        index_of[root] = lowlink[root] = len(index_of)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(data.get(root, ())))]
+        while work:
+            node, successors = work[-1]
+            for succ in successors:
+                if succ not in index_of:
+                    index_of[succ] = lowlink[succ] = len(index_of)
+                    stack.append(succ)
+                    on_stack.add(succ)
+                    work.append((succ, iter(data.get(succ, ()))))
+                    break
+                elif succ in on_stack:
+                    lowlink[node] = min(lowlink[node], index_of[succ])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index_of[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+    return components
+
+
+def transitive_reduction(data):
+    """
+    Remove every edge that is implied by a longer path in the graph.
+
+    The graph is condensed into its strongly connected components, which are visited in reverse topological order to
+    build the set of components reachable from each one as a bitset. An edge A -> B is then dropped if B can be
+    reached through another dependency of A. Edges inside a dependency cycle are always kept.
+
+    Parameters
+    ----------
+    data : dict
+        A dictionary of nodes as keys, and for each key, a list of the nodes it depends on
+
+    Returns : OrderedDict
+    -------
+        A dictionary with the same keys, and for each key, the list of the dependencies that are not implied by others
+    """
+    components = _strongly_connected_components(data)
+    component_of = dict()
+    for index, component in enumerate(components):
+        for node in component:
+            component_of[node] = index
+
+    # reach[i] is the bitset of the components reachable from component i by a path of at least one edge
+    reach = [0] * len(components)
+    for index, component in enumerate(components):
+        reachable = 0
+        for node in component:
+            for dep in data.get(node, ()):
+                dep_index = component_of[dep]
+                if dep_index != index:
+                    reachable |= reach[dep_index] | (1 << dep_index)
+        reach[index] = reachable
+
+    reduced = OrderedDict()
+    for node, deps in data.items():
+        index = component_of[node]
+        implied = 0
+        for dep in deps:
+            dep_index = component_of[dep]
+            if dep_index != index:
+                implied |= reach[dep_index]
+
+        kept = []
+        for dep in deps:
+            dep_index = component_of[dep]
+            if dep not in kept and (dep_index == index or not (implied >> dep_index) & 1):
+                kept.append(dep)
+        reduced[node] = kept
+    return reduced
+
+
+def get_closure_sizes(data):
+    """
+    Count the direct and transitive dependencies of every node.
+
+    Parameters
+    ----------
+    data : dict
+        A dictionary of nodes as keys, and for each key, a list of the nodes it depends on
+
+    Returns : dict
+    -------
+        The number of nodes each node depends on, directly or transitively
+    """
+    components = _strongly_connected_components(data)
+    component_of = dict()
+    node_bit = dict()
+    for index, component in enumerate(components):
+        for node in component:
+            component_of[node] = index
+            node_bit[node] = 1 << len(node_bit)
+
+    # reach[i] is the bitset of the nodes reachable from component i by a path of at least one edge
+    reach = [0] * len(components)
+    for index, component in enumerate(components):
+        reachable = 0
+        for node in component:
+            for dep in data.get(node, ()):
+                reachable |= node_bit[dep]
+                dep_index = component_of[dep]
+                if dep_index != index:
+                    reachable |= reach[dep_index]
+        reach[index] = reachable
+
+    return dict((node, bin(reach[component_of[node]] & ~node_bit[node]).count("1")) for node in component_of)
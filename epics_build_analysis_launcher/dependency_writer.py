@@ -0,0 +1,133 @@
+import io
+import os
+import gzip
+import json
+import heapq
+import tempfile
+
+
+def format_module_dependencies(module, dependencies):
+    """
+    Format the entry of a module in the module dependency file.
+
+    Parameters
+    ----------
+    module : str
+        The module name
+    dependencies : list
+        The names of the modules the module depends on
+
+    Returns : str
+    -------
+        The formatted entry
+    """
+    lines = ["{0}:\n".format(module)]
+    if len(dependencies) == 0:
+        lines.append("\tNo dependencies found.\n")
+    for item in dependencies:
+        lines.append("\t{0}\n".format(item.ljust(20)))
+    lines.append('\n')
+    return "".join(lines)
+
+
+class ModuleDependencyWriter:
+    """
+    Write the module dependency file in sorted module order, while holding only a bounded number of entries in memory.
+
+    The entries are buffered and spilled to temporary files as sorted runs, which are merged when the writer is closed.
+    The output is written to a temporary file next to the output file, which only replaces the output file once the
+    run succeeded, so that a failed run never leaves a truncated output file that looks complete.
+    """
+    def __init__(self, output_filename, compress=False, max_buffered_entries=10000, sort_key=None):
+        """
+        Parameters
+        ----------
+        output_filename : str
+            The name of the output file to produce
+        compress : bool
+            True to write the output file with gzip compression
+        max_buffered_entries : int
+            The maximum number of entries to hold in memory before spilling them to a temporary file
+        sort_key : callable
+            The function giving the sort key of a module name. If None, the module names are sorted as strings.
+        """
+        self._output_filename = output_filename
+        self._temp_filename = "{0}.{1}.tmp".format(output_filename, os.getpid())
+        self._compress = compress
+        self._max_buffered_entries = max_buffered_entries
+        self._sort_key = sort_key if sort_key is not None else (lambda module: module)
+        self._buffer = []
+        self._runs = []
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # The output file is only produced if the run succeeded
+        self.close(success=exc_type is None)
+
+    def write(self, module, dependencies):
+        """
+        Add the entry of a module to the output file.
+
+        Parameters
+        ----------
+        module : str
+            The module name
+        dependencies : list
+            The names of the modules the module depends on
+        """
+        self._buffer.append((module, list(dependencies)))
+        if len(self._buffer) >= self._max_buffered_entries:
+            self._spill()
+
+    def _spill(self):
+        self._buffer.sort(key=lambda entry: self._sort_key(entry[0]))
+        run = tempfile.TemporaryFile(mode='w+')
+        for entry in self._buffer:
+            run.write(json.dumps(entry))
+            run.write('\n')
+        run.seek(0)
+        self._runs.append(run)
+        self._buffer = []
+
+    def close(self, success=True):
+        """
+        Merge the entries into the output file, and close the writer.
+
+        Parameters
+        ----------
+        success : bool
+            True to produce the output file, or False to discard the entries, e.g. when the run failed, leaving any
+            previous output file in place
+        """
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if success:
+                self._write_output()
+        finally:
+            for run in self._runs:
+                run.close()
+            self._runs = []
+            self._buffer = []
+
+    def _write_output(self):
+        self._buffer.sort(key=lambda entry: self._sort_key(entry[0]))
+        runs = [(json.loads(line) for line in run) for run in self._runs]
+        runs.append(iter(self._buffer))
+        try:
+            if self._compress:
+                output_file = io.TextIOWrapper(gzip.open(self._temp_filename, 'wb'))
+            else:
+                output_file = open(self._temp_filename, 'w')
+            with output_file:
+                for module, dependencies in heapq.merge(*runs, key=lambda entry: self._sort_key(entry[0])):
+                    output_file.write(format_module_dependencies(module, dependencies))
+            os.replace(self._temp_filename, self._output_filename)
+        except BaseException:
+            if os.path.exists(self._temp_filename):
+                os.remove(self._temp_filename)
+            raise
@@ -2,6 +2,7 @@ import os
 from enum import Enum
 import re
 import glob
+import threading
 
 
 from epics_build_analysis.epics_build_analysis_logging import logging
@@ -17,6 +18,13 @@ class ItemType(str, Enum):
 
 
 class Item:
+    # The number of dependency lookups answered from the parsed dependencies kept by each item, and the number of
+    # dependency file parses, across all the items
+    parse_cache_hits = 0
+    parse_cache_misses = 0
+    # The items are parsed and resolved by different pipeline stages, i.e. threads, and += is not atomic
+    _parse_cache_lock = threading.Lock()
+
     def __init__(self, path="", name="", version="", item_type=ItemType.epics_module):
         self.path = path
         self.name = name
@@ -30,20 +38,34 @@ class Item:
     def __str__(self):
         return "{}/{}".format(self.name, self.version)
 
+    @classmethod
+    def _count_parse_cache_lookup(cls, hit):
+        with cls._parse_cache_lock:
+            if hit:
+                cls.parse_cache_hits += 1
+            else:
+                cls.parse_cache_misses += 1
+
     def get_modules_dependencies(self):
         if self.__mod_depends is None:
+            Item._count_parse_cache_lookup(False)
             if self.item_type in [ItemType.epics_module, ItemType.epics_ioc]:
                 self.__mod_depends = self.__parse_epics_dependency_file("/configure/RELEASE*")
             else:
                 self.__mod_depends = {}
+        else:
+            Item._count_parse_cache_lookup(True)
         return self.__mod_depends
 
     def get_package_dependencies(self):
         if self.__packages_depends is None:
+            Item._count_parse_cache_lookup(False)
             if self.item_type in [ItemType.epics_module, ItemType.epics_ioc]:
                 self.__packages_depends = self.__parse_epics_dependency_file("/configure/CONFIG_SITE*")
             else:
                 self.__packages_depends = {}
+        else:
+            Item._count_parse_cache_lookup(True)
         return self.__packages_depends
 
     def get_libraries_dependencies(self):
@@ -110,9 +132,9 @@ class Item:
                             else:
                                 deps[key] = releases[value]
                         except KeyError:
-                            logger.debug('Problems with {0} and dependencies: {1}'.format(fname, key))
+                            logger.debug('Problems with %s and dependencies: %s', fname, key)
             except FileNotFoundError:
-                logger.error('Could not find file: {0}'.format(fname))
+                logger.error('Could not find file: %s', fname)
 
             if len(deps) == 0:
                 for line in content:
@@ -0,0 +1,144 @@
+from collections import OrderedDict
+
+from epics_build_analysis_launcher.dependency_graph import get_module_name, get_closure_sizes
+
+
+class GraphDiff:
+    """
+    The differences between the resolved dependency graphs of two EPICS builds.
+
+    Attributes
+    ----------
+    added_nodes, removed_nodes : list
+        The sorted 'name/version' nodes only present in the new, or the old, build
+    added_edges, removed_edges : list
+        The sorted (node, dependency) edges only present in the new, or the old, build
+    version_changes : OrderedDict
+        For each node present in both builds, the (module name, old version, new version) tuples of the direct
+        dependencies whose version changed. An old or new version of None means that the dependency was added or
+        removed.
+    closure_size_changes : OrderedDict
+        For each node present in both builds, the (old size, new size) tuple of its dependency closure, if it changed
+    """
+    def __init__(self, old_data, new_data):
+        old_nodes = _get_nodes(old_data)
+        new_nodes = _get_nodes(new_data)
+        self.added_nodes = sorted(new_nodes - old_nodes)
+        self.removed_nodes = sorted(old_nodes - new_nodes)
+
+        old_edges = _get_edges(old_data)
+        new_edges = _get_edges(new_data)
+        self.added_edges = sorted(new_edges - old_edges)
+        self.removed_edges = sorted(old_edges - new_edges)
+
+        # Only the nodes with an added or removed edge can have dependency version changes
+        changed_nodes = set(edge[0] for edge in self.added_edges).union(edge[0] for edge in self.removed_edges)
+        self.version_changes = OrderedDict()
+        for node in sorted(changed_nodes & old_nodes & new_nodes):
+            old_versions = _get_dependency_versions(old_data.get(node, ()))
+            new_versions = _get_dependency_versions(new_data.get(node, ()))
+            changes = [(name, old_versions.get(name), new_versions.get(name))
+                       for name in sorted(set(old_versions).union(new_versions))
+                       if old_versions.get(name) != new_versions.get(name)]
+            if changes:
+                self.version_changes[node] = changes
+
+        old_sizes = get_closure_sizes(old_data)
+        new_sizes = get_closure_sizes(new_data)
+        self.closure_size_changes = OrderedDict(
+            (node, (old_sizes[node], new_sizes[node])) for node in sorted(old_nodes & new_nodes)
+            if old_sizes[node] != new_sizes[node])
+
+    def is_empty(self):
+        return not (self.added_nodes or self.removed_nodes or self.added_edges or self.removed_edges)
+
+    def format(self):
+        """
+        Format the differences as a text report.
+
+        Returns : str
+        -------
+            The report
+        """
+        lines = []
+
+        def add_section(title, entries):
+            lines.append("{0} ({1}):\n".format(title, len(entries)))
+            for entry in entries:
+                lines.append("\t{0}\n".format(entry))
+            lines.append("\n")
+
+        def format_version(version):
+            return version if version is not None else "(none)"
+
+        add_section("Added modules", self.added_nodes)
+        add_section("Removed modules", self.removed_nodes)
+        add_section("Added dependencies", ["{0} -> {1}".format(*edge) for edge in self.added_edges])
+        add_section("Removed dependencies", ["{0} -> {1}".format(*edge) for edge in self.removed_edges])
+        add_section("Dependency version changes",
+                    ["{0}: {1}".format(node, ", ".join("{0} {1} -> {2}".format(name, format_version(old),
+                                                                              format_version(new))
+                                                       for name, old, new in changes))
+                     for node, changes in self.version_changes.items()])
+        add_section("Dependency closure size changes",
+                    ["{0}: {1} -> {2} ({3:+d})".format(node, old, new, new - old)
+                     for node, (old, new) in self.closure_size_changes.items()])
+        return "".join(lines)
+
+    def generate_graph(self, **graph_kwargs):
+        """
+        Draw the added and removed dependencies, and the modules they join.
+
+        The added modules and dependencies are green, the removed ones are red, and the modules present in both builds
+        are white.
+
+        Returns : graphviz.Digraph
+        -------
+            The delta graph
+        """
+        import graphviz as gv
+
+        added_nodes = set(self.added_nodes)
+        removed_nodes = set(self.removed_nodes)
+
+        g = gv.Digraph(**graph_kwargs)
+        nodes = OrderedDict()
+        for edge in self.added_edges + self.removed_edges:
+            nodes[edge[0]] = None
+            nodes[edge[1]] = None
+        for node in self.added_nodes + self.removed_nodes:
+            nodes[node] = None
+
+        for node in nodes:
+            if node in added_nodes:
+                fill_color = "palegreen"
+            elif node in removed_nodes:
+                fill_color = "lightpink"
+            else:
+                fill_color = "white"
+            g.node(node, node.replace('/', ' '), style="filled", fillcolor=fill_color)
+
+        for source, target in self.added_edges:
+            g.edge(source, target, color="green4", penwidth="2")
+        for source, target in self.removed_edges:
+            g.edge(source, target, color="red", style="dashed")
+        return g
+
+
+def _get_nodes(data):
+    nodes = set(data.keys())
+    for deps in data.values():
+        nodes.update(deps)
+    return nodes
+
+
+def _get_edges(data):
+    return set((node, dep) for node, deps in data.items() for dep in deps)
+
+
+def _get_dependency_versions(deps):
+    versions = dict()
+    for dep in deps:
+        name = get_module_name(dep)
+        versions[name] = dep[len(name) + 1:]
+    return versions
@@ -0,0 +1,279 @@
+import heapq
+from collections import deque
+
+from epics_build_analysis_launcher.dependency_graph import get_module_name
+
+
+class Trie:
+    """
+    A prefix tree of strings, to find all the strings starting with a given prefix without scanning them all.
+    """
+    _END = None
+
+    def __init__(self, words=()):
+        self._root = dict()
+        for word in words:
+            self.insert(word)
+
+    def insert(self, word):
+        node = self._root
+        for char in word:
+            node = node.setdefault(char, dict())
+        node[self._END] = word
+
+    def remove(self, word):
+        node = self._root
+        path = []
+        for char in word:
+            path.append((node, char))
+            node = node.get(char)
+            if node is None:
+                return
+        node.pop(self._END, None)
+        # Prune the branches left without any string
+        for parent, char in reversed(path):
+            if parent[char]:
+                break
+            del parent[char]
+
+    def search(self, prefix):
+        """
+        Find the strings starting with a prefix.
+
+        Parameters
+        ----------
+        prefix : str
+            The prefix to look for
+
+        Returns : list
+        -------
+            The sorted strings starting with the prefix
+        """
+        node = self._root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+
+        words = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for char, child in node.items():
+                if char is self._END:
+                    words.append(child)
+                else:
+                    stack.append(child)
+        return sorted(words)
+
+
+class DependencyGraph:
+    """
+    Answer questions about a resolved dependency graph: closures, dependents, dependency paths and name lookups.
+
+    The nodes are 'name/version' identifiers. Wherever a node is expected, a module name without a version can be
+    given instead, standing for all the versions of that module.
+    """
+    def __init__(self, data):
+        """
+        Parameters
+        ----------
+        data : dict
+            A dictionary of nodes as keys, and for each key, a list of the nodes it directly depends on
+        """
+        self.successors = dict()
+        self.predecessors = dict()
+        self.versions = dict()
+        self.trie = Trie()
+        for node, deps in data.items():
+            self._add_node(node)
+            for dep in deps:
+                self._add_node(dep)
+                if dep not in self.successors[node]:
+                    self.successors[node].append(dep)
+                    self.predecessors[dep].append(node)
+
+    def _add_node(self, node):
+        if node not in self.successors:
+            self.successors[node] = []
+            self.predecessors[node] = []
+            self.versions.setdefault(get_module_name(node), []).append(node)
+            self.trie.insert(node)
+
+    def set_dependencies(self, node, deps):
+        """
+        Replace the direct dependencies of a node, e.g. when the dependency files of a module version change, adding the
+        node and its dependencies to the graph if needed.
+
+        Parameters
+        ----------
+        node : str
+            The node to set the dependencies of
+        deps : list
+            The nodes it directly depends on
+        """
+        self._add_node(node)
+        for dep in self.successors[node]:
+            self.predecessors[dep].remove(node)
+        self.successors[node] = []
+        for dep in deps:
+            self._add_node(dep)
+            if dep not in self.successors[node]:
+                self.successors[node].append(dep)
+                self.predecessors[dep].append(node)
+
+    def remove_node(self, node):
+        """
+        Remove a node, and its dependencies on other nodes, unless other nodes still depend on it.
+
+        Parameters
+        ----------
+        node : str
+            The node to remove
+        """
+        if node not in self.successors or self.predecessors[node]:
+            return
+        self.set_dependencies(node, [])
+        del self.successors[node]
+        del self.predecessors[node]
+        name = get_module_name(node)
+        self.versions[name].remove(node)
+        if not self.versions[name]:
+            del self.versions[name]
+        self.trie.remove(node)
+
+    def resolve(self, name):
+        """
+        Get the nodes a name stands for.
+
+        Parameters
+        ----------
+        name : str
+            A 'name/version' node, or a module name standing for all its versions
+
+        Returns : list
+        -------
+            The matching nodes
+        """
+        if name in self.successors:
+            return [name]
+        if name in self.versions:
+            return sorted(self.versions[name])
+        raise KeyError("Unknown module '{0}'.".format(name))
+
+    @staticmethod
+    def _reach(starts, neighbors):
+        seen = set(starts)
+        queue = deque(starts)
+        while queue:
+            for neighbor in neighbors[queue.popleft()]:
+                if neighbor not in seen:
+                    seen.add(neighbor)
+                    queue.append(neighbor)
+        return seen.difference(starts)
+
+    def closure(self, name):
+        """
+        Get all the direct and transitive dependencies of a module.
+
+        Returns : list
+        -------
+            The sorted nodes the module depends on
+        """
+        return sorted(self._reach(self.resolve(name), self.successors))
+
+    def dependents(self, name, direct=False):
+        """
+        Get the modules depending on a module.
+
+        Parameters
+        ----------
+        name : str
+            A 'name/version' node, or a module name standing for all its versions
+        direct : bool
+            True to only get the modules depending on the module directly
+
+        Returns : list
+        -------
+            The sorted dependent nodes
+        """
+        nodes = self.resolve(name)
+        if direct:
+            return sorted(set(dependent for node in nodes for dependent in self.predecessors[node]))
+        return sorted(self._reach(nodes, self.predecessors))
+
+    def search(self, prefix):
+        return self.trie.search(prefix)
+
+    def _shortest_path(self, sources, targets, removed_nodes=frozenset(), removed_edges=frozenset()):
+        """
+        Find a shortest path from any of the sources to any of the targets with a breadth-first search.
+        """
+        parents = dict((source, None) for source in sources if source not in removed_nodes)
+        queue = deque(parents)
+        while queue:
+            node = queue.popleft()
+            if node in targets:
+                path = []
+                while node is not None:
+                    path.append(node)
+                    node = parents[node]
+                return path[::-1]
+            for succ in self.successors[node]:
+                if succ not in parents and succ not in removed_nodes and (node, succ) not in removed_edges:
+                    parents[succ] = node
+                    queue.append(succ)
+        return None
+
+    def why_depends(self, name, dependency, k=1):
+        """
+        Find the k shortest dependency paths from a module to one of its dependencies, with Yen's algorithm.
+
+        Parameters
+        ----------
+        name : str
+            The depending module, as a 'name/version' node or a module name
+        dependency : str
+            The dependency, as a 'name/version' node or a module name
+        k : int
+            The number of paths to find
+
+        Returns : list
+        -------
+            Up to k loopless paths, each a list of nodes, shortest first
+        """
+        sources = self.resolve(name)
+        targets = set(self.resolve(dependency))
+
+        # Paths from several sources are handled as paths from a virtual start node connected to all of them
+        def spur_sources(spur_node):
+            return sources if spur_node is None else [spur_node]
+
+        first = self._shortest_path(sources, targets)
+        if first is None:
+            return []
+        paths = [[None] + first]
+        candidates = []
+        seen = set()
+        while len(paths) < k:
+            previous = paths[-1]
+            for i in range(len(previous) - 1):
+                spur_node = previous[i]
+                root = previous[:i + 1]
+                removed_edges = set()
+                for path in paths:
+                    if path[:i + 1] == root and len(path) > i + 1:
+                        removed_edges.add((path[i], path[i + 1]))
+                # Edges out of the virtual start node are removed by leaving their sources out
+                starts = [s for s in spur_sources(spur_node) if (None, s) not in removed_edges]
+                spur_path = self._shortest_path(starts, targets, removed_nodes=set(root[1:-1]),
+                                                removed_edges=removed_edges)
+                if spur_path is not None:
+                    candidate = tuple(root[:-1] + spur_path) if spur_node is not None else tuple([None] + spur_path)
+                    if candidate not in seen:
+                        seen.add(candidate)
+                        heapq.heappush(candidates, (len(candidate), candidate[1:], candidate))
+            if not candidates:
+                break
+            paths.append(list(heapq.heappop(candidates)[2]))
+        return [path[1:] for path in paths]
@@ -0,0 +1,126 @@
+import os
+from collections import OrderedDict
+
+from epics_build_analysis_launcher.dependency_graph import get_module_name, get_node_fill_color
+from epics_build_analysis_launcher.render_cache import remove_file
+
+
+def generate_graph(data, universe=None, cluster_by=None, **graph_kwargs):
+    """
+    Generate the graphviz graph of dependency data.
+
+    Parameters
+    ----------
+    data : dict
+        A dictionary of module names as keys, and for each key, a list of names of the modules the current module
+        depends on
+    universe : dict
+        The items of the analyzed build, used to color the nodes by item type, and to cluster them by item type
+    cluster_by : str
+        "type" to group the nodes into clusters by item type, "family" to group them by module name, or None not to
+        draw clusters
+    graph_kwargs : dict
+        The keyword arguments of graphviz.Digraph, e.g. format='png'
+
+    Returns : graphviz.Digraph
+    -------
+        The graph
+    """
+    import graphviz as gv
+
+    def label_from_node(node):
+        return node.replace('/', ' ')
+
+    def get_node_attrs(node):
+        return {"style": "filled", "fillcolor": get_node_fill_color(node, universe)}
+
+    def get_cluster_name(node):
+        if cluster_by == "type":
+            try:
+                return universe[node].item_type.value
+            except (KeyError, TypeError):
+                return "unresolved"
+        return get_module_name(node)
+
+    g = gv.Digraph(**graph_kwargs)  # , engine='circo')
+
+    # Declare each node once, even if many modules depend on it
+    nodes = OrderedDict()
+    for k, v in data.items():
+        nodes[k] = None
+        for i in v:
+            nodes[i] = None
+
+    if cluster_by:
+        clusters = OrderedDict()
+        for node in nodes:
+            clusters.setdefault(get_cluster_name(node), []).append(node)
+        for cluster_name, members in clusters.items():
+            with g.subgraph(name="cluster_" + cluster_name) as cluster:
+                cluster.attr(label=cluster_name)
+                for node in members:
+                    cluster.node(node, label_from_node(node), **get_node_attrs(node))
+    else:
+        for node in nodes:
+            g.node(node, label_from_node(node), **get_node_attrs(node))
+
+    for k, v in data.items():
+        for i in v:
+            g.edge(k, i)
+
+    return g
+
+
+def render_graph(graph, graph_name, path, render_cache=None):
+    """
+    Render a graph, reusing an identical previous rendering from the render cache if possible.
+
+    Parameters
+    ----------
+    graph : graphviz.Digraph
+        The graph to render
+    graph_name : str
+        The name of the rendered file, without the format extension
+    path : str
+        The directory to put the rendered file in
+    render_cache : RenderCache
+        The cache of previous renderings. If None, the graph is always rendered.
+
+    Returns : bool
+    -------
+        True if a cached rendering was reused; False if dot was invoked
+    """
+    if render_cache is None:
+        # The previous rendering may be a hard link to a cached rendering, which dot would overwrite in place
+        remove_file(os.path.join(path, "{0}.{1}".format(graph_name, graph.format)))
+        graph.render(filename=graph_name, directory=path, cleanup=True)
+        return False
+    return render_cache.render(graph, graph_name, path)
+
+
+def write_svg(data, graph_name, path, universe=None):
+    """
+    Lay out a graph with the built-in layered layout engine, and write it as an SVG image.
+
+    Parameters
+    ----------
+    data : dict
+        A dictionary of module names as keys, and for each key, a list of names of the modules the current module
+        depends on
+    graph_name : str
+        The name of the SVG file, without the extension
+    path : str
+        The directory to put the SVG file in
+    universe : dict
+        The items of the analyzed build, used to color the nodes by item type
+
+    Returns : str
+    -------
+        The path to the SVG file
+    """
+    from epics_build_analysis_launcher.layered_layout import generate_svg
+
+    svg_filename = os.path.join(path, graph_name + ".svg")
+    with open(svg_filename, 'w') as svg_file:
+        svg_file.write(generate_svg(data, universe=universe))
+    return svg_filename
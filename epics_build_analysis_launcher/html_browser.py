@@ -0,0 +1,286 @@
+import os
+import json
+from collections import OrderedDict
+
+from epics_build_analysis_launcher.dependency_graph import get_module_name
+
+from epics_build_analysis.epics_build_analysis_logging import logging
+logger = logging.getLogger(__name__)
+
+
+SHARD_DIRECTORY = "shards"
+
+# Browsers refuse to fetch() files from file:// URLs, so each shard is a JSON document wrapped in a call to a loader
+# function. Adding a <script> tag for the shard loads it lazily, without the need for a web server.
+SHARD_TEMPLATE = "EpicsBuildAnalysis.loadShard({0});\n"
+
+INDEX_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>EPICS {epics_base_version} Module Dependencies</title>
+<style>
+body {{ font-family: sans-serif; margin: 0; display: flex; height: 100vh; }}
+#sidebar {{ width: 320px; border-right: 1px solid #ccc; display: flex; flex-direction: column; }}
+#search {{ margin: 8px; padding: 4px; font-size: 14px; }}
+#results {{ overflow-y: auto; flex: 1; margin: 0; padding: 0; list-style: none; }}
+#results li {{ padding: 2px 8px; cursor: pointer; }}
+#results li:hover {{ background: #eef; }}
+#details {{ flex: 1; overflow-y: auto; padding: 8px 16px; }}
+ul.tree {{ list-style: none; padding-left: 18px; }}
+.missing {{ color: #a00; }}
+.node {{ cursor: pointer; }}
+.toggle {{ cursor: pointer; color: #666; }}
+.epics_module {{ color: #070; }}
+.epics_ioc {{ color: #00a; }}
+.system_package {{ color: #a00; }}
+.kernel_driver {{ color: #880; }}
+</style>
+</head>
+<body>
+<div id="sidebar">
+<input id="search" type="search" placeholder="Search modules..." autofocus>
+<ul id="results"></ul>
+</div>
+<div id="details"><h2>EPICS {epics_base_version}</h2><p>Select a module to show its dependencies.</p></div>
+<script>
+var SEARCH_INDEX = {search_index};
+var SHARD_DIRECTORY = "{shard_directory}";
+</script>
+<script>
+var EpicsBuildAnalysis = (function () {{
+  var shards = {{}};
+  var pending = {{}};
+
+  function loadShard(shard) {{
+    shards[shard.name] = shard;
+    (pending[shard.name] || []).forEach(function (callback) {{ callback(shard); }});
+    delete pending[shard.name];
+  }}
+
+  function withShard(name, callback) {{
+    if (shards[name]) {{ callback(shards[name]); return; }}
+    var entry = SEARCH_INDEX.modules[name];
+    if (entry === undefined) {{ callback(null); return; }}
+    if (!pending[name]) {{
+      pending[name] = [];
+      var script = document.createElement("script");
+      script.src = SHARD_DIRECTORY + "/" + entry[0] + ".js";
+      document.head.appendChild(script);
+    }}
+    pending[name].push(callback);
+  }}
+
+  function element(tag, text, className) {{
+    var e = document.createElement(tag);
+    if (text) {{ e.textContent = text; }}
+    if (className) {{ e.className = className; }}
+    return e;
+  }}
+
+  function nodeLink(node, type) {{
+    var link = element("span", node, "node " + (type || "missing"));
+    link.onclick = function () {{ show(node.split("/")[0], node); }};
+    return link;
+  }}
+
+  // The dependencies of each node are expanded once per tree. The modules of a build share many dependencies, so the
+  // later occurrences of a node, and the cycles, are collapsed, and only expanded one level when clicked. Expanding
+  // every path of the DAG would take exponential time.
+  function renderTree(node, closure, types, expanded) {{
+    expanded[node] = true;
+    var list = element("ul", null, "tree");
+    (closure[node] || []).forEach(function (dep) {{
+      var item = element("li");
+      item.appendChild(nodeLink(dep, types[dep]));
+      if (expanded[dep] && (closure[dep] || []).length > 0) {{
+        var toggle = element("span", " [+]", "toggle");
+        toggle.title = "Already shown above. Click to expand here.";
+        toggle.onclick = function () {{
+          item.removeChild(toggle);
+          item.appendChild(renderTree(dep, closure, types, expanded));
+        }};
+        item.appendChild(toggle);
+      }} else if (!expanded[dep]) {{
+        item.appendChild(renderTree(dep, closure, types, expanded));
+      }}
+      list.appendChild(item);
+    }});
+    return list;
+  }}
+
+  function show(name, selected) {{
+    withShard(name, function (shard) {{
+      var details = document.getElementById("details");
+      details.innerHTML = "";
+      if (!shard) {{
+        details.appendChild(element("h2", name));
+        details.appendChild(element("p", "This module is not part of the analyzed build.", "missing"));
+        return;
+      }}
+      details.appendChild(element("h2", shard.name));
+      Object.keys(shard.versions).forEach(function (node) {{
+        var version = shard.versions[node];
+        var header = element("h3", node);
+        if (node === selected) {{ header.style.background = "#ffd"; }}
+        details.appendChild(header);
+        details.appendChild(element("p", "Type: " + (version.type || "unresolved")));
+        details.appendChild(element("h4", "Dependency tree"));
+        if (version.dependencies.length === 0) {{
+          details.appendChild(element("p", "No dependencies found."));
+        }} else {{
+          details.appendChild(renderTree(node, version.closure, shard.types, {{}}));
+        }}
+        details.appendChild(element("h4", "Used by"));
+        var dependents = element("ul", null, "tree");
+        version.dependents.forEach(function (dependent) {{
+          var item = element("li");
+          item.appendChild(nodeLink(dependent, shard.types[dependent]));
+          dependents.appendChild(item);
+        }});
+        if (version.dependents.length === 0) {{ dependents.appendChild(element("li", "No dependents found.")); }}
+        details.appendChild(dependents);
+        if (node === selected) {{ header.scrollIntoView(); }}
+      }});
+    }});
+  }}
+
+  function search(text) {{
+    // The module names are sorted, so the names starting with the search text are found with a binary search
+    var names = SEARCH_INDEX.names;
+    var prefix = text.toLowerCase();
+    var low = 0, high = names.length;
+    while (low < high) {{
+      var middle = (low + high) >> 1;
+      if (names[middle][0] < prefix) {{ low = middle + 1; }} else {{ high = middle; }}
+    }}
+    var results = document.getElementById("results");
+    results.innerHTML = "";
+    for (var i = low; i < names.length && names[i][0].lastIndexOf(prefix, 0) === 0; i++) {{
+      var name = names[i][1];
+      var item = element("li", name + " (" + SEARCH_INDEX.modules[name][1] + ")");
+      item.onclick = (function (n) {{ return function () {{ show(n); }}; }})(name);
+      results.appendChild(item);
+    }}
+  }}
+
+  document.getElementById("search").oninput = function (event) {{ search(event.target.value); }};
+  search("");
+
+  return {{ loadShard: loadShard }};
+}})();
+</script>
+</body>
+</html>
+"""
+
+
+def _to_script_json(obj):
+    """
+    Serialize an object to JSON that is safe to embed in an HTML <script> element.
+    """
+    return json.dumps(obj, separators=(',', ':'), sort_keys=True).replace("</", "<\\/")
+
+
+def _get_closure(node, data):
+    """
+    Get the dependency subgraph reachable from a node.
+
+    Parameters
+    ----------
+    node : str
+        The node to start from
+    data : dict
+        A dictionary of nodes as keys, and for each key, a list of the nodes it depends on
+
+    Returns : dict
+    -------
+        The part of the data reachable from the node, including the node itself
+    """
+    closure = dict()
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if current in closure or current not in data:
+            continue
+        closure[current] = data[current]
+        stack.extend(data[current])
+    return closure
+
+
+def write_html_browser(output_dir, data, universe, epics_base_version):
+    """
+    Write a static HTML dependency browser.
+
+    The browser consists of an 'index.html' page, which embeds a sorted search index of all the module names, and one
+    shard per module under the 'shards' directory. A shard holds the resolved dependency tree and the dependents of
+    each version of a module, and is only loaded by the page when that module is opened.
+
+    Parameters
+    ----------
+    output_dir : str
+        The directory to write the browser to
+    data : dict
+        A dictionary of module names as keys, and for each key, a list of names of the modules the current module
+        depends on
+    universe : dict
+        The items of the analyzed build, keyed by their 'name/version' identifier
+    epics_base_version : str
+        The EPICS version being analyzed
+
+    Returns : str
+    -------
+        The path to the browser's index page
+    """
+    shard_dir = os.path.join(output_dir, SHARD_DIRECTORY)
+    if not os.path.isdir(shard_dir):
+        os.makedirs(shard_dir)
+
+    dependents = dict()
+    for node, deps in data.items():
+        for dep in deps:
+            dependents.setdefault(dep, []).append(node)
+
+    # Group the nodes by module, including the missing dependencies, so that every link in the browser leads somewhere
+    modules = dict()
+    for node in set(data.keys()).union(dependents.keys()):
+        modules.setdefault(get_module_name(node), []).append(node)
+
+    def get_type(node):
+        itm = universe.get(node)
+        return itm.item_type.value if itm is not None else None
+
+    search_modules = dict()
+    for shard_id, name in enumerate(sorted(modules.keys())):
+        versions = OrderedDict()
+        types = dict()
+        for node in sorted(modules[name]):
+            closure = _get_closure(node, data)
+            versions[node] = {
+                "type": get_type(node),
+                "dependencies": data.get(node, []),
+                "dependents": sorted(dependents.get(node, [])),
+                "closure": closure,
+            }
+            for closure_node, closure_deps in closure.items():
+                types[closure_node] = get_type(closure_node)
+                for dep in closure_deps:
+                    types[dep] = get_type(dep)
+            for dependent in dependents.get(node, []):
+                types[dependent] = get_type(dependent)
+
+        shard = {"name": name, "versions": versions, "types": types}
+        with open(os.path.join(shard_dir, "{0}.js".format(shard_id)), 'w') as shard_file:
+            shard_file.write(SHARD_TEMPLATE.format(_to_script_json(shard)))
+        search_modules[name] = [shard_id, len(versions)]
+
+    search_index = {
+        "names": sorted([name.lower(), name] for name in search_modules.keys()),
+        "modules": search_modules,
+    }
+    index_filename = os.path.join(output_dir, "index.html")
+    with open(index_filename, 'w') as index_file:
+        index_file.write(INDEX_TEMPLATE.format(epics_base_version=epics_base_version,
+                                               search_index=_to_script_json(search_index),
+                                               shard_directory=SHARD_DIRECTORY))
+    return index_filename
@@ -0,0 +1,327 @@
+from collections import OrderedDict
+from xml.sax.saxutils import escape, quoteattr
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from epics_build_analysis_launcher.dependency_graph import get_node_fill_color
+
+
+FONT_SIZE = 12
+CHAR_WIDTH = 7
+NODE_HEIGHT = 28
+NODE_PADDING = 16
+NODE_GAP = 20
+LAYER_SPACING = 80
+MARGIN = 20
+CROSSING_REDUCTION_SWEEPS = 4
+COORDINATE_ITERATIONS = 4
+
+
+class Layout:
+    """
+    The result of a layered layout.
+
+    Attributes
+    ----------
+    nodes : OrderedDict
+        For each node, its center as an (x, y) tuple and its width
+    edges : list
+        For each edge, a (source, target, points) tuple, with the points of the polyline to draw the edge along
+    width : float
+        The width of the drawing
+    height : float
+        The height of the drawing
+    """
+    def __init__(self, nodes, edges, width, height):
+        self.nodes = nodes
+        self.edges = edges
+        self.width = width
+        self.height = height
+
+
+def label_from_node(node):
+    return node.replace('/', ' ')
+
+
+def _remove_cycles(successors):
+    """
+    Drop the back edges found by a depth-first search, so that the graph becomes acyclic.
+    """
+    state = [0] * len(successors)  # 0: unvisited, 1: on the DFS stack, 2: done
+    acyclic = [list(s) for s in successors]
+    for root in range(len(successors)):
+        if state[root]:
+            continue
+        state[root] = 1
+        work = [(root, iter(successors[root]))]
+        while work:
+            vertex, children = work[-1]
+            for child in children:
+                if state[child] == 0:
+                    state[child] = 1
+                    work.append((child, iter(successors[child])))
+                    break
+                elif state[child] == 1:
+                    acyclic[vertex].remove(child)
+            else:
+                state[vertex] = 2
+                work.pop()
+    return acyclic
+
+
+def _assign_layers(successors):
+    """
+    Assign each vertex to the layer one below its deepest predecessor (longest-path layering), in topological order.
+    """
+    in_degree = [0] * len(successors)
+    for targets in successors:
+        for target in targets:
+            in_degree[target] += 1
+
+    layer = [0] * len(successors)
+    ready = [v for v in range(len(successors)) if in_degree[v] == 0]
+    while ready:
+        vertex = ready.pop()
+        for target in successors[vertex]:
+            layer[target] = max(layer[target], layer[vertex] + 1)
+            in_degree[target] -= 1
+            if in_degree[target] == 0:
+                ready.append(target)
+    return layer
+
+
+def _reduce_crossings(layers, upper_neighbors, lower_neighbors, sweeps):
+    """
+    Reorder the vertices of each layer by the barycenter of their neighbors' positions in the adjacent layer.
+    """
+    position = dict()
+    for vertices in layers:
+        for i, vertex in enumerate(vertices):
+            position[vertex] = i
+
+    def sort_layer(vertices, neighbors):
+        def barycenter(vertex):
+            adjacent = neighbors[vertex]
+            if not adjacent:
+                return position[vertex]
+            return float(sum(position[n] for n in adjacent)) / len(adjacent)
+
+        vertices.sort(key=lambda v: (barycenter(v), position[v]))
+        for i, vertex in enumerate(vertices):
+            position[vertex] = i
+
+    for _ in range(sweeps):
+        for vertices in layers[1:]:
+            sort_layer(vertices, upper_neighbors)
+        for vertices in reversed(layers[:-1]):
+            sort_layer(vertices, lower_neighbors)
+    return layers
+
+
+def _spread(xs, widths, gap):
+    """
+    Move the vertices of a layer as little as possible from their desired x coordinates, so that they do not overlap.
+
+    The separation constraints are removed by subtracting the cumulative minimum offsets, which turns them into a
+    monotonicity constraint. Pushing the vertices right (running maximum) and left (running minimum from the right)
+    both satisfy it, and so does their average.
+    """
+    if np is not None:
+        xs = np.asarray(xs, dtype=float)
+        widths = np.asarray(widths, dtype=float)
+        offsets = np.concatenate(([0.0], np.cumsum((widths[:-1] + widths[1:]) / 2.0 + gap)))
+        shifted = xs - offsets
+        right = np.maximum.accumulate(shifted)
+        left = np.minimum.accumulate(shifted[::-1])[::-1]
+        return ((right + left) / 2.0 + offsets).tolist()
+
+    offsets = [0.0]
+    for i in range(1, len(xs)):
+        offsets.append(offsets[-1] + (widths[i - 1] + widths[i]) / 2.0 + gap)
+    shifted = [x - o for x, o in zip(xs, offsets)]
+    right = []
+    for value in shifted:
+        right.append(value if not right else max(right[-1], value))
+    left = []
+    for value in reversed(shifted):
+        left.append(value if not left else min(left[-1], value))
+    left.reverse()
+    return [(r + l) / 2.0 + o for r, l, o in zip(right, left, offsets)]
+
+
+def _neighbor_means(xs, neighbors, vertices, index_in_layer, fallback):
+    """
+    Compute the mean x coordinate of each vertex's neighbors in an adjacent layer.
+    """
+    if np is not None:
+        sources = []
+        targets = []
+        for i, vertex in enumerate(vertices):
+            for neighbor in neighbors[vertex]:
+                sources.append(index_in_layer[neighbor])
+                targets.append(i)
+        if not sources:
+            return fallback
+        neighbor_xs = np.asarray(xs, dtype=float)[sources]
+        sums = np.bincount(targets, weights=neighbor_xs, minlength=len(vertices))
+        counts = np.bincount(targets, minlength=len(vertices))
+        means = np.where(counts > 0, sums / np.maximum(counts, 1), fallback)
+        return means.tolist()
+
+    means = []
+    for i, vertex in enumerate(vertices):
+        adjacent = neighbors[vertex]
+        if adjacent:
+            means.append(sum(xs[index_in_layer[n]] for n in adjacent) / float(len(adjacent)))
+        else:
+            means.append(fallback[i])
+    return means
+
+
+def _assign_coordinates(layers, widths, upper_neighbors, lower_neighbors, iterations):
+    index_in_layer = dict()
+    for vertices in layers:
+        for i, vertex in enumerate(vertices):
+            index_in_layer[vertex] = i
+
+    xs = [_spread([0.0] * len(vertices), [widths[v] for v in vertices], NODE_GAP) for vertices in layers]
+
+    for _ in range(iterations):
+        for direction in (1, -1):
+            order = range(1, len(layers)) if direction == 1 else range(len(layers) - 2, -1, -1)
+            neighbors = upper_neighbors if direction == 1 else lower_neighbors
+            for layer_index in order:
+                vertices = layers[layer_index]
+                desired = _neighbor_means(xs[layer_index - direction], neighbors, vertices, index_in_layer,
+                                          xs[layer_index])
+                xs[layer_index] = _spread(desired, [widths[v] for v in vertices], NODE_GAP)
+
+    coordinates = dict()
+    for layer_index, vertices in enumerate(layers):
+        for vertex, x in zip(vertices, xs[layer_index]):
+            coordinates[vertex] = x
+    return coordinates
+
+
+def layered_layout(data, sweeps=CROSSING_REDUCTION_SWEEPS, iterations=COORDINATE_ITERATIONS):
+    """
+    Lay out a dependency graph in layers, with each module above its dependencies.
+
+    The layout runs in four steps: longest-path layering, insertion of dummy vertices along the edges spanning several
+    layers, barycentric crossing reduction sweeping down and up the layers, and coordinate assignment pulling each
+    vertex towards its neighbors while keeping the vertices of a layer apart. NumPy is used for the coordinate
+    assignment if it is installed; otherwise, the same computation runs in pure Python.
+
+    Parameters
+    ----------
+    data : dict
+        A dictionary of nodes as keys, and for each key, a list of the nodes it depends on
+    sweeps : int
+        The number of down and up sweeps of the crossing reduction
+    iterations : int
+        The number of down and up passes of the coordinate assignment
+
+    Returns : Layout
+    -------
+        The positions of the nodes and the routes of the edges
+    """
+    names = OrderedDict()
+    for node, deps in data.items():
+        names[node] = None
+        for dep in deps:
+            names[dep] = None
+    names = list(names.keys())
+    index_of = dict((name, i) for i, name in enumerate(names))
+
+    successors = [[] for _ in names]
+    for node, deps in data.items():
+        source = index_of[node]
+        for dep in deps:
+            target = index_of[dep]
+            if target != source and target not in successors[source]:
+                successors[source].append(target)
+    successors = _remove_cycles(successors)
+    layer = _assign_layers(successors)
+
+    # Split the edges spanning several layers with dummy vertices, so that all edges join adjacent layers
+    widths = [len(label_from_node(name)) * CHAR_WIDTH + NODE_PADDING for name in names]
+    upper_neighbors = [[] for _ in names]
+    lower_neighbors = [[] for _ in names]
+    routes = []
+    for source, targets in enumerate(successors):
+        for target in targets:
+            route = [source]
+            for dummy_layer in range(layer[source] + 1, layer[target]):
+                dummy = len(layer)
+                layer.append(dummy_layer)
+                widths.append(0)
+                upper_neighbors.append([])
+                lower_neighbors.append([])
+                route.append(dummy)
+            route.append(target)
+            for upper, lower in zip(route, route[1:]):
+                lower_neighbors[upper].append(lower)
+                upper_neighbors[lower].append(upper)
+            routes.append(route)
+
+    layers = [[] for _ in range(max(layer) + 1 if layer else 0)]
+    for vertex, vertex_layer in enumerate(layer):
+        layers[vertex_layer].append(vertex)
+
+    layers = _reduce_crossings(layers, upper_neighbors, lower_neighbors, sweeps)
+    xs = _assign_coordinates(layers, widths, upper_neighbors, lower_neighbors, iterations)
+
+    left = min([xs[v] - widths[v] / 2.0 for v in xs] or [0.0])
+    right = max([xs[v] + widths[v] / 2.0 for v in xs] or [0.0])
+
+    def point(vertex):
+        return xs[vertex] - left + MARGIN, layer[vertex] * LAYER_SPACING + NODE_HEIGHT / 2.0 + MARGIN
+
+    nodes = OrderedDict((name, (point(i), widths[i])) for i, name in enumerate(names))
+    edges = [(names[route[0]], names[route[-1]], [point(v) for v in route]) for route in routes]
+    height = (len(layers) - 1) * LAYER_SPACING + NODE_HEIGHT + 2 * MARGIN if layers else 2 * MARGIN
+    return Layout(nodes, edges, right - left + 2 * MARGIN, height)
+
+
+def generate_svg(data, universe=None):
+    """
+    Lay out a dependency graph and draw it as an SVG document.
+
+    Parameters
+    ----------
+    data : dict
+        A dictionary of nodes as keys, and for each key, a list of the nodes it depends on
+    universe : dict
+        The items of the analyzed build, used to color the nodes by item type
+
+    Returns : str
+    -------
+        The SVG document
+    """
+    layout = layered_layout(data)
+    lines = [
+        '<svg xmlns="http://www.w3.org/2000/svg" width="{0:.0f}" height="{1:.0f}" viewBox="0 0 {0:.0f} {1:.0f}" '
+        'font-family="sans-serif" font-size="{2}">'.format(layout.width, layout.height, FONT_SIZE),
+        '<defs><marker id="arrow" viewBox="0 0 10 10" refX="10" refY="5" markerWidth="8" markerHeight="8" '
+        'orient="auto"><path d="M 0 0 L 10 5 L 0 10 z"/></marker></defs>',
+    ]
+
+    for source, target, points in layout.edges:
+        # End the edge at the top of the target node instead of its center
+        points = points[:-1] + [(points[-1][0], points[-1][1] - NODE_HEIGHT / 2.0)]
+        lines.append('<polyline points="{0}" fill="none" stroke="black" marker-end="url(#arrow)"/>'.format(
+            " ".join("{0:.1f},{1:.1f}".format(x, y) for x, y in points)))
+
+    for node, ((x, y), width) in layout.nodes.items():
+        lines.append('<g><title>{0}</title>'.format(escape(node)))
+        lines.append('<rect x="{0:.1f}" y="{1:.1f}" width="{2:.1f}" height="{3}" rx="6" fill={4} stroke="black"/>'
+                     .format(x - width / 2.0, y - NODE_HEIGHT / 2.0, width, NODE_HEIGHT,
+                             quoteattr(get_node_fill_color(node, universe))))
+        lines.append('<text x="{0:.1f}" y="{1:.1f}" text-anchor="middle" dominant-baseline="central">{2}</text></g>'
+                     .format(x, y, escape(label_from_node(node))))
+
+    lines.append('</svg>')
+    return "\n".join(lines) + "\n"
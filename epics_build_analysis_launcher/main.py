@@ -1,16 +1,34 @@
 import os
-from subprocess import Popen, PIPE
-import re
+import sys
+import time
+import errno
 
 import traceback
 import argparse
 from collections import OrderedDict
 
-from epics_build_analysis import __version__
-from epics_build_analysis.epics_build_analysis_logging import logging
+from epics_build_analysis.epics_build_analysis_logging import logging, configure_logging, flush_logging
 logger = logging.getLogger(__name__)
 
-from epics_build_analysis_launcher.epics_item import Item, ItemType
+from epics_build_analysis_launcher.dependency_graph import get_module_name
+from epics_build_analysis_launcher.versions import parse_version, module_sort_key, VersionIndex
+
+# The other modules, such as the analysis, the rendering and the optional outputs, and their dependencies such as
+# NumPy, sqlite3 or graphviz, are only imported when used, to keep short invocations such as --help fast.
+
+
+class _VersionAction(argparse.Action):
+    """
+    Print the program version, which is only computed when asked for.
+    """
+    def __init__(self, option_strings, dest=argparse.SUPPRESS, default=argparse.SUPPRESS, help=None):
+        super(_VersionAction, self).__init__(option_strings=option_strings, dest=dest, default=default, nargs=0,
+                                             help=help)
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        from epics_build_analysis import get_version
+        print("EpicsBuildAnalysis {version}".format(version=get_version()))
+        parser.exit()
 
 
 def _parse_arguments():
@@ -21,90 +39,428 @@ def _parse_arguments():
     -------
     The command arguments as a dictionary : dict
     """
-    parser = argparse.ArgumentParser(description="Compare two directory listings")
+    parser = argparse.ArgumentParser(description="Compare two directory listings",
+                                     epilog="Run 'epics_build_analysis query --help' to query the dependencies of "
+                                            "a previous analysis, 'epics_build_analysis diff --help' to compare "
+                                            "the dependencies of two previously analyzed EPICS versions, or "
+                                            "'epics_build_analysis serve --help' to answer dependency queries over "
+                                            "HTTP instead.")
 
     parser.add_argument("current_epics_version", help="The EPICS version to analyze module dependencies.")
+    parser.add_argument('--latest', dest='latest', type=int, metavar="N",
+                        help="Only analyze the N newest versions of each module, and the module versions they depend "
+                             "on.")
+    parser.add_argument('--since-version', dest='since_version', metavar="VERSION",
+                        help="Only analyze the module versions that are the same as, or newer than, VERSION (e.g. "
+                             "'R4.0'), and the module versions they depend on.")
     parser.add_argument('--complete-dep-graph', dest='complete_dep_graph', default=False, action='store_true',
                         help="Generate the dependency graph of the entire module set.")
+    parser.add_argument('--collapse-versions', dest='collapse_versions', default=False, action='store_true',
+                        help="In the complete dependency graph, show a single node per module for all its versions.")
+    parser.add_argument('--cluster-by', dest='cluster_by', choices=["type", "family"],
+                        help="In the complete dependency graph, group the nodes into clusters by item type, or by "
+                             "module family, i.e. all the versions of a module.")
+    parser.add_argument('--reduce-complete-graph', dest='reduce_complete_graph', default=False, action='store_true',
+                        help="In the complete dependency graph, remove the edges already implied by other "
+                             "dependencies.")
+    parser.add_argument('--transitive-reduction', dest='transitive_reduction', default=False, action='store_true',
+                        help="Leave out the dependencies already implied by other dependencies from each module's "
+                             "dependency graph and from the module dependency file.")
+    parser.add_argument('--html', dest='html', default=False, action='store_true',
+                        help="Write a static HTML dependency browser to 'output/<epics_version>/html'.")
+    parser.add_argument('--no-graphs', dest='render_graphs', default=True, action='store_false',
+                        help="Do not render the dependency graph of each module, e.g. when browsing the dependencies "
+                             "with --html instead.")
+    parser.add_argument('--sqlite', dest='sqlite', default=False, action='store_true',
+                        help="Write the analyzed items and their direct and transitive dependencies to the SQLite "
+                             "database 'output/<epics_version>/dependencies.sqlite'.")
+    parser.add_argument('--binary-graph', dest='binary_graph', default=False, action='store_true',
+                        help="Write the resolved dependency graph in a compact binary format, meant to be "
+                             "memory-mapped by other tools, to 'output/<epics_version>/dependencies.csr'.")
+    parser.add_argument('--compress-output', dest='compress_output', default=False, action='store_true',
+                        help="Write the module dependency file with gzip compression, as 'module_dependencies.txt.gz'.")
     parser.add_argument('--compare-file-lists', dest='compare_file_lists',
                         help="The EPICS version to compare module listing with the current EPICS version.")
-
-    parser.add_argument("--version", action="version", version="EpicsBuildAnalysis {version}".
-                        format(version=__version__))
+    parser.add_argument('--compare-releases', dest='compare_releases', nargs='+', metavar="EPICS_VERSION",
+                        help="Compare the module listings of any number of EPICS versions at once, writing their "
+                             "module-by-release version matrix and the module list differences of every pair.")
+    parser.add_argument('--listing-backend', dest='listing_backend', choices=["native", "epics-versions"],
+                        default="native",
+                        help="List the modules of the compared EPICS versions by scanning their modules directories "
+                             "(default), or with the external 'epics-versions' tool.")
+    parser.add_argument('--listing-timeout', dest='listing_timeout', type=float, default=600,
+                        help="The maximum number of seconds to wait for each 'epics-versions' listing (default: 600).")
+    parser.add_argument('--layout-engine', dest='layout_engine', choices=["dot", "builtin"], default="dot",
+                        help="Render the dependency graphs as PNG images with graphviz's dot (default), or as SVG "
+                             "images with the built-in layered layout engine, which does not need graphviz.")
+    parser.add_argument('--render-cache-dir', dest='render_cache_dir', default=os.path.join("output", ".render_cache"),
+                        help="The directory to keep previously rendered dependency graphs in, keyed by the hash of "
+                             "their DOT source.")
+    parser.add_argument('--no-render-cache', dest='use_render_cache', default=True, action='store_false',
+                        help="Always invoke dot, even if an identical dependency graph has been rendered before.")
+    parser.add_argument('--watch', dest='watch', default=False, action='store_true',
+                        help="After the analysis, keep polling the modules directory for new, removed or changed "
+                             "module versions, from the modification times of the module directories and of their "
+                             "'configure/RELEASE*' and 'configure/CONFIG_SITE*' files, and update the outputs of the "
+                             "affected module versions, until interrupted with Ctrl+C.")
+    parser.add_argument('--watch-interval', dest='watch_interval', type=float, default=30, metavar="SECONDS",
+                        help="The number of seconds between two polls with --watch (default: 30).")
+    parser.add_argument('--timings', dest='timings', default=False, action='store_true',
+                        help="Write the wall time, CPU time and item count of each phase of the analysis, and its "
+                             "slowest items, to 'output/<epics_version>/timings.json'.")
+    parser.add_argument('--progress', dest='progress', choices=["auto", "tty", "lines", "none"], default="auto",
+                        help="Report the progress of each phase of the analysis, with its throughput and estimated "
+                             "time left, as a status line redrawn on the terminal ('tty'), or as periodic JSON lines "
+                             "('lines'). By default ('auto'), a status line is drawn if stderr is a terminal, and JSON "
+                             "lines are written otherwise.")
+    parser.add_argument('--progress-interval', dest='progress_interval', type=float, metavar="SECONDS",
+                        help="The number of seconds between two progress reports (default: 0.5 for a status line, and "
+                             "60 for JSON lines).")
+    parser.add_argument('--metrics-file', dest='metrics_file', metavar="FILENAME",
+                        help="Write the metrics of the run, such as the phase durations, the item counts and the "
+                             "number of graphs rendered, to a file for the textfile collector of the Prometheus node "
+                             "exporter, e.g. '/var/lib/node_exporter/textfile_collector/epics_build_analysis.prom'.")
+    parser.add_argument('--metrics-interval', dest='metrics_interval', type=float, metavar="SECONDS",
+                        help="Also update the metrics file every SECONDS seconds during the run, instead of only at "
+                             "its end.")
+    parser.add_argument('--profile', dest='profile', choices=["cpu", "mem"],
+                        help="Profile the run, with cProfile ('cpu'), writing 'output/<epics_version>/profile_cpu' "
+                             "as .pstats, .txt and .collapsed files, or with tracemalloc ('mem'), writing the top "
+                             "allocation sites at each phase boundary to 'output/<epics_version>/profile_mem.txt'.")
+    parser.add_argument('--timings-slowest', dest='timings_slowest', type=int, default=10, metavar="N",
+                        help="The number of slowest items to report for each phase with --timings (default: 10).")
+
+    parser.add_argument("--version", action=_VersionAction, help="show program's version number and exit")
 
     args, extra_args = parser.parse_known_args()
+    if args.latest is not None and args.latest < 1:
+        parser.error("--latest must be at least 1.")
+    if args.progress_interval is not None and args.progress_interval <= 0:
+        parser.error("--progress-interval must be positive.")
+    if args.metrics_interval is not None and args.metrics_interval <= 0:
+        parser.error("--metrics-interval must be positive.")
+    if args.metrics_interval is not None and not args.metrics_file:
+        parser.error("--metrics-interval requires --metrics-file.")
+    if args.watch_interval <= 0:
+        parser.error("--watch-interval must be positive.")
+    if args.timings_slowest < 0:
+        parser.error("--timings-slowest must not be negative.")
+    if args.since_version is not None and parse_version(args.since_version) is None:
+        parser.error("--since-version must be an EPICS version tag, such as 'R4.0' or 'R4.31-0.1.0'.")
     return args, extra_args
 
 
-def _run_cmd(cmd, env):
+def _positive_int(value):
     """
-    Run a console command, log the command's stdout and stderr data, and then return these output data
+    Convert an argument to an integer of at least 1.
 
     Parameters
     ----------
-    cmd : str
-        The test command to run
-    env :  dict
-        The environment variables to pass to the terminal process
+    value : str
+        The argument value
 
     Returns
     -------
-        The stdout and stderr data
+    The integer value : int
     """
-    logger.info("\n## Running command: ##")
-    logger.info(cmd)
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid integer value: '{0}'".format(value))
+    if number < 1:
+        raise argparse.ArgumentTypeError("must be at least 1, got {0}".format(number))
+    return number
+
+
+def _parse_query_arguments(argv):
+    """
+    Parse the arguments of the query subcommand.
+
+    Parameters
+    ----------
+    argv : list
+        The command arguments following 'query'
+
+    Returns
+    -------
+    The query arguments : argparse.Namespace
+    """
+    parser = argparse.ArgumentParser(prog="epics_build_analysis query",
+                                     description="Query the dependency database written by a previous analysis run "
+                                                 "with --sqlite. Modules are given as 'name/version', or as 'name' "
+                                                 "for all the versions of a module.")
+    parser.add_argument("epics_version", help="The analyzed EPICS version.")
+    parser.add_argument('--database', dest='database',
+                        help="The dependency database to query, instead of "
+                             "'output/<epics_version>/dependencies.sqlite'. A binary graph file written with "
+                             "--binary-graph, with the '.csr' extension, can be queried too.")
+
+    questions = parser.add_subparsers(dest="question", metavar="question")
+    questions.required = True
 
-    proc = Popen(cmd, env=env, shell=True, stdin=PIPE, stdout=PIPE, stderr=PIPE)
-    stdout, stderr = proc.communicate()
-    return_code = proc.returncode
+    why_depends = questions.add_parser("why-depends", help="Show the shortest dependency paths between two modules.")
+    why_depends.add_argument("module", help="The depending module.")
+    why_depends.add_argument("dependency", help="The dependency.")
+    why_depends.add_argument('-k', dest='k', type=_positive_int, default=1,
+                             help="The number of shortest paths to show.")
 
-    logger.info("Return Code: {0}\n".format(return_code))
+    closure = questions.add_parser("closure", help="List all the direct and transitive dependencies of a module.")
+    closure.add_argument("module", help="The module.")
 
-    stdout_data = stdout.decode()
-    if len(stdout_data):
-        logger.debug("### stdout ###")
-        logger.debug("{0}".format(stdout_data))
+    dependents = questions.add_parser("dependents", help="List the modules depending on a module.")
+    dependents.add_argument("module", help="The module.")
+    dependents.add_argument('--direct', dest='direct', default=False, action='store_true',
+                            help="Only list the modules depending on the module directly.")
 
-    stderr_data = stderr.decode()
-    if len(stderr_data):
-        logger.debug("### stderr ###")
-        logger.debug("{0}".format(stderr.decode()))
+    newest = questions.add_parser("newest", help="Show the newest version of a module.")
+    newest.add_argument("module", help="The module name, or a 'name/version' of the module.")
 
-    return stdout_data, stderr_data
+    older_than = questions.add_parser("older-than", help="List the module versions older than a version.")
+    older_than.add_argument("version", help="The version tag, e.g. 'R4.31-0.1.0'.")
+    older_than.add_argument('--module', dest='module', help="Only list the versions of this module.")
 
+    search = questions.add_parser("search", help="List the modules whose 'name/version' starts with a prefix.")
+    search.add_argument("prefix", help="The prefix to search for.")
 
-def _read_file_into_dict(file_contents):
+    return parser.parse_args(argv)
+
+
+def _parse_diff_arguments(argv):
     """
-    Parse a file's contents into a dictionary for subsequent filtering.
+    Parse the arguments of the diff subcommand.
+
+    Parameters
+    ----------
+    argv : list
+        The command arguments following 'diff'
 
-    For each line, expect two strings, separated by a space. The first string becomes a dictionary entry's key, and the
-    next one is the dictionary entry's value.
+    Returns
+    -------
+    The diff arguments : argparse.Namespace
+    """
+    parser = argparse.ArgumentParser(prog="epics_build_analysis diff",
+                                     description="Compare the dependency graphs of two EPICS versions, from the "
+                                                 "dependency databases written by previous analysis runs with "
+                                                 "--sqlite.")
+    parser.add_argument("old_epics_version", help="The EPICS version to compare from.")
+    parser.add_argument("new_epics_version", help="The EPICS version to compare to.")
+    parser.add_argument('--old-database', dest='old_database',
+                        help="The dependency database of the old EPICS version, instead of "
+                             "'output/<old_epics_version>/dependencies.sqlite'.")
+    parser.add_argument('--new-database', dest='new_database',
+                        help="The dependency database of the new EPICS version, instead of "
+                             "'output/<new_epics_version>/dependencies.sqlite'.")
+    parser.add_argument('--render', dest='render', default=False, action='store_true',
+                        help="Also render the added and removed dependencies as a graph.")
+    return parser.parse_args(argv)
+
+
+def _parse_serve_arguments(argv):
+    """
+    Parse the arguments of the serve subcommand.
 
     Parameters
     ----------
-    file_contents : list
-        A list of strings, each of which is a line from a text file
+    argv : list
+        The command arguments following 'serve'
 
-    Returns : dict
+    Returns
     -------
-        A dictionary with the keys and values parsed from the file contents.
+    The serve arguments : argparse.Namespace
     """
-    modules = dict()
-    for line in file_contents:
-        tokens = re.sub(' +', ' ', line.lstrip())
-        tokens = tokens.split(' ')
-        modules[tokens[0]] = tokens[1]
-    return modules
+    parser = argparse.ArgumentParser(prog="epics_build_analysis serve",
+                                     description="Analyze the module dependencies of an EPICS version once, and "
+                                                 "answer dependency queries over HTTP with JSON documents, from the "
+                                                 "analysis kept in memory. Open the root URL to list the queries.")
+    parser.add_argument("epics_version", help="The EPICS version to analyze.")
+    parser.add_argument('--host', dest='host', default="127.0.0.1",
+                        help="The address to listen on (default: 127.0.0.1, i.e. only local connections).")
+    parser.add_argument('--port', dest='port', type=int, default=8000, help="The port to listen on (default: 8000).")
+    parser.add_argument('--latest', dest='latest', type=int, metavar="N",
+                        help="Only analyze the N newest versions of each module, and the module versions they depend "
+                             "on.")
+    parser.add_argument('--since-version', dest='since_version', metavar="VERSION",
+                        help="Only analyze the module versions that are the same as, or newer than, VERSION, and the "
+                             "module versions they depend on.")
+    parser.add_argument('--transitive-reduction', dest='transitive_reduction', default=False, action='store_true',
+                        help="Leave out the dependencies already implied by other dependencies.")
+
+    args = parser.parse_args(argv)
+    if args.latest is not None and args.latest < 1:
+        parser.error("--latest must be at least 1.")
+    if args.since_version is not None and parse_version(args.since_version) is None:
+        parser.error("--since-version must be an EPICS version tag, such as 'R4.0' or 'R4.31-0.1.0'.")
+    return args
+
+
+def _load_dependency_data(epics_version, db_filename=None):
+    """
+    Load the direct dependencies persisted by a previous analysis run, and whether they were transitively reduced.
+
+    Parameters
+    ----------
+    epics_version : str
+        The analyzed EPICS version
+    db_filename : str
+        The SQLite database, or binary graph file with the '.csr' extension, to load. If None, the SQLite database of
+        the EPICS version in the output directory is loaded.
+
+    Returns : tuple
+    -------
+        A dictionary of module names as keys, and for each key, a list of names of the modules the current module
+        depends on, and True if the dependencies already implied by other dependencies were left out
+    """
+    db_filename = db_filename or os.path.join("output", epics_version, "dependencies.sqlite")
+    if db_filename.endswith(".csr"):
+        from epics_build_analysis_launcher.binary_graph import BinaryGraph
+        with BinaryGraph(db_filename) as binary_graph:
+            return binary_graph.to_dict(), binary_graph.transitive_reduction
+
+    from epics_build_analysis_launcher.sqlite_export import load_sqlite
+    return load_sqlite(db_filename)
+
+
+def run_query(args):
+    """
+    Answer a query about the dependencies of a previous analysis, and print the answer.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        The query arguments
+
+    Returns
+    -------
+    The exit status, 0 if the query was answered : int
+    """
+    from epics_build_analysis_launcher.graph_query import DependencyGraph
+
+    try:
+        data, _ = _load_dependency_data(args.epics_version, args.database)
+        graph = DependencyGraph(data)
+    except IOError as error:
+        logger.error(error)
+        return 1
+    try:
+        if args.question == "why-depends":
+            paths = graph.why_depends(args.module, args.dependency, k=args.k)
+            if not paths:
+                print("'{0}' does not depend on '{1}'.".format(args.module, args.dependency))
+            for path in paths:
+                print(" -> ".join(path))
+        elif args.question == "closure":
+            for node in graph.closure(args.module):
+                print(node)
+        elif args.question == "dependents":
+            for node in graph.dependents(args.module, direct=args.direct):
+                print(node)
+        elif args.question == "newest":
+            # A 'name/version' stands for its module, whose newest version is asked for
+            name = get_module_name(args.module)
+            newest_version = VersionIndex(graph.resolve(name)).get_newest_version(name)
+            if newest_version is None:
+                print("'{0}' has no valid version.".format(name))
+            else:
+                print("{0}/{1}".format(name, newest_version))
+        elif args.question == "older-than":
+            version_index = VersionIndex(graph.resolve(args.module) if args.module else graph.successors.keys())
+            for name, versions in version_index.get_versions_older_than(args.version, name=args.module).items():
+                for version in versions:
+                    print("{0}/{1}".format(name, version))
+        elif args.question == "search":
+            for node in graph.search(args.prefix):
+                print(node)
+    except KeyError as error:
+        logger.error(error.args[0])
+        return 1
+    except ValueError as error:
+        logger.error(error)
+        return 1
+    return 0
+
+
+def run_diff(args):
+    """
+    Compare the dependency graphs of two previously analyzed EPICS versions, and write the differences to
+    'output/graph_diff_<old_epics_version>_to_<new_epics_version>.txt'.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        The diff arguments
+
+    Returns
+    -------
+    The exit status, 0 if the differences were written : int
+    """
+    try:
+        old_data, old_reduced = _load_dependency_data(args.old_epics_version, args.old_database)
+        new_data, new_reduced = _load_dependency_data(args.new_epics_version, args.new_database)
+    except IOError as error:
+        logger.error(error)
+        return 1
+    if old_reduced != new_reduced:
+        # The direct dependencies of a reduced graph leave out the implied ones, which would show up as removed edges
+        logger.error("Cannot compare '%s' and '%s': only the %s analysis was run with --transitive-reduction. Run "
+                     "both analyses with the same option.", args.old_epics_version, args.new_epics_version,
+                     "old" if old_reduced else "new")
+        return 1
+
+    from epics_build_analysis_launcher.graph_diff import GraphDiff
+    graph_diff = GraphDiff(old_data, new_data)
+    _create_directory("output")
+    diff_name = "graph_diff_" + args.old_epics_version + "_to_" + args.new_epics_version
+    diff_filename = os.path.join("output", diff_name + ".txt")
+    with open(diff_filename, 'w') as diff_file:
+        diff_file.write(graph_diff.format())
+
+    logger.info("%d added and %d removed modules, %d added and %d removed dependencies, %d modules with "
+                "dependency version changes, %d modules with dependency closure size changes.",
+                len(graph_diff.added_nodes), len(graph_diff.removed_nodes), len(graph_diff.added_edges),
+                len(graph_diff.removed_edges), len(graph_diff.version_changes), len(graph_diff.closure_size_changes))
+    logger.info("Check the output file at '%s'", diff_filename)
+
+    if args.render and not graph_diff.is_empty():
+        from epics_build_analysis_launcher.graph_rendering import render_graph
+        render_graph(graph_diff.generate_graph(format='png'), diff_name, os.path.abspath("output"))
+        logger.info("Created the dependency delta graph '%s'.", diff_name + ".png")
+    return 0
+
+
+def run_serve(args):
+    """
+    Analyze the module dependencies of an EPICS version, and answer dependency queries over HTTP until interrupted.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        The serve arguments
+    """
+    from epics_build_analysis_launcher.build_analyzer import BuildAnalyzer
+    from epics_build_analysis_launcher.query_server import QueryServer
+
+    analyzer = BuildAnalyzer(args.epics_version, reduce_transitive_edges=args.transitive_reduction)
+    start_time = time.perf_counter()
+    analyzer.discover()
+    analyzer.resolve_all(analyzer.select_modules(latest=args.latest, since_version=args.since_version))
+    server = QueryServer((args.host, args.port), analyzer)
+    logger.info("Analyzed %d module versions in %.1f seconds. Answering queries at 'http://%s:%d/'.",
+                len(analyzer.data), time.perf_counter() - start_time, args.host, server.server_address[1])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Stopped answering queries.")
+    finally:
+        server.server_close()
 
 
 def _validate_module_name(module_name):
     """
     Validate a module name against a standard pattern:
 
-    1. The module name must start with "/R".
-    2. The module name must contains dots as version digit separators.
-    3. The module name, after separating from the prefix "/R", and the separators '-'s and '.'s, must contain all
-       digits.
+    1. The module name must contain a version after a "/", which must start with "R".
+    2. The version must contains dots as version digit separators.
+    3. The version, after removing the prefix "R", and the separators '-'s and '.'s, must contain all digits.
 
     Parameters
     ----------
@@ -115,17 +471,9 @@ def _validate_module_name(module_name):
     -------
         True if the module name is valid; False otherwise
     """
-    module_name = module_name[module_name.find('/'):]
-    if module_name:
-        if module_name.startswith('/R') and '.' in module_name:
-            partitions = module_name[2:].split('-')
-            for part in partitions:
-                digits = part.split('.')
-                for digit in digits:
-                    if not digit.isdigit():
-                        return False
-            return True
-    return False
+    if '/' not in module_name:
+        return False
+    return parse_version(module_name[module_name.find('/') + 1:]) is not None
 
 
 def _produce_output_file(output_filename, modules, validate_module_names=False):
@@ -146,7 +494,8 @@ def _produce_output_file(output_filename, modules, validate_module_names=False):
         previous_key = None
         dup_key_found = False
 
-        for k in modules.keys():
+        # Sort the versions of each module in version order, so that e.g. R5.10 comes after R5.9
+        for k in sorted(modules.keys(), key=module_sort_key):
             module_name = k[:k.find('/')]
             if previous_key is None or previous_key != module_name or not dup_key_found:
                 if validate_module_names and not _validate_module_name(k):
@@ -161,78 +510,31 @@ def _produce_output_file(output_filename, modules, validate_module_names=False):
                     previous_key = module_name
 
 
-def _get_item_dependency_tree(item, universe, epics_base_version):
-    deps = dict()
-    deps[str(item)] = []
-
-    for k, v in item.get_modules_dependencies().items():
-        try:
-            if v == "BASE_MODULE_VERSION":
-                v = epics_base_version
-
-            d = universe['{}/{}'.format(k, v)]
-            deps[str(item)].append(str(d))
-            deps.update(_get_item_dependency_tree(d, universe, epics_base_version))
-        except KeyError:
-            logger.debug('Could not find module dependency: {0} with version {1} for item: {2}.'
-                         .format(k, v, str(item)))
-            d = '{}/{}'.format(k, v)
-            deps[str(item)].append(d)
-
-    for k, v in item.get_package_dependencies().items():
-        try:
-            d = universe['{}/{}'.format(k, v)]
-            deps[str(item)].append(str(d))
-            deps.update(_get_item_dependency_tree(d, universe, epics_base_version))
-        except KeyError:
-            logger.debug('Could not find package dependency: {0} with version {1} for item: {2}.'
-                         .format(k, v, str(item)))
-            d = '{}/{}'.format(k, v)
-            deps[str(item)].append(d)
-    return deps
-
-
-def _generate_graph(data, universe=None, **graph_kwargs):
-    import graphviz as gv
-
-    def label_from_node(node):
-        return node.replace('/', ' ')
-
-    def get_node_attrs(node):
-        if universe:
-            try:
-                itm = universe[node]
-
-                if itm.item_type == ItemType.epics_ioc:
-                    return {"style": "filled", "fillcolor": "blue"}
-                elif itm.item_type == ItemType.epics_module:
-                    return {"style": "filled", "fillcolor": "green"}
-                elif itm.item_type == ItemType.system_package:
-                    return {"style": "filled", "fillcolor": "red"}
-                elif itm.item_type == ItemType.kernel_driver:
-                    return {"style": "filled", "fillcolor": "yellow"}
-                else:
-                    return {"style": "filled", "fillcolor": "white"}
-            except KeyError:
-                return {"style": "filled", "fillcolor": "white"}
-        else:
-            return {"style": "filled", "fillcolor": "white"}
-
-    def create_edges(graph, top, items):
-        graph.node(top, label_from_node(top), **get_node_attrs(top))
-        for i in items:
-            graph.node(i, label_from_node(i), **get_node_attrs(i))
-            graph.edge(top, i)
-
-    g = gv.Digraph(**graph_kwargs)  # , engine='circo')
+def _log_unresolved_dependencies(unresolved):
+    """
+    Log a summary of the dependencies that could not be found in the analyzed build, instead of a message for each
+    time one of them is needed.
 
-    for k, v in data.items():
-        create_edges(g, k, v)
+    Parameters
+    ----------
+    unresolved : dict
+        For each kind of dependency, "module" or "package", a dictionary of the 'name/version' identifiers of the
+        dependencies that could not be found as keys, and for each key, the set of identifiers of the items needing it
+    """
+    for kind in ("module", "package"):
+        dependencies = unresolved[kind]
+        if not dependencies:
+            continue
 
-    return g
+        logger.info("Could not find %d %s dependencies, needed by %d items.", len(dependencies), kind,
+                    len(set().union(*dependencies.values())))
+        if logger.isEnabledFor(logging.DEBUG):
+            for dependency in sorted(dependencies, key=module_sort_key):
+                logger.debug("Could not find %s dependency: %s for items: %s.", kind, dependency,
+                             ", ".join(sorted(dependencies[dependency], key=module_sort_key)))
 
 
-def _produce_module_dependency_file(output_filename, data):
+def _produce_module_dependency_file(output_filename, data, compress=False):
     """
     Write module name output to a file.
 
@@ -243,22 +545,14 @@ def _produce_module_dependency_file(output_filename, data):
     data : dict
         A dictionary of module names as keys, and for each key, a list of names of the modules the current module
         depends on
+    compress : bool
+        True to write the output file with gzip compression
     """
-    with open(output_filename, 'w') as output_file:
-        previous_key = None
-        dup_key_found = False
+    from epics_build_analysis_launcher.dependency_writer import ModuleDependencyWriter
 
-        module_dependency_data = OrderedDict(sorted(data.items(), key=lambda x: x[0]))
-        for k, v in module_dependency_data.items():
-            module_name = k[:k.find('/')]
-            if previous_key is None or previous_key != module_name or not dup_key_found:
-                output_file.write("{0}:\n".format(k))
-
-                if len(v) == 0:
-                    output_file.write("\tNo dependencies found.\n")
-                for item in v:
-                    output_file.write("\t{0}\n".format(item.ljust(20)))
-                output_file.write('\n')
+    with ModuleDependencyWriter(output_filename, compress=compress, sort_key=module_sort_key) as writer:
+        for k, v in data.items():
+            writer.write(k, v)
 
 
 def _create_directory(dir_name):
@@ -266,141 +560,499 @@ def _create_directory(dir_name):
         os.makedirs(dir_name)
     except os.error as err:
         # It's OK if the output directory exists. This is to be compatible with Python 2.7
-        if err.errno != os.errno.EEXIST:
+        if err.errno != errno.EEXIST:
             raise err
 
 
-def compare_module_lists(prev_epics_version, current_epics_version):
-    env = os.environ.copy()
-
-    TEMP_DIR = os.path.join('/', "afs", "slac", "g", "lcls", "epics", "iocTop", "users", "hbui", "temp")
-    prev_filename = os.path.join(TEMP_DIR, prev_epics_version + ".txt")
-    current_filename = os.path.join(TEMP_DIR, current_epics_version + ".txt")
-
-    cmd = "epics-versions modules -a --base=" + prev_epics_version + " > " + prev_filename
-    _run_cmd(cmd, env)
-
-    cmd = "epics-versions modules -a --base=" + current_epics_version + " > " + current_filename
-    _run_cmd(cmd, env)
-
-    with open(prev_filename, 'r') as prev_file:
-        prev_lines = [line.rstrip('\n') for line in prev_file]
-
-        with open(current_filename, 'r') as current_file:
-            current_lines = [line.rstrip('\n') for line in current_file]
-
-            prev_modules = _read_file_into_dict(prev_lines)
-            current_modules = _read_file_into_dict(current_lines)
-
-            for k in current_modules.keys():
-                if prev_modules.get(k, None):
-                    del prev_modules[k]
-
-            diff_filename = os.path.join("output",
-                                         "diff_" + prev_epics_version + "_from_" + current_epics_version + ".txt")
-            _produce_output_file(diff_filename, prev_modules)
-
-            filtered_current_module_filename = os.path.join("output", "filtered_" + current_epics_version + ".txt")
-            _produce_output_file(filtered_current_module_filename, current_modules, validate_module_names=True)
-
-            logger.info("Check the output files at '{0}'".format(diff_filename))
-
-
-def analyze_module_dependencies(current_epics_version, generate_complete_dep_graph):
-    EPICS_BASE_VERSION = current_epics_version  # "R7.0.1.1"
-    EPICS_TOP = "/afs/slac/g/lcls/epics/{}".format(EPICS_BASE_VERSION)
-    EPICS_IOC_TOP = "{}/../iocTop".format(EPICS_TOP)
-    EPICS_MODULES_TOP = "{}/modules".format(EPICS_TOP)
-    PACKAGE_TOP = "/afs/slac/g/lcls/package"
-    KERNEL_MOD_TOP = "{}/linuxKernel_Modules".format(PACKAGE_TOP)
-
-    modules = OrderedDict()
-    modules_list = next(os.walk(EPICS_MODULES_TOP))[1]
-    for m in modules_list:
-        release_list = next(os.walk(os.path.join(EPICS_MODULES_TOP, m)))[1]
-        for r in release_list:
-            mod_rel_path = os.path.join(EPICS_MODULES_TOP, m, r)
-            itm = Item(path=mod_rel_path, name=m, version=r, item_type=ItemType.epics_module)
-            modules[str(itm)] = itm
-
-    iocs = OrderedDict()
-    iocs_list = next(os.walk(EPICS_IOC_TOP))[1]
-    for ioc in iocs_list:
-        ioc_rel_list = next(os.walk(os.path.join(EPICS_IOC_TOP, ioc)))[1]
-        for r in ioc_rel_list:
-            ioc_rel_path = os.path.join(EPICS_IOC_TOP, ioc, r)
-            itm = Item(path=ioc_rel_path, name=ioc, version=r, item_type=ItemType.epics_ioc)
-            iocs[str(itm)] = itm
-
-    packages = OrderedDict()
-    pkg_list = next(os.walk(PACKAGE_TOP))[1]
-    for pkg in pkg_list:
-        pkg_rel_list = next(os.walk(os.path.join(PACKAGE_TOP, pkg)))[1]
-        for p in pkg_rel_list:
-            pkg_rel_path = os.path.join(PACKAGE_TOP, pkg, p)
-            itm = Item(path=pkg_rel_path, name=pkg, version=p, item_type=ItemType.system_package)
-            packages[str(itm)] = itm
-
-    kernel_modules = OrderedDict()
-    km_list = next(os.walk(KERNEL_MOD_TOP))[1]
-    for km in km_list:
-        km_rel_list = next(os.walk(os.path.join(KERNEL_MOD_TOP, km)))[1]
-        for m in km_rel_list:
-            km_rel_path = os.path.join(KERNEL_MOD_TOP, km, m)
-            itm = Item(path=km_rel_path, name=km, version=m, item_type=ItemType.kernel_driver)
-            kernel_modules[str(itm)] = itm
-
-    universe = OrderedDict()
-    universe.update(modules)
-    # universe.update(iocs)
-    # universe.update(packages)
-    # universe.update(kernel_modules)
-
-    data = OrderedDict()
-    for module_id in universe.keys():
-        current_module_dep_data = _get_item_dependency_tree(universe[module_id], universe, EPICS_BASE_VERSION)
-        module_dep_graph = _generate_graph(current_module_dep_data, universe=universe, format='png')
-
-        name, version = module_id.split('/')
-        path = os.path.join("output", EPICS_BASE_VERSION, name)
-        _create_directory(os.path.abspath(path))
-
-        graph_name = version + "_dependencies"
-        module_dep_graph.render(filename=graph_name, directory=path, cleanup=True)
-        logger.info("Module '{0}': Created the dependency graph '{1}'.".format(name, graph_name + ".png"))
-
-        data.update(current_module_dep_data)
-
-    module_dependency_filename = os.path.join("output", EPICS_BASE_VERSION, "module_dependencies.txt")
-    _produce_module_dependency_file(module_dependency_filename, data)
-    logger.info("Created module dependency output file '{0}'".format(module_dependency_filename))
+def _list_releases(epics_versions, listing_backend="native", listing_timeout=None):
+    """
+    List the modules of several EPICS versions concurrently, since each listing mostly waits on the file system or on
+    the external tool.
+
+    Parameters
+    ----------
+    epics_versions : list
+        The EPICS versions to list the modules of
+    listing_backend : str
+        "native" to list the modules by scanning the EPICS modules directories, or "epics-versions" to list them with
+        the external 'epics-versions' tool
+    listing_timeout : float
+        The maximum number of seconds to wait for each 'epics-versions' listing. If None, wait indefinitely.
+
+    Returns : OrderedDict
+    -------
+        For each EPICS version, its module dictionary keyed by 'name/version' identifiers
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from epics_build_analysis_launcher.module_listing import list_modules, list_modules_with_epics_versions
+
+    with ThreadPoolExecutor(max_workers=min(len(epics_versions), 8)) as executor:
+        if listing_backend == "native":
+            futures = [executor.submit(list_modules, epics_version) for epics_version in epics_versions]
+        else:
+            futures = [executor.submit(list_modules_with_epics_versions, epics_version, timeout=listing_timeout)
+                       for epics_version in epics_versions]
+        return OrderedDict((epics_version, future.result()) for epics_version, future in zip(epics_versions, futures))
+
+
+def compare_module_lists(prev_epics_version, current_epics_version, listing_backend="native", listing_timeout=None):
+    """
+    Write the modules present in the previous EPICS version but not in the current one, and the validated list of the
+    current EPICS version's modules, to the output directory.
+
+    Parameters
+    ----------
+    prev_epics_version : str
+        The EPICS version to compare from
+    current_epics_version : str
+        The EPICS version to compare to
+    listing_backend : str
+        "native" to list the modules by scanning the EPICS modules directories, or "epics-versions" to list them with
+        the external 'epics-versions' tool
+    listing_timeout : float
+        The maximum number of seconds to wait for each 'epics-versions' listing. If None, wait indefinitely.
+    """
+    listings = _list_releases([prev_epics_version, current_epics_version], listing_backend=listing_backend,
+                              listing_timeout=listing_timeout)
+    prev_modules, current_modules = listings.values()
+
+    # The descriptions may be empty, so only the identifiers are compared
+    for k in current_modules.keys():
+        if k in prev_modules:
+            del prev_modules[k]
+
+    diff_filename = os.path.join("output", "diff_" + prev_epics_version + "_from_" + current_epics_version + ".txt")
+    _produce_output_file(diff_filename, prev_modules)
+
+    filtered_current_module_filename = os.path.join("output", "filtered_" + current_epics_version + ".txt")
+    _produce_output_file(filtered_current_module_filename, current_modules, validate_module_names=True)
+
+    logger.info("Check the output files at '%s'", diff_filename)
+
+
+def compare_releases(epics_versions, listing_backend="native", listing_timeout=None):
+    """
+    Compare the module listings of several EPICS versions at once. Each listing is loaded once, and the outputs are:
+
+    * 'output/release_matrix.csv', with the versions of each module present in each EPICS version
+    * 'output/diff_<epics_version>_from_<other_epics_version>.txt' for every ordered pair of EPICS versions, with the
+      modules present in the first EPICS version but not in the second
+
+    Parameters
+    ----------
+    epics_versions : list
+        The EPICS versions to compare
+    listing_backend : str
+        "native" to list the modules by scanning the EPICS modules directories, or "epics-versions" to list them with
+        the external 'epics-versions' tool
+    listing_timeout : float
+        The maximum number of seconds to wait for each 'epics-versions' listing. If None, wait indefinitely.
+    """
+    epics_versions = list(OrderedDict.fromkeys(epics_versions))
+    listings = _list_releases(epics_versions, listing_backend=listing_backend, listing_timeout=listing_timeout)
+    from epics_build_analysis_launcher.release_matrix import ReleaseMatrix
+    release_matrix = ReleaseMatrix(listings)
+
+    matrix_filename = os.path.join("output", "release_matrix.csv")
+    release_matrix.write_csv(matrix_filename)
+    logger.info("Created the release matrix '%s'", matrix_filename)
+
+    for (epics_version, other_epics_version), module_ids in release_matrix.get_differences().items():
+        diff_filename = os.path.join("output", "diff_" + epics_version + "_from_" + other_epics_version + ".txt")
+        _produce_output_file(diff_filename, OrderedDict.fromkeys(module_ids))
+    logger.info("Created the module list differences of every pair of the %d EPICS versions", len(epics_versions))
+
+
+def _warn_invalid_version_tags(analyzer):
+    invalid_module_ids = analyzer.get_invalid_module_ids()
+    if invalid_module_ids:
+        logger.warning("%d module versions have an invalid version tag: %s", len(invalid_module_ids),
+                       ", ".join(invalid_module_ids))
+
+
+def _write_complete_outputs(analyzer, write_html=False, write_sqlite=False, write_binary=False,
+                            generate_complete_dep_graph=False, collapse_module_versions=False, cluster_by=None,
+                            reduce_complete_graph=False):
+    """
+    Write the outputs built from the resolved dependencies of all the analyzed module versions.
+
+    Parameters
+    ----------
+    analyzer : BuildAnalyzer
+        The analyzer holding the resolved dependencies
+    write_html : bool
+        True to write the HTML dependency browser
+    write_sqlite : bool
+        True to write the SQLite dependency database
+    write_binary : bool
+        True to write the binary dependency graph
+    generate_complete_dep_graph : bool
+        True to draw the dependency graph of all the module versions
+    collapse_module_versions : bool
+        True to show a single node per module in the complete dependency graph
+    cluster_by : str
+        "type" or "family" to group the nodes of the complete dependency graph into clusters, or None
+    reduce_complete_graph : bool
+        True to remove the edges already implied by other dependencies from the complete dependency graph
+    """
+    timings = analyzer.timings
+    data, universe, epics_version = analyzer.data, analyzer.universe, analyzer.epics_version
+
+    timings.start_phase("output", total=write_html + write_sqlite + write_binary)
+    if write_html:
+        from epics_build_analysis_launcher.html_browser import write_html_browser
+        with timings.measure("html_output"):
+            html_filename = write_html_browser(analyzer.get_output_path("html"), data, universe, epics_version)
+        logger.info("Created the HTML dependency browser '%s'", html_filename)
+        timings.advance()
+
+    if write_sqlite:
+        from epics_build_analysis_launcher.sqlite_export import export_sqlite
+        db_filename = analyzer.get_output_path("dependencies.sqlite")
+        with timings.measure("sqlite_output"):
+            export_sqlite(db_filename, data, universe, epics_version,
+                          transitive_reduction=analyzer.reduce_transitive_edges)
+        logger.info("Created the dependency database '%s'", db_filename)
+        timings.advance()
+
+    if write_binary:
+        from epics_build_analysis_launcher.binary_graph import write_binary_graph
+        binary_filename = analyzer.get_output_path("dependencies.csr")
+        with timings.measure("binary_output"):
+            write_binary_graph(binary_filename, data, transitive_reduction=analyzer.reduce_transitive_edges)
+        logger.info("Created the binary dependency graph '%s'", binary_filename)
+        timings.advance()
 
     if generate_complete_dep_graph:
-        g = _generate_graph(data, universe=universe, format='png')
-        graph_name = "all_dependencies"
-        path = os.path.join("output", EPICS_BASE_VERSION)
-        g.render(filename=graph_name, directory=os.path.abspath(path), cleanup=True)
-        logger.info("Created the dependency graph '{0}'.".format(graph_name + ".png"))
+        timings.start_phase("complete_graph", total=1)
+        analyzer.render_complete_graph(collapse_module_versions=collapse_module_versions, cluster_by=cluster_by,
+                                       reduce_complete_graph=reduce_complete_graph)
+        timings.advance()
 
 
-def main():
-    args, extra_args = _parse_arguments()
-    _create_directory("output")
+def _watch_module_dependencies(analyzer, interval, module_dependency_filename, compress_output=False,
+                               render_graphs=True, latest=None, since_version=None, **output_options):
+    """
+    Poll the modules directory for new, removed or changed module versions until interrupted, and update the outputs
+    after each change: only the dependency graphs of the module versions depending on a changed one are drawn again.
+    A failure, e.g. a file system or dot error, is logged, and what was not done is tried again after the next poll.
 
+    Parameters
+    ----------
+    analyzer : BuildAnalyzer
+        The analyzer holding the resolved dependencies of the analysis to update
+    interval : float
+        The number of seconds between two polls
+    module_dependency_filename : str
+        The module dependency file to write again after each change
+    compress_output : bool
+        True to write the module dependency file with gzip compression
+    render_graphs : bool
+        True to draw the dependency graphs of the module versions affected by each change
+    latest : int
+        The number of newest versions of each module to analyze, as in the analysis. If None, all the versions.
+    since_version : str
+        The oldest version tag to analyze, as in the analysis. If None, the versions regardless of their age.
+    output_options : dict
+        The outputs built from all the resolved dependencies to write again after each change; see
+        _write_complete_outputs()
+    """
+    timings = analyzer.timings
+    logger.info("Watching '%s' for changes every %s seconds. Press Ctrl+C to stop.", analyzer.modules_top, interval)
+    # The changes not applied yet, the module versions resolved again whose graphs are not drawn yet, and whether the
+    # outputs are out of date, which are carried over to the next poll if a step fails, e.g. on a transient AFS error
+    pending_ids = set()
+    render_ids = set()
+    outputs_stale = False
+    try:
+        while True:
+            time.sleep(interval)
+            try:
+                added_ids, removed_ids, changed_ids = analyzer.poll()
+                if added_ids or removed_ids or changed_ids:
+                    logger.info("Found %d added, %d removed and %d changed module versions: %s", len(added_ids),
+                                len(removed_ids), len(changed_ids),
+                                ", ".join(sorted(added_ids + removed_ids + changed_ids, key=module_sort_key)))
+                    pending_ids.update(added_ids + removed_ids + changed_ids)
+
+                if pending_ids:
+                    module_ids = None
+                    if latest is not None or since_version is not None:
+                        module_ids = analyzer.select_modules(latest=latest, since_version=since_version)
+                    timings.start_phase("update")
+                    resolved_ids = analyzer.update(sorted(pending_ids, key=module_sort_key), module_ids=module_ids)
+                    pending_ids.clear()
+                    if render_graphs:
+                        render_ids.update(resolved_ids)
+                    outputs_stale = True
+                    logger.info("Resolved %d module versions again.", len(resolved_ids))
+
+                if render_ids:
+                    timings.set_phase_total(len(render_ids))
+                    for module_id in sorted(render_ids, key=module_sort_key):
+                        # The module version may have been removed since it was resolved
+                        if module_id in analyzer.data:
+                            analyzer.render_module_graph(module_id, analyzer.get_dependency_tree(module_id))
+                        render_ids.discard(module_id)
+                        timings.advance()
+
+                if outputs_stale:
+                    with timings.measure("text_output"):
+                        _produce_module_dependency_file(module_dependency_filename, analyzer.data,
+                                                        compress=compress_output)
+                    _log_unresolved_dependencies(analyzer.unresolved)
+                    _write_complete_outputs(analyzer, **output_options)
+                    outputs_stale = False
+                    logger.info("Updated the outputs.")
+            except Exception:
+                # The watcher runs for days, so a failure is retried at the next poll rather than ending it
+                logger.exception("Could not update the analysis of '%s'. Trying again in %s seconds.",
+                                 analyzer.modules_top, interval)
+    except KeyboardInterrupt:
+        logger.info("Stopped watching '%s'.", analyzer.modules_top)
+
+
+def analyze_module_dependencies(current_epics_version, generate_complete_dep_graph, render_cache=None,
+                                collapse_module_versions=False, cluster_by=None, reduce_complete_graph=False,
+                                reduce_transitive_edges=False, render_graphs=True, write_html=False,
+                                layout_engine="dot", compress_output=False, write_sqlite=False,
+                                write_binary=False, latest=None, since_version=None, watch_interval=None,
+                                timings=None):
+    """
+    Analyze the module dependencies of an EPICS version, and write the outputs to 'output/<current_epics_version>'.
+    If watch_interval is given, keep watching the modules directory for changes afterwards, and update the outputs.
+
+    Returns : BuildAnalyzer
+    -------
+        The analyzer, holding the universe of the EPICS version, and its resolved dependencies if an output needing
+        them all was written
+    """
+    from epics_build_analysis_launcher.epics_item import Item
+    from epics_build_analysis_launcher.build_analyzer import BuildAnalyzer
+    from epics_build_analysis_launcher.dependency_writer import ModuleDependencyWriter
+    from epics_build_analysis_launcher.timings import Timings
+    from epics_build_analysis_launcher.pipeline import Pipeline
+
+    if timings is None:
+        timings = Timings()
+    analyzer = BuildAnalyzer(current_epics_version, render_cache=render_cache, layout_engine=layout_engine,
+                             reduce_transitive_edges=reduce_transitive_edges,
+                             track_changes=watch_interval is not None, timings=timings)
+    # Report the graph counts even if no graph is rendered, e.g. to alert on a drop to zero
+    timings.add_count("graphs_rendered", 0)
+    timings.add_count("graphs_reused", 0)
+
+    # The module versions are discovered, parsed, resolved, rendered and written by a pipeline of stages running
+    # concurrently, so that the first graphs are rendered while the modules directory is still being listed, and only
+    # a bounded number of module versions are in flight between two stages.
+    stream_discovery = latest is None and since_version is None
+    if stream_discovery:
+        timings.start_phase("analysis")
+        source = analyzer.discover_modules()
+    else:
+        # The newest versions of each module are only known once all of them are discovered
+        timings.start_phase("discovery")
+        analyzer.discover()
+        _warn_invalid_version_tags(analyzer)
+
+        # The directory listing is cheap, so the universe always has every module version, to resolve the
+        # dependencies of the selected ones. Only the selected module versions are parsed, resolved and rendered.
+        timings.start_phase("selection")
+        with timings.measure("selection"):
+            selected_module_ids = analyzer.select_modules(latest=latest, since_version=since_version)
+        timings.add_count("modules_selected", len(selected_module_ids))
+        timings.start_phase("analysis", total=len(selected_module_ids))
+        source = [analyzer.universe[module_id] for module_id in selected_module_ids]
+
+    # The complete data is only kept if it is needed once all the modules are analyzed. Otherwise, the entry of each
+    # module is passed on to the module dependency file as soon as it is resolved, and then released.
+    keep_data = (generate_complete_dep_graph or write_html or write_sqlite or write_binary or
+                 watch_interval is not None)
+
+    _create_directory(analyzer.get_output_path())
+    module_dependency_filename = analyzer.get_output_path("module_dependencies.txt")
+    if compress_output:
+        module_dependency_filename += ".gz"
+    # The modules are resolved in the order their dependencies are discovered, so the writer sorts them
+    module_dependency_writer = ModuleDependencyWriter(module_dependency_filename, compress=compress_output,
+                                                      sort_key=module_sort_key)
+
+    parse_cache_hits, parse_cache_misses = Item.parse_cache_hits, Item.parse_cache_misses
+
+    def parse(items):
+        for itm in items:
+            yield analyzer.parse(itm)
+
+    def resolve(items):
+        for module_id, current_module_dep_data in analyzer.resolve_discovered(items, keep=keep_data):
+            yield module_id, current_module_dep_data
+        if stream_discovery:
+            timings.add_count("modules_selected", len(analyzer.universe))
+            timings.set_phase_total(len(analyzer.universe))
+
+    def render(entries):
+        for module_id, current_module_dep_data in entries:
+            if render_graphs:
+                analyzer.render_module_graph(module_id, current_module_dep_data)
+            yield module_id, current_module_dep_data
+
+    pipeline = Pipeline(source).add_stage("parse", parse).add_stage("resolve", resolve).add_stage("render", render)
+    with module_dependency_writer:
+        for module_id, current_module_dep_data in pipeline:
+            with timings.measure("text_output", module_id):
+                module_dependency_writer.write(module_id, current_module_dep_data[module_id])
+            timings.advance()
+
+    if stream_discovery:
+        _warn_invalid_version_tags(analyzer)
+    # Keep the outputs of the complete data in a stable order, whatever the order the modules were resolved in
+    analyzer.sort_data()
+
+    # The other roots are not analyzed, but they are listed for the timings and the metrics
+    analyzer.discover_other_items()
+
+    _log_unresolved_dependencies(analyzer.unresolved)
+    for kind in ("module", "package"):
+        timings.add_count("unresolved_dependencies", len(analyzer.unresolved[kind]), labels={"kind": kind})
+    timings.add_count("parse_cache_hits", Item.parse_cache_hits - parse_cache_hits)
+    timings.add_count("parse_cache_misses", Item.parse_cache_misses - parse_cache_misses)
+    logger.info("Created module dependency output file '%s'", module_dependency_filename)
+
+    _write_complete_outputs(analyzer, write_html=write_html, write_sqlite=write_sqlite, write_binary=write_binary,
+                            generate_complete_dep_graph=generate_complete_dep_graph,
+                            collapse_module_versions=collapse_module_versions, cluster_by=cluster_by,
+                            reduce_complete_graph=reduce_complete_graph)
+
+    if watch_interval is not None:
+        _watch_module_dependencies(analyzer, watch_interval, module_dependency_filename,
+                                   compress_output=compress_output, render_graphs=render_graphs, latest=latest,
+                                   since_version=since_version, write_html=write_html, write_sqlite=write_sqlite,
+                                   write_binary=write_binary, generate_complete_dep_graph=generate_complete_dep_graph,
+                                   collapse_module_versions=collapse_module_versions, cluster_by=cluster_by,
+                                   reduce_complete_graph=reduce_complete_graph)
+    return analyzer
+
+
+def _run_analysis(args, timings):
+    """
+    Run the module list comparisons and the dependency analysis requested on the command line.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        The command arguments
+    timings : Timings
+        The timings to record the phases of the run in
+    """
     current_epics_version = args.current_epics_version
+    if args.compare_releases or args.compare_file_lists:
+        timings.start_phase("compare", total=bool(args.compare_releases) + bool(args.compare_file_lists))
+    if args.compare_releases:
+        with timings.measure("compare", "releases") as measurement:
+            compare_releases([current_epics_version] + args.compare_releases, listing_backend=args.listing_backend,
+                             listing_timeout=args.listing_timeout)
+            measurement.count = len(args.compare_releases) + 1
+        timings.advance()
     if args.compare_file_lists:
         prev_epics_version = args.compare_file_lists
-        compare_module_lists(prev_epics_version, current_epics_version)
+        with timings.measure("compare", "file lists") as measurement:
+            compare_module_lists(prev_epics_version, current_epics_version, listing_backend=args.listing_backend,
+                                 listing_timeout=args.listing_timeout)
+            measurement.count = 2
+        timings.advance()
+
+    render_cache = None
+    if args.use_render_cache:
+        from epics_build_analysis_launcher.render_cache import RenderCache
+        render_cache = RenderCache(args.render_cache_dir)
+    analyze_module_dependencies(current_epics_version, args.complete_dep_graph, render_cache=render_cache,
+                                collapse_module_versions=args.collapse_versions, cluster_by=args.cluster_by,
+                                reduce_complete_graph=args.reduce_complete_graph,
+                                reduce_transitive_edges=args.transitive_reduction,
+                                render_graphs=args.render_graphs, write_html=args.html,
+                                layout_engine=args.layout_engine, compress_output=args.compress_output,
+                                write_sqlite=args.sqlite, write_binary=args.binary_graph, latest=args.latest,
+                                since_version=args.since_version,
+                                watch_interval=args.watch_interval if args.watch else None, timings=timings)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "query":
+        args = _parse_query_arguments(sys.argv[2:])
+        configure_logging()
+        sys.exit(run_query(args))
+    if len(sys.argv) > 1 and sys.argv[1] == "diff":
+        args = _parse_diff_arguments(sys.argv[2:])
+        configure_logging()
+        sys.exit(run_diff(args))
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        args = _parse_serve_arguments(sys.argv[2:])
+        configure_logging()
+        run_serve(args)
+        return
 
-    analyze_module_dependencies(current_epics_version, args.complete_dep_graph)
+    args, extra_args = _parse_arguments()
+    from epics_build_analysis_launcher.timings import Timings
+    timings = Timings(slowest_count=args.timings_slowest)
+    progress_reporter = None
+    if args.progress != "none":
+        from epics_build_analysis_launcher.progress import ProgressReporter
+        progress_interactive = sys.stderr.isatty() if args.progress == "auto" else args.progress == "tty"
+        progress_reporter = ProgressReporter(timings, interactive=progress_interactive,
+                                             interval=args.progress_interval)
+    # The console log messages are written above the status line, which stays at the bottom of the terminal
+    configure_logging(console_stream=progress_reporter.get_log_stream() if progress_reporter else None)
+    _create_directory("output")
+
+    metrics_writer = None
+    if args.metrics_file:
+        from epics_build_analysis_launcher.metrics import MetricsWriter
+        metrics_writer = MetricsWriter(args.metrics_file, timings, labels={"epics_version": args.current_epics_version},
+                                       interval=args.metrics_interval)
+    profiler = None
+    if args.profile == "cpu":
+        from epics_build_analysis_launcher.profiling import CpuProfiler
+        profiler = CpuProfiler()
+    elif args.profile == "mem":
+        from epics_build_analysis_launcher.profiling import MemoryProfiler
+        profiler = MemoryProfiler()
+        timings.add_phase_callback(profiler.snapshot)
+
+    if profiler:
+        profiler.start()
+    if progress_reporter:
+        progress_reporter.start()
+    if metrics_writer:
+        metrics_writer.start()
+    success = False
+    try:
+        _run_analysis(args, timings)
+        success = True
+    finally:
+        if progress_reporter:
+            progress_reporter.stop()
+        if metrics_writer:
+            metrics_writer.stop(success)
+            logger.info("Updated the metrics file '%s'", args.metrics_file)
+        # Keep the profile of a failed run too, since it may show where it failed
+        if profiler:
+            profiler.stop()
+            path = os.path.join("output", args.current_epics_version)
+            _create_directory(path)
+            for profile_filename in profiler.write(os.path.join(path, "profile_" + args.profile)):
+                logger.info("Created the profile '%s'", profile_filename)
+
+    if args.timings:
+        timings_filename = os.path.join("output", args.current_epics_version, "timings.json")
+        timings.write_json(timings_filename)
+        logger.info("Created the timing report '%s'", timings_filename)
 
 
 if __name__ == "__main__":
     try:
         main()
     except Exception as error:
-        logger.error("\nUnexpected exception while running the analysis. Exception type: {0}. Exception: {1}"
-                     .format(type(error), error))
+        logger.error("\nUnexpected exception while running the analysis. Exception type: %s. Exception: %s",
+                     type(error), error)
+        flush_logging()
         traceback.print_exc()
-        for h in logger.handlers:
-            h.flush()
@@ -0,0 +1,174 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from epics_build_analysis.epics_build_analysis_logging import logging
+logger = logging.getLogger(__name__)
+
+_METRIC_PREFIX = "epics_build_analysis_"
+
+# The help text of the counts recorded by the analysis, exported as gauges named after them
+COUNT_HELP = OrderedDict([
+    ("items_discovered", "The number of items found in each root directory, by item type."),
+    ("modules_selected", "The number of module versions selected for the analysis."),
+    ("unresolved_dependencies", "The number of dependencies not found in the analyzed build, by kind."),
+    ("graphs_rendered", "The number of dependency graphs rendered."),
+    ("graphs_reused", "The number of dependency graphs reused from the render cache instead of being rendered."),
+    ("parse_cache_hits", "The number of dependency lookups answered from already parsed dependency files."),
+    ("parse_cache_misses", "The number of dependency files parsed."),
+])
+
+
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace("\"", "\\\"")
+
+
+def _format_sample(name, labels, value):
+    if labels:
+        label_text = ",".join("{0}=\"{1}\"".format(key, _escape_label_value(labels[key])) for key in sorted(labels))
+        name = "{0}{{{1}}}".format(name, label_text)
+    return "{0} {1}\n".format(name, repr(float(value)))
+
+
+def format_metrics(timings, labels=None, in_progress=False, success=None):
+    """
+    Format the metrics of a run in the Prometheus text exposition format.
+
+    Parameters
+    ----------
+    timings : Timings
+        The timings and the counts of the run
+    labels : dict
+        The labels to add to every metric, e.g. {"epics_version": "R3.15.5-1.1"}
+    in_progress : bool
+        True if the run is still in progress
+    success : bool
+        Whether the run succeeded. If None, e.g. while the run is in progress, the success metric is left out.
+
+    Returns : str
+    -------
+        The metrics
+    """
+    labels = labels or {}
+    metrics = OrderedDict()
+
+    def add(name, help_text, sample_labels, value):
+        metric = metrics.setdefault(_METRIC_PREFIX + name, (help_text, []))
+        sample = dict(labels)
+        sample.update(sample_labels)
+        metric[1].append((sample, value))
+
+    report = timings.to_dict()
+    add("run_start_timestamp_seconds", "The time the run started, in seconds since the epoch.", {},
+        timings.start_time)
+    add("run_wall_seconds", "The wall time of the run so far.", {}, report["wall_time"])
+    add("run_cpu_seconds", "The CPU time of the run so far.", {}, report["cpu_time"])
+    add("run_in_progress", "1 if the run is in progress, 0 if it has ended.", {}, 1 if in_progress else 0)
+    if success is not None:
+        add("run_success", "1 if the run succeeded, 0 if it failed.", {}, 1 if success else 0)
+    add("last_update_timestamp_seconds", "The time these metrics were written, in seconds since the epoch.", {},
+        time.time())
+
+    for phase, totals in report["phases"].items():
+        add("phase_wall_seconds", "The wall time of each phase.", {"phase": phase}, totals["wall_time"])
+        add("phase_cpu_seconds", "The CPU time of each phase, excluding child processes such as dot.",
+            {"phase": phase}, totals["cpu_time"])
+        add("phase_items", "The number of items processed by each phase.", {"phase": phase}, totals["count"])
+
+    counts = dict()
+    for name, count_labels, value in timings.get_counts():
+        add(name, COUNT_HELP.get(name, "The {0} of the run.".format(name.replace("_", " "))), count_labels, value)
+        counts[name] = counts.get(name, 0) + value
+
+    lookups = counts.get("parse_cache_hits", 0) + counts.get("parse_cache_misses", 0)
+    if lookups:
+        add("parse_cache_hit_ratio", "The share of the dependency lookups answered from already parsed dependency "
+                                     "files.", {}, counts.get("parse_cache_hits", 0) / float(lookups))
+
+    lines = []
+    for name, (help_text, samples) in metrics.items():
+        lines.append("# HELP {0} {1}\n".format(name, help_text))
+        lines.append("# TYPE {0} gauge\n".format(name))
+        lines.extend(_format_sample(name, sample_labels, value) for sample_labels, value in samples)
+    return "".join(lines)
+
+
+def write_metrics(filename, timings, labels=None, in_progress=False, success=None):
+    """
+    Write the metrics of a run to a file, e.g. for the textfile collector of the Prometheus node exporter.
+
+    The metrics are written to a temporary file in the same directory, which then replaces the file, so that the
+    collector never reads a partially written file.
+
+    Parameters
+    ----------
+    filename : str
+        The path to the metrics file, which should have the '.prom' extension to be picked up by the collector
+    timings : Timings
+        The timings and the counts of the run
+    labels : dict
+        The labels to add to every metric
+    in_progress : bool
+        True if the run is still in progress
+    success : bool
+        Whether the run succeeded, or None if unknown
+    """
+    temp_filename = "{0}.{1}.tmp".format(filename, os.getpid())
+    with open(temp_filename, 'w') as metrics_file:
+        metrics_file.write(format_metrics(timings, labels=labels, in_progress=in_progress, success=success))
+    os.replace(temp_filename, filename)
+
+
+class MetricsWriter:
+    """
+    Write the metrics of a run periodically from a background thread, and once more when the run ends.
+    """
+    def __init__(self, filename, timings, labels=None, interval=None):
+        """
+        Parameters
+        ----------
+        filename : str
+            The path to the metrics file
+        timings : Timings
+            The timings and the counts of the run
+        labels : dict
+            The labels to add to every metric
+        interval : float
+            The number of seconds between two updates while the run is in progress. If None, the metrics are only
+            written when the run ends.
+        """
+        self.filename = filename
+        self.timings = timings
+        self.labels = labels
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval is None:
+            return
+        self._thread = threading.Thread(target=self._run, name="metrics")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                write_metrics(self.filename, self.timings, labels=self.labels, in_progress=True)
+            except (IOError, OSError) as error:
+                logger.warning("Could not update the metrics file '%s': %s", self.filename, error)
+
+    def stop(self, success):
+        """
+        Stop the periodic updates, and write the final metrics of the run.
+
+        Parameters
+        ----------
+        success : bool
+            Whether the run succeeded
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        write_metrics(self.filename, self.timings, labels=self.labels, in_progress=False, success=success)
@@ -0,0 +1,150 @@
+import os
+import threading
+from subprocess import Popen, PIPE, TimeoutExpired
+from collections import OrderedDict
+
+from epics_build_analysis.epics_build_analysis_logging import logging
+logger = logging.getLogger(__name__)
+
+
+EPICS_SITE_TOP = os.path.join('/', "afs", "slac", "g", "lcls", "epics")
+
+
+def get_epics_modules_top(epics_version, epics_site_top=EPICS_SITE_TOP):
+    """
+    Get the directory holding the modules built for an EPICS version.
+
+    Parameters
+    ----------
+    epics_version : str
+        The EPICS version
+    epics_site_top : str
+        The directory holding the EPICS versions
+
+    Returns : str
+    -------
+        The modules directory
+    """
+    return os.path.join(epics_site_top, epics_version, "modules")
+
+
+def _list_subdirectories(path):
+    with os.scandir(path) as entries:
+        return sorted((entry.name, entry.path) for entry in entries
+                      if entry.is_dir() and not entry.name.startswith('.'))
+
+
+def list_modules(epics_version, epics_site_top=EPICS_SITE_TOP):
+    """
+    List all the versions of all the modules built for an EPICS version, by scanning its modules directory.
+
+    This is the in-process equivalent of 'epics-versions modules -a --base=<epics_version>'.
+
+    Parameters
+    ----------
+    epics_version : str
+        The EPICS version
+    epics_site_top : str
+        The directory holding the EPICS versions
+
+    Returns : OrderedDict
+    -------
+        The path to each module version, keyed by its 'name/version' identifier, in sorted order
+    """
+    modules = OrderedDict()
+    for module_name, module_path in _list_subdirectories(get_epics_modules_top(epics_version, epics_site_top)):
+        for version, version_path in _list_subdirectories(module_path):
+            modules["{0}/{1}".format(module_name, version)] = version_path
+    return modules
+
+
+def parse_listing_line(line):
+    """
+    Parse a line of an 'epics-versions' module listing.
+
+    Each line is expected to have two strings, separated by spaces: the module's 'name/version' identifier, and a
+    description of the module version.
+
+    Parameters
+    ----------
+    line : str
+        The line to parse
+
+    Returns : tuple
+    -------
+        The identifier and the description, or None if the line is blank
+    """
+    tokens = line.split()
+    if not tokens:
+        return None
+    return tokens[0], tokens[1] if len(tokens) > 1 else ""
+
+
+def list_modules_with_epics_versions(epics_version, timeout=None):
+    """
+    List all the versions of all the modules built for an EPICS version with the external 'epics-versions' tool.
+
+    The tool's output is parsed line by line as it is produced, so that no intermediate file is needed, and the tool
+    is killed if it does not finish in time.
+
+    Parameters
+    ----------
+    epics_version : str
+        The EPICS version
+    timeout : float
+        The maximum number of seconds to wait for the tool to finish. If None, wait indefinitely.
+
+    Returns : OrderedDict
+    -------
+        The description of each module version, keyed by its 'name/version' identifier, in the tool's order
+
+    Raises
+    ------
+    subprocess.TimeoutExpired
+        If the tool did not finish in time
+    """
+    cmd = ["epics-versions", "modules", "-a", "--base=" + epics_version]
+    logger.info("Running command: %s", " ".join(cmd))
+
+    proc = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE, universal_newlines=True)
+    proc.stdin.close()
+
+    timed_out = threading.Event()
+
+    def kill():
+        timed_out.set()
+        proc.kill()
+
+    timer = threading.Timer(timeout, kill) if timeout else None
+    if timer is not None:
+        timer.daemon = True
+        timer.start()
+
+    # Drain stderr concurrently, so that the tool cannot block on a full stderr pipe while stdout is being read
+    stderr_lines = []
+    stderr_reader = threading.Thread(target=lambda: stderr_lines.extend(proc.stderr))
+    stderr_reader.daemon = True
+    stderr_reader.start()
+
+    modules = OrderedDict()
+    try:
+        for line in proc.stdout:
+            entry = parse_listing_line(line)
+            if entry is not None:
+                modules[entry[0]] = entry[1]
+        return_code = proc.wait()
+    finally:
+        if timer is not None:
+            timer.cancel()
+        stderr_reader.join()
+        proc.stdout.close()
+        proc.stderr.close()
+
+    if timed_out.is_set():
+        raise TimeoutExpired(cmd, timeout)
+
+    logger.info("'%s' return code: %s", " ".join(cmd), return_code)
+    if stderr_lines:
+        logger.debug("### stderr ###")
+        logger.debug("%s", "".join(stderr_lines))
+    return modules
@@ -0,0 +1,152 @@
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+# How often, in seconds, a stage blocked on a queue checks whether the pipeline was stopped
+_POLL_INTERVAL = 0.1
+
+_END = object()
+
+
+class _Stopped(Exception):
+    """
+    Raised in a stage thread to unwind it when the pipeline is stopped.
+    """
+
+
+class Pipeline:
+    """
+    A chain of stages, each running in its own thread, connected by bounded queues.
+
+    Each stage is a function taking an iterator over the outputs of the previous stage, and returning an iterator over
+    its own outputs, typically a generator. The outputs of the last stage are iterated over in the calling thread. A
+    stage that falls behind makes the previous stages wait once the queue between them is full, so that the number of
+    items in flight stays bounded, while the stages waiting on I/O, e.g. dot, overlap with the others.
+
+    If a stage raises an exception, the pipeline is stopped, and the exception is raised again in the calling thread.
+    If a stage thread dies without running its stage, a RuntimeError is raised instead.
+    """
+    def __init__(self, source, queue_size=64):
+        """
+        Parameters
+        ----------
+        source : iterable
+            The items to feed the first stage with. It is iterated over in a thread of its own.
+        queue_size : int
+            The maximum number of items waiting between two stages
+        """
+        self._source = source
+        self._queue_size = queue_size
+        self._stages = []
+        self._stopped = threading.Event()
+        self._error = None
+        self._error_lock = threading.Lock()
+
+    def add_stage(self, name, function):
+        """
+        Add a stage at the end of the pipeline.
+
+        Parameters
+        ----------
+        name : str
+            The name of the stage, used as the name of its thread
+        function : callable
+            The function taking an iterator over the outputs of the previous stage, and returning an iterator over the
+            outputs of this stage
+
+        Returns : Pipeline
+        -------
+            This pipeline, to chain the calls
+        """
+        self._stages.append((name, function))
+        return self
+
+    def _put(self, output_queue, item):
+        while not self._stopped.is_set():
+            try:
+                output_queue.put(item, timeout=_POLL_INTERVAL)
+                return
+            except queue.Full:
+                pass
+        raise _Stopped()
+
+    def _set_error(self, error):
+        with self._error_lock:
+            if self._error is None:
+                self._error = error
+        self._stopped.set()
+
+    def _iterate(self, input_queue, threads, index):
+        # The items of the queue are put by the thread at the same index
+        while True:
+            try:
+                item = input_queue.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                if self._stopped.is_set():
+                    raise _Stopped()
+                # A thread may die before running its stage, e.g. if a profiler fails to start in it, and then never
+                # ends its queue
+                producer = threads[index]
+                if not producer.is_alive() and input_queue.empty():
+                    self._set_error(RuntimeError("The '{0}' pipeline thread stopped without finishing its stage."
+                                                 .format(producer.name)))
+                    raise _Stopped()
+                continue
+            if item is _END:
+                return
+            yield item
+
+    def _run_stage(self, items, output_queue):
+        try:
+            for item in items:
+                self._put(output_queue, item)
+            self._put(output_queue, _END)
+        except _Stopped:
+            pass
+        except BaseException as error:
+            self._set_error(error)
+
+    def __iter__(self):
+        queues = [queue.Queue(self._queue_size) for _ in range(len(self._stages) + 1)]
+        threads = [threading.Thread(target=self._run_stage, args=(iter(self._source), queues[0]), name="source")]
+        for i, (name, function) in enumerate(self._stages):
+            items = _LazyIterator(function, self._iterate(queues[i], threads, i))
+            threads.append(threading.Thread(target=self._run_stage, args=(items, queues[i + 1]), name=name))
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        try:
+            for item in self._iterate(queues[-1], threads, len(threads) - 1):
+                yield item
+        except _Stopped:
+            pass
+        finally:
+            self._stopped.set()
+            for thread in threads:
+                thread.join()
+        if self._error is not None:
+            raise self._error
+
+
+class _LazyIterator:
+    """
+    Call a stage function in the stage's own thread, when its outputs are first requested.
+    """
+    def __init__(self, function, items):
+        self._function = function
+        self._items = items
+        self._iterator = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._iterator is None:
+            self._iterator = iter(self._function(self._items))
+        return next(self._iterator)
+
+    next = __next__
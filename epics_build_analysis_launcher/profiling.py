@@ -0,0 +1,232 @@
+import sys
+import pstats
+import cProfile
+import threading
+import linecache
+import tracemalloc
+
+# The call paths whose share of the profiled time is smaller than this many microseconds are left out of the collapsed
+# stacks, so that a densely connected call graph cannot make them explode
+_MIN_STACK_MICROSECONDS = 1
+
+# From Python 3.12, cProfile relies on sys.monitoring, whose events are those of all the threads, so a single profile
+# covers them all, and a second profile cannot be enabled in another thread
+_PROFILE_ALL_THREADS = sys.version_info >= (3, 12)
+
+
+class CpuProfiler:
+    """
+    Profile the CPU time of the functions called in the calling thread, and in the threads started while profiling,
+    e.g. the stages of the analysis pipeline, with cProfile. Before Python 3.12, each thread started while profiling
+    gets a profile of its own, and the profiles are merged.
+    """
+    def __init__(self):
+        self._profile = cProfile.Profile()
+        self._thread_profiles = []
+
+    def _start_thread_profile(self, frame, event, arg):
+        # Called for the first event of each new thread, to replace itself with a profile of that thread
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        self._thread_profiles.append(profile)
+        profile.enable()
+
+    def start(self):
+        if not _PROFILE_ALL_THREADS:
+            threading.setprofile(self._start_thread_profile)
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+        if not _PROFILE_ALL_THREADS:
+            threading.setprofile(None)
+
+    def get_stats(self, stream=None):
+        """
+        Get the statistics of all the profiled threads.
+
+        Parameters
+        ----------
+        stream : file
+            The stream to print the statistics to
+
+        Returns : pstats.Stats
+        -------
+            The statistics of the profiled threads, merged
+        """
+        stats = pstats.Stats(self._profile, stream=stream)
+        for profile in self._thread_profiles:
+            stats.add(profile)
+        return stats
+
+    def write(self, filename_prefix):
+        """
+        Write the profile as '<filename_prefix>.pstats', to load with pstats or snakeviz, as '<filename_prefix>.txt',
+        the most expensive functions by cumulative time, and as '<filename_prefix>.collapsed', collapsed stacks for
+        flamegraph.pl, speedscope or inferno.
+
+        Parameters
+        ----------
+        filename_prefix : str
+            The path to the profile files, without their extension
+
+        Returns : list
+        -------
+            The paths to the files written
+        """
+        stats = self.get_stats()
+        pstats_filename = filename_prefix + ".pstats"
+        stats.dump_stats(pstats_filename)
+
+        text_filename = filename_prefix + ".txt"
+        with open(text_filename, 'w') as text_file:
+            stats.stream = text_file
+            stats.sort_stats("cumulative").print_stats(50)
+
+        collapsed_filename = filename_prefix + ".collapsed"
+        with open(collapsed_filename, 'w') as collapsed_file:
+            for stack, microseconds in sorted(get_collapsed_stacks(stats).items()):
+                collapsed_file.write("{0} {1}\n".format(stack, microseconds))
+
+        return [pstats_filename, text_filename, collapsed_filename]
+
+
+def _get_function_label(function):
+    filename, line_number, function_name = function
+    if filename == "~":
+        # A built-in function, e.g. "<built-in method posix.stat>"
+        return function_name
+    return "{0} ({1}:{2})".format(function_name, filename, line_number)
+
+
+def get_collapsed_stacks(stats):
+    """
+    Approximate the collapsed call stacks of a cProfile profile.
+
+    cProfile only records the time of each caller-callee pair, not whole call stacks, so the own time of each function
+    is split among the call paths leading to it in proportion to the time each caller spent calling it.
+
+    Parameters
+    ----------
+    stats : pstats.Stats
+        The profile statistics
+
+    Returns : dict
+    -------
+        The semicolon-separated function labels of each call path, from the outermost call, as keys, and for each key,
+        the own time of the innermost function of the path, in microseconds
+    """
+    callees = dict()
+    for function, (_, _, _, _, callers) in stats.stats.items():
+        for caller, (_, _, _, cumulative_time) in callers.items():
+            callees.setdefault(caller, []).append((function, cumulative_time))
+
+    stacks = dict()
+    roots = [function for function, (_, _, _, _, callers) in stats.stats.items() if not callers]
+    # Each stack entry is a call path, and the share of the time of its innermost function spent on this call path
+    pending = [((root,), 1.0) for root in roots]
+    while pending:
+        path, share = pending.pop()
+        function = path[-1]
+        _, _, own_time, cumulative_time, _ = stats.stats[function]
+
+        microseconds = int(round(own_time * share * 1e6))
+        if microseconds > 0:
+            stack = ";".join(_get_function_label(f) for f in path)
+            stacks[stack] = stacks.get(stack, 0) + microseconds
+
+        for callee, edge_cumulative_time in callees.get(function, ()):
+            # Recursive calls are already accounted for in the cumulative times of the outer call
+            if callee in path:
+                continue
+            callee_cumulative_time = stats.stats[callee][3]
+            if callee_cumulative_time <= 0:
+                continue
+            callee_share = share * min(edge_cumulative_time / callee_cumulative_time, 1.0)
+            if callee_cumulative_time * callee_share * 1e6 >= _MIN_STACK_MICROSECONDS:
+                pending.append((path + (callee,), callee_share))
+    return stacks
+
+
+class MemoryProfiler:
+    """
+    Trace the memory allocations with tracemalloc, taking a snapshot at each phase boundary, and report the top
+    allocation sites.
+
+    Only the top allocation sites of each snapshot are kept, and the last snapshot, to compare the next one with.
+    """
+    def __init__(self, top_count=20, frame_count=1):
+        """
+        Parameters
+        ----------
+        top_count : int
+            The number of allocation sites to report for each snapshot
+        frame_count : int
+            The number of frames to keep for each traced allocation
+        """
+        self.top_count = top_count
+        self.frame_count = frame_count
+        self._reports = []
+        self._last_label = None
+        self._last_snapshot = None
+
+    def start(self):
+        tracemalloc.start(self.frame_count)
+        self.snapshot("start")
+
+    def snapshot(self, label):
+        """
+        Take a snapshot of the traced allocations, and keep the allocation sites which grew the most since the previous
+        snapshot.
+
+        Parameters
+        ----------
+        label : str
+            The name of the snapshot, e.g. the phase starting
+        """
+        if not tracemalloc.is_tracing():
+            return
+        current_size, peak_size = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, linecache.__file__),
+        ))
+
+        lines = ["### {0}: {1:.1f} KiB traced, {2:.1f} KiB peak".format(label, current_size / 1024.0,
+                                                                       peak_size / 1024.0)]
+        if self._last_snapshot is not None:
+            lines.append("Top allocation sites growing since '{0}':".format(self._last_label))
+            lines.extend("  {0}".format(statistic) for statistic in
+                         snapshot.compare_to(self._last_snapshot, "lineno")[:self.top_count])
+        self._reports.append(lines)
+        self._last_label, self._last_snapshot = label, snapshot
+
+    def stop(self):
+        self.snapshot("end")
+        tracemalloc.stop()
+
+    def write(self, filename_prefix):
+        """
+        Write '<filename_prefix>.txt', the allocation sites which grew the most between each pair of consecutive
+        snapshots, and the top allocation sites of the last snapshot.
+
+        Parameters
+        ----------
+        filename_prefix : str
+            The path to the profile file, without its extension
+
+        Returns : list
+        -------
+            The paths to the files written
+        """
+        text_filename = filename_prefix + ".txt"
+        with open(text_filename, 'w') as text_file:
+            for lines in self._reports:
+                text_file.write("\n".join(lines) + "\n\n")
+
+            if self._last_snapshot is not None:
+                text_file.write("Top allocation sites at '{0}':\n".format(self._last_label))
+                for statistic in self._last_snapshot.statistics("lineno")[:self.top_count]:
+                    text_file.write("  {0}\n".format(statistic))
+
+        return [text_filename]
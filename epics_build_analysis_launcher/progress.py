@@ -0,0 +1,206 @@
+import sys
+import json
+import time
+import threading
+from collections import deque
+
+# The number of seconds of recent progress to compute the current throughput from
+_RATE_WINDOW = 30.0
+
+
+def _format_duration(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return "{0}:{1:02d}:{2:02d}".format(hours, minutes, seconds)
+
+
+class ProgressReporter:
+    """
+    Report the progress of the current phase of an analysis from a background thread: the items done versus the total,
+    the current throughput, and the estimated time left.
+
+    On a terminal, a single status line is redrawn in place, below the log messages written to get_log_stream().
+    Otherwise, e.g. in a batch job, a JSON line is written periodically, so that a log collector or a script can follow
+    the run.
+    """
+    def __init__(self, timings, stream=None, interactive=None, interval=None):
+        """
+        Parameters
+        ----------
+        timings : Timings
+            The timings whose current phase to report the progress of
+        stream : file
+            The stream to write the progress to. If None, sys.stderr is used.
+        interactive : bool
+            True to redraw a status line, or False to write JSON lines. If None, a status line is redrawn only if the
+            stream is a terminal.
+        interval : float
+            The number of seconds between two reports. If None, 0.5 for a status line, and 60 for JSON lines.
+        """
+        self.timings = timings
+        self.stream = stream or sys.stderr
+        if interactive is None:
+            interactive = hasattr(self.stream, "isatty") and self.stream.isatty()
+        self.interactive = interactive
+        self.interval = interval if interval is not None else (0.5 if interactive else 60.0)
+
+        self._samples = deque()
+        self._sampled_phase = None
+        # The status line last drawn, and the length of the status line on the screen, which is 0 once erased
+        self._line = ""
+        self._line_length = 0
+        # Held while writing to the stream, since the log messages are written from the logging thread
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="progress")
+        self._thread.daemon = True
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop reporting, after a last report.
+        """
+        self._stopped.set()
+        self._thread.join()
+        self.report()
+        with self._lock:
+            if self.interactive and self._line_length:
+                self.stream.write("\n")
+                self.stream.flush()
+            # The log messages written afterwards no longer erase the status line
+            self._line = ""
+            self._line_length = 0
+
+    def get_log_stream(self):
+        """
+        Get the stream to write the console log messages to, so that they do not mix with the status line.
+
+        Returns : file
+        -------
+            A stream writing above the status line on a terminal, or the progress stream otherwise
+        """
+        return _LogStream(self) if self.interactive else self.stream
+
+    def write_above(self, text):
+        """
+        Write text above the status line: the status line is erased, and drawn again below the text.
+
+        Parameters
+        ----------
+        text : str
+            The text to write, e.g. a log message ending with a newline
+        """
+        with self._lock:
+            if self._line_length:
+                self.stream.write("\r" + " " * self._line_length + "\r")
+                self._line_length = 0
+            self.stream.write(text)
+            # The status line is only drawn again at the start of a line
+            if self._line and text.endswith("\n"):
+                self.stream.write(self._line)
+                self._line_length = len(self._line)
+            self.stream.flush()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.report()
+
+    def get_status(self):
+        """
+        Get the progress of the current phase.
+
+        Returns : dict
+        -------
+            The 'phase', the items 'done' and the 'total' items, the 'elapsed' seconds since the phase started, the
+            current throughput in 'items_per_second', and the 'eta' seconds left. The total, the throughput and the
+            estimated time left are None if unknown.
+        """
+        phase, done, total, elapsed = self.timings.get_progress()
+        now = time.perf_counter()
+        if phase != self._sampled_phase:
+            self._sampled_phase = phase
+            self._samples.clear()
+            self._samples.append((now - elapsed, 0))
+        self._samples.append((now, done))
+        while len(self._samples) > 2 and now - self._samples[1][0] >= _RATE_WINDOW:
+            self._samples.popleft()
+
+        oldest_time, oldest_done = self._samples[0]
+        rate = (done - oldest_done) / (now - oldest_time) if now > oldest_time else None
+        if not rate:
+            rate = done / elapsed if done and elapsed > 0 else None
+
+        eta = None
+        if total is not None and rate:
+            eta = max(total - done, 0) / rate
+        return {"phase": phase, "done": done, "total": total, "elapsed": elapsed, "items_per_second": rate,
+                "eta": eta}
+
+    def format_status(self, status):
+        """
+        Format the progress of the current phase as a status line.
+
+        Parameters
+        ----------
+        status : dict
+            The progress, as returned by get_status()
+
+        Returns : str
+        -------
+            The status line, e.g. '[resolution] 1200/4800 (25.0%), 10.5 items/s, 0:02:00 elapsed, ETA 0:05:42'
+        """
+        if status["total"]:
+            parts = ["[{0}] {1}/{2} ({3:.1f}%)".format(status["phase"], status["done"], status["total"],
+                                                       100.0 * status["done"] / status["total"])]
+        elif status["total"] is not None:
+            parts = ["[{0}] {1}/{2}".format(status["phase"], status["done"], status["total"])]
+        else:
+            parts = ["[{0}] {1}".format(status["phase"], status["done"])]
+        if status["items_per_second"] is not None:
+            parts.append("{0:.1f} items/s".format(status["items_per_second"]))
+        parts.append("{0} elapsed".format(_format_duration(status["elapsed"])))
+        if status["eta"] is not None:
+            parts.append("ETA {0}".format(_format_duration(status["eta"])))
+        return ", ".join(parts)
+
+    def report(self):
+        """
+        Write the progress of the current phase, if a phase has started.
+        """
+        status = self.get_status()
+        if status["phase"] is None:
+            return
+
+        if self.interactive:
+            line = self.format_status(status)
+            with self._lock:
+                # Pad the line to erase the end of a longer previous line
+                self.stream.write("\r" + line.ljust(self._line_length))
+                self._line = line
+                self._line_length = len(line)
+                self.stream.flush()
+        else:
+            for key, digits in (("elapsed", 1), ("items_per_second", 2)):
+                if status[key] is not None:
+                    status[key] = round(status[key], digits)
+            if status["eta"] is not None:
+                status["eta"] = int(round(status["eta"]))
+            status["time"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+            self.stream.write(json.dumps(dict(event="progress", **status), sort_keys=True) + "\n")
+            self.stream.flush()
+
+
+class _LogStream:
+    """
+    A stream writing above the status line of a ProgressReporter, for the console log handler.
+    """
+    def __init__(self, reporter):
+        self._reporter = reporter
+
+    def write(self, text):
+        self._reporter.write_above(text)
+
+    def flush(self):
+        self._reporter.stream.flush()
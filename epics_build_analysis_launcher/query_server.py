@@ -0,0 +1,197 @@
+import json
+import threading
+from collections import OrderedDict
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlsplit, parse_qs
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlsplit, parse_qs
+
+from epics_build_analysis.epics_build_analysis_logging import logging
+logger = logging.getLogger(__name__)
+
+# The number of module dependency graphs to keep drawn, the most recently requested ones
+_SVG_CACHE_SIZE = 256
+
+_ENDPOINTS = OrderedDict([
+    ("/closure?module=M", "All the direct and transitive dependencies of a module."),
+    ("/dependents?module=M[&direct=1]", "The modules depending on a module, or only directly."),
+    ("/path?module=M&dependency=D[&k=N]", "The N shortest dependency paths from a module to one of its dependencies."),
+    ("/versions?module=NAME[&since=TAG][&older_than=TAG]", "The versions of a module, oldest first, and the newest."),
+    ("/search?prefix=P", "The modules whose 'name/version' starts with a prefix."),
+    ("/graph.svg?module=NAME/VERSION", "The dependency graph of a module version, as an SVG image."),
+])
+
+
+class _BadRequest(Exception):
+    """
+    Raised to answer a request with an error status, and an error message as JSON.
+    """
+    def __init__(self, message, status=400):
+        super(_BadRequest, self).__init__(message)
+        self.status = status
+
+
+class QueryServer(ThreadingMixIn, HTTPServer):
+    """
+    An HTTP server answering questions about the resolved dependencies of a BuildAnalyzer, from its in-memory query
+    index, with JSON documents, and SVG images for the dependency graphs.
+
+    The analyzer is only read, so the requests are answered concurrently, each in a thread of its own.
+    """
+    daemon_threads = True
+
+    def __init__(self, server_address, analyzer):
+        """
+        Parameters
+        ----------
+        server_address : tuple
+            The host and the port to listen on
+        analyzer : BuildAnalyzer
+            The analyzer whose resolved dependencies to answer questions about
+        """
+        HTTPServer.__init__(self, server_address, _QueryRequestHandler)
+        self.analyzer = analyzer
+        self.dependency_graph = analyzer.get_dependency_graph()
+        self.version_index = analyzer.get_version_index()
+        self._svg_cache = OrderedDict()
+        self._svg_cache_lock = threading.Lock()
+
+    def get_svg(self, module_id):
+        """
+        Draw the dependency graph of a module version with the built-in layout engine, or reuse a recent drawing.
+
+        Parameters
+        ----------
+        module_id : str
+            The 'name/version' identifier of a resolved module version
+
+        Returns : str
+        -------
+            The SVG document
+        """
+        from epics_build_analysis_launcher.layered_layout import generate_svg
+
+        with self._svg_cache_lock:
+            svg = self._svg_cache.pop(module_id, None)
+            if svg is not None:
+                self._svg_cache[module_id] = svg
+                return svg
+        svg = generate_svg(self.analyzer.get_dependency_tree(module_id), universe=self.analyzer.universe)
+        with self._svg_cache_lock:
+            self._svg_cache[module_id] = svg
+            while len(self._svg_cache) > _SVG_CACHE_SIZE:
+                self._svg_cache.popitem(last=False)
+        return svg
+
+
+class _QueryRequestHandler(BaseHTTPRequestHandler):
+    """
+    Answer the GET requests of a QueryServer.
+    """
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parameters = dict((key, values[-1]) for key, values in parse_qs(url.query).items())
+        try:
+            if url.path == "/graph.svg":
+                self._send(200, "image/svg+xml", self.server.get_svg(self._get_module_id(parameters)))
+            else:
+                self._send_json(200, self._answer(url.path, parameters))
+        except _BadRequest as error:
+            self._send_json(error.status, {"error": str(error)})
+        except KeyError as error:
+            # The dependency graph raises a KeyError for the unknown modules
+            self._send_json(404, {"error": error.args[0]})
+        except ValueError as error:
+            self._send_json(400, {"error": str(error)})
+
+    def _answer(self, path, parameters):
+        analyzer = self.server.analyzer
+        graph = self.server.dependency_graph
+        if path == "/":
+            return OrderedDict([
+                ("epics_version", analyzer.epics_version),
+                ("module_versions", len(analyzer.universe)),
+                ("resolved_module_versions", len(analyzer.data)),
+                ("endpoints", _ENDPOINTS),
+            ])
+        if path == "/closure":
+            module = _get_parameter(parameters, "module")
+            return OrderedDict([("module", module), ("closure", graph.closure(module))])
+        if path == "/dependents":
+            module = _get_parameter(parameters, "module")
+            direct = _get_parameter(parameters, "direct", "0").lower() in ("1", "true", "yes")
+            return OrderedDict([("module", module), ("direct", direct),
+                                ("dependents", graph.dependents(module, direct=direct))])
+        if path == "/path":
+            module = _get_parameter(parameters, "module")
+            dependency = _get_parameter(parameters, "dependency")
+            k = _get_int_parameter(parameters, "k", 1)
+            return OrderedDict([("module", module), ("dependency", dependency),
+                                ("paths", graph.why_depends(module, dependency, k=k))])
+        if path == "/versions":
+            return self._answer_versions(parameters)
+        if path == "/search":
+            prefix = _get_parameter(parameters, "prefix")
+            return OrderedDict([("prefix", prefix), ("modules", graph.search(prefix))])
+        raise _BadRequest("Unknown endpoint '{0}'.".format(path), status=404)
+
+    def _answer_versions(self, parameters):
+        name = _get_parameter(parameters, "module")
+        version_index = self.server.version_index
+        if not version_index.get_versions(name):
+            raise KeyError("Unknown module '{0}', or it has no valid version.".format(name))
+
+        if "since" in parameters:
+            versions = version_index.get_versions_since(name, parameters["since"])
+        else:
+            versions = version_index.get_versions(name)
+        if "older_than" in parameters:
+            older = version_index.get_versions_older_than(parameters["older_than"], name=name)
+            older_versions = set(older.get(name, []))
+            versions = [version for version in versions if version in older_versions]
+        return OrderedDict([("module", name), ("versions", versions),
+                            ("newest", version_index.get_newest_version(name))])
+
+    def _get_module_id(self, parameters):
+        module_id = _get_parameter(parameters, "module")
+        if module_id not in self.server.analyzer.data:
+            raise _BadRequest("Unknown module version '{0}'. Give a resolved 'name/version'.".format(module_id),
+                              status=404)
+        return module_id
+
+    def _send_json(self, status, document):
+        self._send(status, "application/json", json.dumps(document))
+
+    def _send(self, status, content_type, text):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "{0}; charset=utf-8".format(content_type))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def _get_parameter(parameters, name, default=None):
+    value = parameters.get(name, default)
+    if value is None:
+        raise _BadRequest("Missing the '{0}' parameter.".format(name))
+    return value
+
+
+def _get_int_parameter(parameters, name, default):
+    value = _get_parameter(parameters, name, str(default))
+    try:
+        value = int(value)
+    except ValueError:
+        raise _BadRequest("The '{0}' parameter must be an integer.".format(name))
+    if value < 1:
+        raise _BadRequest("The '{0}' parameter must be at least 1.".format(name))
+    return value
@@ -0,0 +1,88 @@
+import csv
+from collections import OrderedDict
+
+from epics_build_analysis_launcher.dependency_graph import get_module_name
+from epics_build_analysis_launcher.versions import module_sort_key
+
+
+class ReleaseMatrix:
+    """
+    The presence of each module version in each of several EPICS releases.
+
+    Each 'name/version' identifier is mapped to a bitmask of the releases it is present in. All the identifiers with
+    the same bitmask share the same pairwise differences, so the differences between every pair of releases are
+    computed once per distinct bitmask, instead of once per identifier and pair.
+    """
+    def __init__(self, listings):
+        """
+        Parameters
+        ----------
+        listings : OrderedDict
+            For each release, its module listing as a dictionary keyed by 'name/version' identifiers
+        """
+        self.releases = list(listings.keys())
+        self.masks = dict()
+        for bit, listing in enumerate(listings.values()):
+            for module_id in listing:
+                self.masks[module_id] = self.masks.get(module_id, 0) | (1 << bit)
+
+    def get_versions(self):
+        """
+        Build the module-by-release version matrix.
+
+        Returns : OrderedDict
+        -------
+            For each module name, in sorted order, the list of its versions present in each release, oldest first
+        """
+        matrix = OrderedDict()
+        for module_id in sorted(self.masks, key=module_sort_key):
+            name = get_module_name(module_id)
+            version = module_id[len(name) + 1:]
+            row = matrix.setdefault(name, [[] for _ in self.releases])
+            mask = self.masks[module_id]
+            for bit in range(len(self.releases)):
+                if mask >> bit & 1:
+                    row[bit].append(version)
+        return matrix
+
+    def get_differences(self):
+        """
+        Find, for every ordered pair of releases, the module versions present in the first but not in the second.
+
+        Returns : OrderedDict
+        -------
+            For each (release, other release) pair, the sorted 'name/version' identifiers only in the release
+        """
+        by_mask = dict()
+        for module_id, mask in self.masks.items():
+            by_mask.setdefault(mask, []).append(module_id)
+
+        differences = OrderedDict(((release, other), []) for release in self.releases for other in self.releases
+                                  if release != other)
+        for mask, module_ids in by_mask.items():
+            for bit, release in enumerate(self.releases):
+                if not mask >> bit & 1:
+                    continue
+                for other_bit, other in enumerate(self.releases):
+                    if not mask >> other_bit & 1:
+                        differences[(release, other)].extend(module_ids)
+
+        for module_ids in differences.values():
+            module_ids.sort(key=module_sort_key)
+        return differences
+
+    def write_csv(self, output_filename):
+        """
+        Write the module-by-release version matrix as a CSV file, with one row per module and one column per release.
+        Each cell lists the versions of the module present in the release, separated by spaces.
+
+        Parameters
+        ----------
+        output_filename : str
+            The name of the CSV file to produce
+        """
+        with open(output_filename, 'w', newline='') as output_file:
+            writer = csv.writer(output_file)
+            writer.writerow(["module"] + self.releases)
+            for name, row in self.get_versions().items():
+                writer.writerow([name] + [" ".join(versions) for versions in row])
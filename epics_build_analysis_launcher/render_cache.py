@@ -0,0 +1,127 @@
+import os
+import errno
+import shutil
+import hashlib
+
+from epics_build_analysis.epics_build_analysis_logging import logging
+logger = logging.getLogger(__name__)
+
+
+class RenderCache:
+    """
+    A content-addressed cache of rendered graphs.
+
+    Each rendering is stored under the hash of the graph's DOT source, its layout engine and its output format. When
+    the same graph is requested again, the cached file is hard-linked (or copied, if linking is not possible) into
+    place instead of invoking dot again.
+    """
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def get_key(graph):
+        """
+        Compute the cache key of a graph.
+
+        Parameters
+        ----------
+        graph : graphviz.Digraph
+            The graph to compute the key for
+
+        Returns : str
+        -------
+            The hex digest identifying the graph's rendering
+        """
+        digest = hashlib.sha256()
+        for part in (graph.engine, graph.format, graph.source):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get_cached_path(self, key, output_format):
+        return os.path.join(self.cache_dir, key[:2], "{0}.{1}".format(key, output_format))
+
+    def render(self, graph, filename, directory):
+        """
+        Render a graph to '<directory>/<filename>.<format>', reusing a cached rendering if one exists.
+
+        Parameters
+        ----------
+        graph : graphviz.Digraph
+            The graph to render
+        filename : str
+            The name of the rendered file, without the format extension
+        directory : str
+            The directory to put the rendered file in
+
+        Returns : bool
+        -------
+            True if a cached rendering was reused; False if the graph had to be rendered
+        """
+        key = self.get_key(graph)
+        cached_path = self.get_cached_path(key, graph.format)
+        output_path = os.path.join(directory, "{0}.{1}".format(filename, graph.format))
+
+        if os.path.exists(cached_path):
+            if not (os.path.exists(output_path) and os.path.samefile(cached_path, output_path)):
+                _place_file(cached_path, output_path)
+            self.hits += 1
+            return True
+
+        # The output file may be a hard link to the cached rendering of another graph, which dot would overwrite in
+        # place, so it is unlinked first
+        remove_file(output_path)
+        graph.render(filename=filename, directory=directory, cleanup=True)
+        _create_cache_directory(os.path.dirname(cached_path))
+        _place_file(output_path, cached_path)
+        self.misses += 1
+        return False
+
+
+def _create_cache_directory(dir_name):
+    try:
+        os.makedirs(dir_name)
+    except OSError as err:
+        # It's OK if the cache directory exists. This is to be compatible with Python 2.7
+        if err.errno != errno.EEXIST:
+            raise err
+
+
+def remove_file(path):
+    """
+    Remove a file if it exists, e.g. a rendered graph which may be a hard link to a cached rendering, before rendering
+    it again, so that dot does not write over the cached rendering.
+
+    Parameters
+    ----------
+    path : str
+        The path to the file
+    """
+    try:
+        os.unlink(path)
+    except OSError as err:
+        # It's OK if the file does not exist. This is to be compatible with Python 2.7
+        if err.errno != errno.ENOENT:
+            raise err
+
+
+def _place_file(source, destination):
+    """
+    Hard-link a file to a new location, falling back to a copy if the two locations cannot share the file. The
+    destination is replaced atomically, so an interrupted run never leaves a partial file behind.
+
+    Parameters
+    ----------
+    source : str
+        The path to the existing file
+    destination : str
+        The path to place the file at
+    """
+    temp_path = "{0}.{1}.tmp".format(destination, os.getpid())
+    try:
+        os.link(source, temp_path)
+    except OSError:
+        shutil.copyfile(source, temp_path)
+    os.replace(temp_path, destination)
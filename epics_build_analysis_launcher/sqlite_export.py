@@ -0,0 +1,173 @@
+import os
+import sqlite3
+from collections import OrderedDict, deque
+
+from epics_build_analysis_launcher.dependency_graph import get_module_name
+
+
+SCHEMA = """
+CREATE TABLE metadata (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE items (
+    id INTEGER PRIMARY KEY,
+    node TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    version TEXT NOT NULL,
+    item_type TEXT,
+    path TEXT,
+    resolved INTEGER NOT NULL
+);
+CREATE TABLE dependencies (
+    item_id INTEGER NOT NULL REFERENCES items (id),
+    dependency_id INTEGER NOT NULL REFERENCES items (id),
+    distance INTEGER NOT NULL,
+    PRIMARY KEY (item_id, dependency_id)
+) WITHOUT ROWID;
+CREATE VIEW direct_dependencies AS
+    SELECT item_id, dependency_id FROM dependencies WHERE distance = 1;
+"""
+
+# The indexes are created after the bulk inserts, which is much faster than maintaining them row by row
+INDEXES = """
+CREATE INDEX items_name_version ON items (name, version);
+CREATE INDEX items_item_type ON items (item_type);
+CREATE INDEX dependencies_dependency ON dependencies (dependency_id, distance);
+CREATE INDEX dependencies_distance ON dependencies (item_id, distance);
+"""
+
+
+def _get_distances(node, successors):
+    """
+    Find the length of the shortest path from a node to each of its direct and transitive dependencies.
+
+    Parameters
+    ----------
+    node : int
+        The id of the node to start from
+    successors : dict
+        The ids of the direct dependencies of each node id
+
+    Returns : dict
+    -------
+        The distance to each dependency id
+    """
+    distances = dict()
+    queue = deque([(node, 0)])
+    while queue:
+        current, distance = queue.popleft()
+        for dep in successors.get(current, ()):
+            if dep not in distances and dep != node:
+                distances[dep] = distance + 1
+                queue.append((dep, distance + 1))
+    return distances
+
+
+def export_sqlite(db_filename, data, universe, epics_base_version, transitive_reduction=False):
+    """
+    Write the analyzed build and its resolved dependency graph to an SQLite database.
+
+    The 'items' table has one row per item of the build, plus one row per unresolved dependency. The 'dependencies'
+    table has one row per direct or transitive dependency, with the length of the shortest path between the two items
+    in 'distance', so that the direct dependencies are the rows with a distance of 1 (see the 'direct_dependencies'
+    view). The database is written to a temporary file in a single transaction, and then moved into place.
+
+    If the dependencies were transitively reduced, the 'transitive_reduction' key of the 'metadata' table is '1'. The
+    rows with a distance of 1 are then the reduced dependencies, i.e. the direct dependencies not already implied by
+    other dependencies, and each distance is the length of the shortest path in the reduced graph. The direct and
+    transitive dependencies of each item are the same either way.
+
+    Parameters
+    ----------
+    db_filename : str
+        The name of the database file to produce
+    data : dict
+        A dictionary of module names as keys, and for each key, a list of names of the modules the current module
+        depends on
+    universe : dict
+        The items of the analyzed build, keyed by their 'name/version' identifier
+    epics_base_version : str
+        The EPICS version being analyzed
+    transitive_reduction : bool
+        True if the dependencies already implied by other dependencies were left out of the data
+    """
+    node_ids = dict()
+    item_rows = []
+
+    def add_node(node):
+        if node in node_ids:
+            return node_ids[node]
+        node_id = len(node_ids) + 1
+        node_ids[node] = node_id
+        itm = universe.get(node)
+        if itm is not None:
+            item_rows.append((node_id, node, itm.name, itm.version, itm.item_type.value, itm.path, 1))
+        else:
+            name = get_module_name(node)
+            item_rows.append((node_id, node, name, node[len(name) + 1:], None, None, 0))
+        return node_id
+
+    for node in universe.keys():
+        add_node(node)
+    successors = dict()
+    for node, deps in data.items():
+        node_id = add_node(node)
+        successors[node_id] = [add_node(dep) for dep in deps]
+
+    temp_filename = "{0}.{1}.tmp".format(db_filename, os.getpid())
+    if os.path.exists(temp_filename):
+        os.remove(temp_filename)
+
+    connection = sqlite3.connect(temp_filename)
+    try:
+        # The database is only moved into place once complete, so it needs no journal
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.executescript(SCHEMA)
+        with connection:
+            connection.executemany("INSERT INTO metadata (key, value) VALUES (?, ?)",
+                                   [("epics_base_version", epics_base_version),
+                                    ("transitive_reduction", "1" if transitive_reduction else "0")])
+            connection.executemany("INSERT INTO items VALUES (?, ?, ?, ?, ?, ?, ?)", item_rows)
+            connection.executemany("INSERT INTO dependencies VALUES (?, ?, ?)",
+                                   ((node_id, dep_id, distance)
+                                    for node_id in successors
+                                    for dep_id, distance in _get_distances(node_id, successors).items()))
+        connection.executescript(INDEXES)
+        connection.execute("ANALYZE")
+    finally:
+        connection.close()
+    os.replace(temp_filename, db_filename)
+
+
+def load_sqlite(db_filename):
+    """
+    Load the direct dependencies of every item from a database written by export_sqlite, and whether they were
+    transitively reduced.
+
+    Parameters
+    ----------
+    db_filename : str
+        The name of the database file to load
+
+    Returns : tuple
+    -------
+        A dictionary of every item's 'name/version' identifier as keys, and for each key, a list of the identifiers of
+        its direct dependencies, and True if the dependencies were transitively reduced
+    """
+    if not os.path.isfile(db_filename):
+        raise IOError("Could not find the dependency database '{0}'. Run the analysis with --sqlite first."
+                      .format(db_filename))
+
+    connection = sqlite3.connect(db_filename)
+    try:
+        row = connection.execute("SELECT value FROM metadata WHERE key = 'transitive_reduction'").fetchone()
+        transitive_reduction = row is not None and row[0] == "1"
+        nodes = dict(connection.execute("SELECT id, node FROM items"))
+        data = OrderedDict((nodes[node_id], []) for node_id in sorted(nodes))
+        for item_id, dependency_id in connection.execute("SELECT item_id, dependency_id FROM direct_dependencies"):
+            data[nodes[item_id]].append(nodes[dependency_id])
+    finally:
+        connection.close()
+    return data, transitive_reduction
@@ -0,0 +1,268 @@
+import os
+import sys
+import json
+import time
+import heapq
+import itertools
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# The CPU time of the measuring thread only, so that measurements made concurrently in other threads are not counted
+_cpu_time = getattr(time, "thread_time", time.process_time)
+
+
+class Measurement:
+    """
+    The measurement of a block of code, yielded by Timings.measure().
+    """
+    def __init__(self, item=None):
+        self.item = item
+        self.count = 0 if item is None else 1
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+
+
+class Timings:
+    """
+    The wall time, CPU time and item counts of the phases of an analysis, and the slowest items of each phase.
+
+    A large gap between the wall time and the CPU time of a phase means that it was waiting, e.g. on the filesystem, or
+    on a dot process, whose CPU time is not counted.
+    """
+    def __init__(self, slowest_count=10):
+        """
+        Parameters
+        ----------
+        slowest_count : int
+            The number of slowest items to keep for each phase
+        """
+        self.slowest_count = slowest_count
+        self.start_time = time.time()
+        self._start_wall_time = time.perf_counter()
+        self._start_cpu_time = time.process_time()
+        self._phases = OrderedDict()
+        self._slowest = dict()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._phase_callbacks = []
+        self.current_phase = None
+        self._phase_total = None
+        self._phase_done = 0
+        self._phase_start_time = self._start_wall_time
+        self._counts = OrderedDict()
+
+    def add_phase_callback(self, callback):
+        """
+        Call a function at each phase boundary.
+
+        Parameters
+        ----------
+        callback : callable
+            The function to call with the name of the phase starting
+        """
+        self._phase_callbacks.append(callback)
+
+    def start_phase(self, phase, total=None):
+        """
+        Mark the boundary between two top-level phases of the analysis, e.g. between the parsing of all the dependency
+        files and the resolution of all the modules. The measurements made with measure() are finer-grained.
+
+        Parameters
+        ----------
+        phase : str
+            The name of the phase starting
+        total : int
+            The number of items the phase will process, if known, to report the progress of the phase with advance()
+        """
+        with self._lock:
+            self.current_phase = phase
+            self._phase_total = total
+            self._phase_done = 0
+            self._phase_start_time = time.perf_counter()
+        for callback in self._phase_callbacks:
+            callback(phase)
+
+    def set_phase_total(self, total):
+        """
+        Set the number of items the current phase will process, once it is known, e.g. when the discovery of the items
+        ends while the phase is already processing them.
+
+        Parameters
+        ----------
+        total : int
+            The number of items the current phase will process
+        """
+        with self._lock:
+            self._phase_total = total
+
+    def advance(self, count=1):
+        """
+        Count items of the current phase as done.
+
+        Parameters
+        ----------
+        count : int
+            The number of items done
+        """
+        with self._lock:
+            self._phase_done += count
+
+    def get_progress(self):
+        """
+        Get the progress of the current phase.
+
+        Returns : tuple
+        -------
+            The name of the current phase, the number of items done, the number of items the phase will process, or
+            None if unknown, and the number of seconds since the phase started
+        """
+        with self._lock:
+            return (self.current_phase, self._phase_done, self._phase_total,
+                    time.perf_counter() - self._phase_start_time)
+
+    @contextmanager
+    def measure(self, phase, item=None):
+        """
+        Measure a block of code, and add its times to a phase.
+
+        Parameters
+        ----------
+        phase : str
+            The name of the phase
+        item : str
+            The item the block processes, e.g. a 'name/version' identifier. If given, the block counts as one item of
+            the phase, and is a candidate for the phase's slowest items. Set the 'count' attribute of the yielded
+            Measurement to count another number of items.
+
+        Yields : Measurement
+        -------
+            The measurement, whose times are set when the block exits
+        """
+        measurement = Measurement(item)
+        wall_time = time.perf_counter()
+        cpu_time = _cpu_time()
+        try:
+            yield measurement
+        finally:
+            measurement.wall_time = time.perf_counter() - wall_time
+            measurement.cpu_time = _cpu_time() - cpu_time
+            self.add(phase, measurement)
+
+    def add(self, phase, measurement):
+        """
+        Add a measurement to a phase.
+
+        Parameters
+        ----------
+        phase : str
+            The name of the phase
+        measurement : Measurement
+            The measurement to add
+        """
+        with self._lock:
+            totals = self._phases.get(phase)
+            if totals is None:
+                totals = self._phases[phase] = {"wall_time": 0.0, "cpu_time": 0.0, "count": 0}
+                self._slowest[phase] = []
+            totals["wall_time"] += measurement.wall_time
+            totals["cpu_time"] += measurement.cpu_time
+            totals["count"] += measurement.count
+
+            if measurement.item is None or self.slowest_count <= 0:
+                return
+            # A min-heap of the slowest items, whose root is the fastest of them
+            entry = (measurement.wall_time, next(self._sequence), measurement)
+            slowest = self._slowest[phase]
+            if len(slowest) < self.slowest_count:
+                heapq.heappush(slowest, entry)
+            elif entry > slowest[0]:
+                heapq.heapreplace(slowest, entry)
+
+    def add_count(self, name, count=1, labels=None):
+        """
+        Add to a count of the run, e.g. the number of graphs rendered.
+
+        Parameters
+        ----------
+        name : str
+            The name of the count
+        count : int
+            The number to add
+        labels : dict
+            The labels distinguishing this count from the other counts of the same name, e.g. {"kind": "module"}
+        """
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + count
+
+    def get_counts(self):
+        """
+        Get the counts of the run.
+
+        Returns : list
+        -------
+            The name, the labels as a dictionary, and the value of each count, in the order they were first added
+        """
+        with self._lock:
+            return [(name, dict(labels), value) for (name, labels), value in self._counts.items()]
+
+    def get_phase_names(self):
+        with self._lock:
+            return list(self._phases.keys())
+
+    def get_phase(self, phase):
+        """
+        Get the totals of a phase.
+
+        Parameters
+        ----------
+        phase : str
+            The name of the phase
+
+        Returns : dict
+        -------
+            The 'wall_time' and 'cpu_time' in seconds, the item 'count', the 'items_per_second', and the 'slowest'
+            items, slowest first, of the phase
+        """
+        with self._lock:
+            totals = dict(self._phases[phase])
+            slowest = sorted(self._slowest[phase], reverse=True)
+        totals["items_per_second"] = totals["count"] / totals["wall_time"] if totals["wall_time"] > 0 else None
+        totals["slowest"] = [{"item": measurement.item, "wall_time": measurement.wall_time,
+                              "cpu_time": measurement.cpu_time} for _, _, measurement in slowest]
+        return totals
+
+    def to_dict(self):
+        """
+        Get the report of all the phases.
+
+        Returns : OrderedDict
+        -------
+            The start time, the total wall and CPU times of the process so far, the totals of each phase, in the
+            order the phases were first measured, and the counts of the run
+        """
+        report = OrderedDict()
+        report["start_time"] = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.start_time))
+        report["command"] = " ".join(sys.argv)
+        report["wall_time"] = time.perf_counter() - self._start_wall_time
+        report["cpu_time"] = time.process_time() - self._start_cpu_time
+        report["phases"] = OrderedDict((phase, self.get_phase(phase)) for phase in self.get_phase_names())
+        report["counts"] = [{"name": name, "labels": labels, "value": value}
+                            for name, labels, value in self.get_counts()]
+        return report
+
+    def write_json(self, filename):
+        """
+        Write the report of all the phases to a JSON file.
+
+        Parameters
+        ----------
+        filename : str
+            The path to the JSON file
+        """
+        temp_filename = filename + ".tmp"
+        with open(temp_filename, 'w') as json_file:
+            json.dump(self.to_dict(), json_file, indent=2)
+            json_file.write("\n")
+        os.replace(temp_filename, filename)
@@ -0,0 +1,194 @@
+import bisect
+from functools import lru_cache
+from collections import OrderedDict
+
+from epics_build_analysis_launcher.dependency_graph import get_module_name
+
+
+# The same few version tags are parsed over and over, for every module depending on them
+@lru_cache(maxsize=None)
+def parse_version(tag):
+    """
+    Parse an EPICS version tag, such as 'R4.31-0.1.0', into a tuple that sorts in version order.
+
+    A tag must start with 'R', contain at least one dot, and be made of dot-separated numbers, in one or more
+    dash-separated parts. 'R4.31-0.1.0' becomes ((4, 31), (0, 1, 0)).
+
+    Parameters
+    ----------
+    tag : str
+        The version tag to parse
+
+    Returns : tuple
+    -------
+        The parsed version, or None if the tag is not a valid EPICS version tag
+    """
+    if not tag.startswith('R') or '.' not in tag:
+        return None
+    parts = [part.split('.') for part in tag[1:].split('-')]
+    # int() also accepts signs, underscores and whitespace, which are not part of a version tag
+    if not all(digits.isdigit() for part in parts for digits in part):
+        return None
+    try:
+        return tuple(tuple(int(digits) for digits in part) for part in parts)
+    except ValueError:
+        # Some Unicode digits, such as superscripts, are not decimal digits
+        return None
+
+
+def version_sort_key(tag):
+    """
+    Get a key to sort version tags in version order. Invalid tags sort before all the valid ones, in string order.
+    """
+    parsed = parse_version(tag)
+    return (0, tag) if parsed is None else (1, parsed)
+
+
+def module_sort_key(module_id):
+    """
+    Get a key to sort 'name/version' identifiers by module name, and then in version order.
+    """
+    name = get_module_name(module_id)
+    return name, version_sort_key(module_id[len(name) + 1:])
+
+
+class VersionIndex:
+    """
+    The sorted versions of each module, to answer version questions in logarithmic time.
+    """
+    def __init__(self, module_ids=()):
+        """
+        Parameters
+        ----------
+        module_ids : iterable
+            The 'name/version' identifiers to index
+        """
+        self._keys = dict()
+        self._versions = dict()
+        self._invalid = []
+        for module_id in module_ids:
+            self.add(module_id)
+
+    def add(self, module_id):
+        """
+        Add a module version to the index. Versions with an invalid tag are recorded, but not indexed.
+
+        Parameters
+        ----------
+        module_id : str
+            The 'name/version' identifier of the module version
+        """
+        name = get_module_name(module_id)
+        version = module_id[len(name) + 1:]
+        parsed = parse_version(version)
+        if parsed is None:
+            self._invalid.append(module_id)
+            return
+
+        keys = self._keys.setdefault(name, [])
+        versions = self._versions.setdefault(name, [])
+        position = bisect.bisect_left(keys, parsed)
+        if position < len(keys) and keys[position] == parsed and versions[position] == version:
+            return
+        keys.insert(position, parsed)
+        versions.insert(position, version)
+
+    def get_modules(self):
+        return sorted(self._versions.keys())
+
+    def get_versions(self, name):
+        """
+        Get the valid versions of a module, oldest first.
+        """
+        return list(self._versions.get(name, []))
+
+    def get_newest_version(self, name):
+        """
+        Get the newest valid version of a module.
+
+        Parameters
+        ----------
+        name : str
+            The module name
+
+        Returns : str
+        -------
+            The newest version tag, or None if the module has no valid version
+        """
+        versions = self._versions.get(name)
+        return versions[-1] if versions else None
+
+    def get_latest_versions(self, name, count):
+        """
+        Get the newest valid versions of a module.
+
+        Parameters
+        ----------
+        name : str
+            The module name
+        count : int
+            The maximum number of versions to get
+
+        Returns : list
+        -------
+            Up to 'count' version tags, oldest first
+        """
+        return list(self._versions.get(name, [])[-count:]) if count > 0 else []
+
+    def get_versions_since(self, name, tag):
+        """
+        Get the valid versions of a module that are the same as, or newer than, a version.
+
+        Parameters
+        ----------
+        name : str
+            The module name
+        tag : str
+            The oldest version tag to get
+
+        Returns : list
+        -------
+            The version tags, oldest first
+        """
+        parsed = parse_version(tag)
+        if parsed is None:
+            raise ValueError("Invalid EPICS version tag: '{0}'.".format(tag))
+        position = bisect.bisect_left(self._keys.get(name, []), parsed)
+        return list(self._versions.get(name, [])[position:])
+
+    def get_versions_older_than(self, tag, name=None):
+        """
+        Find the module versions older than a version.
+
+        Parameters
+        ----------
+        tag : str
+            The version tag to compare with
+        name : str
+            The module to look at. If None, look at all the modules.
+
+        Returns : OrderedDict
+        -------
+            For each module with older versions, in sorted order, its version tags older than the given one, oldest
+            first
+        """
+        parsed = parse_version(tag)
+        if parsed is None:
+            raise ValueError("Invalid EPICS version tag: '{0}'.".format(tag))
+
+        older = OrderedDict()
+        for module_name in ([name] if name is not None else self.get_modules()):
+            position = bisect.bisect_left(self._keys.get(module_name, []), parsed)
+            if position:
+                older[module_name] = self._versions[module_name][:position]
+        return older
+
+    def get_invalid_module_ids(self):
+        """
+        Get all the indexed module versions with an invalid version tag.
+
+        Returns : list
+        -------
+            The sorted 'name/version' identifiers
+        """
+        return sorted(self._invalid)
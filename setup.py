@@ -1,10 +1,37 @@
+import os
+
 import versioneer
 from setuptools import setup, find_packages
 
+VERSION_STATIC_FILE = os.path.join("epics_build_analysis", "_version_static.py")
+
+
+def get_cmdclass():
+    """
+    Get versioneer's commands, with a build_py command also writing the version as a plain string to
+    'epics_build_analysis/_version_static.py' in the build, so that the installed package can read its version without
+    running git, or any versioneer code.
+    """
+    cmdclass = versioneer.get_cmdclass()
+    versioneer_build_py = cmdclass["build_py"]
+
+    class build_py(versioneer_build_py):
+        def run(self):
+            versioneer_build_py.run(self)
+            target_filename = os.path.join(self.build_lib, VERSION_STATIC_FILE)
+            print("WRITING %s" % target_filename)
+            with open(target_filename, 'w') as version_file:
+                version_file.write("# Written by setup.py when the package is built\n")
+                version_file.write("__version__ = {0!r}\n".format(versioneer.get_version()))
+
+    cmdclass["build_py"] = build_py
+    return cmdclass
+
+
 setup(
     name='epics_build_analysis',
     version=versioneer.get_version(),
-    cmdclass=versioneer.get_cmdclass(),
+    cmdclass=get_cmdclass(),
     # Author details
     author='SLAC National Accelerator Laboratory',
 
@@ -0,0 +1,87 @@
+import os
+import shutil
+import itertools
+
+import pytest
+
+EPICS_VERSION = "R7.0.3.1-1.0"
+
+# The modification times given to the changed files and directories, so that each change is seen, whatever the
+# resolution of the file system's timestamps
+_mtimes = itertools.count(1000000000)
+
+
+class EpicsSite:
+    """
+    A synthetic EPICS site directory, with the modules directory of one EPICS version. Base is outside of the modules
+    directory, as on a real site.
+    """
+    def __init__(self, top):
+        self.top = str(top)
+        self.epics_version = EPICS_VERSION
+        self.modules_top = os.path.join(self.top, self.epics_version, "modules")
+        os.makedirs(self.modules_top)
+
+    def add_module(self, module_id, modules=(), packages=(), base=True):
+        """
+        Add a module version, or replace the dependency files of an existing one.
+
+        Parameters
+        ----------
+        module_id : str
+            The 'name/version' identifier of the module version
+        modules : iterable
+            The 'name/version' identifiers of the modules it depends on
+        packages : iterable
+            The 'name/version' identifiers of the system packages it depends on
+        base : bool
+            True to depend on base
+        """
+        name, version = module_id.split('/')
+        configure_dir = os.path.join(self.modules_top, name, version, "configure")
+        if not os.path.isdir(configure_dir):
+            os.makedirs(configure_dir)
+
+        lines = []
+        for dep_id in modules:
+            dep_name, dep_version = dep_id.split('/')
+            lines.append("{0}_MODULE_VERSION={1}".format(dep_name.upper(), dep_version))
+            lines.append("{0}=$(EPICS_MODULES)/{1}/$({0}_MODULE_VERSION)".format(dep_name.upper(), dep_name))
+        if base:
+            lines.append("EPICS_BASE=$(EPICS_SITE_TOP)/base/$(BASE_MODULE_VERSION)")
+        self._write(os.path.join(configure_dir, "RELEASE"), lines)
+
+        lines = []
+        for dep_id in packages:
+            dep_name, dep_version = dep_id.split('/')
+            lines.append("{0}_PACKAGE_VERSION={1}".format(dep_name.upper(), dep_version))
+            lines.append("{0}=$(PACKAGE_SITE_TOP)/{1}/$({0}_PACKAGE_VERSION)".format(dep_name.upper(), dep_name))
+        self._write(os.path.join(configure_dir, "CONFIG_SITE"), lines)
+        self._touch(configure_dir, os.path.dirname(configure_dir), os.path.join(self.modules_top, name),
+                    self.modules_top)
+
+    def remove_module(self, module_id):
+        name, version = module_id.split('/')
+        shutil.rmtree(os.path.join(self.modules_top, name, version))
+        module_dir = os.path.join(self.modules_top, name)
+        if not os.listdir(module_dir):
+            os.rmdir(module_dir)
+            self._touch(self.modules_top)
+        else:
+            self._touch(module_dir)
+
+    def _write(self, filename, lines):
+        with open(filename, 'w') as dependency_file:
+            dependency_file.write("\n".join(lines) + "\n")
+        self._touch(filename)
+
+    @staticmethod
+    def _touch(*paths):
+        for path in paths:
+            mtime = next(_mtimes)
+            os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def epics_site(tmp_path):
+    return EpicsSite(tmp_path)
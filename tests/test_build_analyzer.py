@@ -0,0 +1,92 @@
+from epics_build_analysis_launcher.build_analyzer import BuildAnalyzer
+
+
+def _discover_and_resolve(analyzer):
+    """
+    Stream the discovered module versions into resolve_discovered(), as the analysis pipeline does, and record the
+    order of the discoveries and the resolutions.
+    """
+    events = []
+
+    def discover():
+        for itm in analyzer.discover_modules():
+            events.append(("discovered", str(itm)))
+            yield analyzer.parse(itm)
+
+    for module_id, _ in analyzer.resolve_discovered(discover()):
+        events.append(("resolved", module_id))
+    return events
+
+
+def test_resolve_follows_discovery(epics_site):
+    epics_site.add_module("alpha/R1.0", packages=["python/3.6"])
+    epics_site.add_module("beta/R1.0", modules=["gamma/R1.0"])
+    epics_site.add_module("gamma/R1.0")
+    epics_site.add_module("delta/R1.0", modules=["omega/R1.0"])
+    epics_site.add_module("epsilon/R1.0", modules=["gamma/R9.9"])
+    analyzer = BuildAnalyzer(epics_site.epics_version, epics_site_top=epics_site.top)
+
+    events = _discover_and_resolve(analyzer)
+    discovered = [module_id for event, module_id in events if event == "discovered"]
+    resolved = [module_id for event, module_id in events if event == "resolved"]
+    assert sorted(resolved) == sorted(discovered)
+
+    def resolved_before_next_discovery(module_id, index):
+        # Whether the module version is resolved after the event at the index, and before the next discovery
+        next_events = events[index + 1:]
+        next_discoveries = [i for i, (event, _) in enumerate(next_events) if event == "discovered"]
+        resolution = next_events.index(("resolved", module_id))
+        return not next_discoveries or resolution < next_discoveries[0]
+
+    def resolved_after(module_id, *dep_ids):
+        # The module version must be resolved as soon as it and its dependencies are all discovered
+        return resolved_before_next_discovery(module_id, max(events.index(("discovered", discovered_id))
+                                                             for discovered_id in (module_id,) + dep_ids))
+
+    # Base is outside of the modules directory, and the packages are never in it, so they are not waited for
+    assert resolved_after("alpha/R1.0")
+    assert resolved_after("gamma/R1.0")
+    # Neither is a module missing from the modules directory
+    assert resolved_after("delta/R1.0")
+    assert resolved_after("beta/R1.0", "gamma/R1.0")
+
+    # A missing version of a listed module is only waited for until all the versions of that module are discovered,
+    # i.e. until the next module is
+    gamma_index = discovered.index("gamma/R1.0")
+    if gamma_index + 1 < len(discovered):
+        gamma_listed = events.index(("discovered", discovered[gamma_index + 1]))
+        assert resolved_before_next_discovery("epsilon/R1.0",
+                                              max(gamma_listed, events.index(("discovered", "epsilon/R1.0"))))
+    assert analyzer.data["beta/R1.0"] == ["gamma/R1.0", "base/" + epics_site.epics_version]
+    assert set(analyzer.unresolved["module"]) == {"base/" + epics_site.epics_version, "omega/R1.0", "gamma/R9.9"}
+    assert set(analyzer.unresolved["package"]) == {"python/3.6"}
+
+
+def test_resolve_waits_for_base_in_modules_directory(epics_site):
+    # Some sites build base in the modules directory, in which case the modules depending on it wait for it
+    epics_site.add_module("alpha/R1.0")
+    epics_site.add_module("base/" + epics_site.epics_version, base=False)
+    epics_site.add_module("zeta/R1.0")
+    analyzer = BuildAnalyzer(epics_site.epics_version, epics_site_top=epics_site.top)
+
+    events = _discover_and_resolve(analyzer)
+    base_discovery = events.index(("discovered", "base/" + epics_site.epics_version))
+    for module_id in ("alpha/R1.0", "zeta/R1.0"):
+        assert events.index(("resolved", module_id)) > base_discovery
+    assert not analyzer.unresolved["module"]
+
+
+def test_select_modules_keeps_invalid_version_tags(epics_site):
+    epics_site.add_module("alpha/R1.0")
+    epics_site.add_module("alpha/R2.0")
+    epics_site.add_module("alpha/master")
+    epics_site.add_module("beta/R1.0", modules=["alpha/R1.0"])
+    analyzer = BuildAnalyzer(epics_site.epics_version, epics_site_top=epics_site.top)
+    analyzer.discover()
+
+    selected = analyzer.select_modules(latest=1)
+    assert "alpha/master" in selected
+    assert "alpha/R2.0" in selected
+    # Only kept as a dependency of the newest beta version
+    assert "alpha/R1.0" in selected
+    assert set(analyzer.select_modules(since_version="R2.0")) == {"alpha/R2.0", "alpha/master"}
@@ -0,0 +1,34 @@
+import os
+import gzip
+
+import pytest
+
+from epics_build_analysis_launcher.dependency_writer import ModuleDependencyWriter
+
+
+def test_entries_are_sorted_across_spilled_runs(tmp_path):
+    filename = str(tmp_path / "module_dependencies.txt.gz")
+    with ModuleDependencyWriter(filename, compress=True, max_buffered_entries=2) as writer:
+        for module in ("delta/R1.0", "alpha/R1.0", "charlie/R1.0", "bravo/R1.0", "echo/R1.0"):
+            writer.write(module, [])
+    with gzip.open(filename, 'rt') as output_file:
+        modules = [line[:-2] for line in output_file if line.endswith(":\n")]
+    assert modules == ["alpha/R1.0", "bravo/R1.0", "charlie/R1.0", "delta/R1.0", "echo/R1.0"]
+
+
+def test_failed_run_keeps_previous_output(tmp_path):
+    filename = str(tmp_path / "module_dependencies.txt")
+    with ModuleDependencyWriter(filename) as writer:
+        writer.write("alpha/R1.0", ["base/R7.0.3.1-1.0"])
+    with open(filename) as output_file:
+        previous_output = output_file.read()
+
+    with pytest.raises(RuntimeError):
+        with ModuleDependencyWriter(filename, max_buffered_entries=1) as writer:
+            writer.write("alpha/R1.0", [])
+            writer.write("bravo/R1.0", [])
+            raise RuntimeError("dot failed")
+
+    with open(filename) as output_file:
+        assert output_file.read() == previous_output
+    assert os.listdir(str(tmp_path)) == ["module_dependencies.txt"]
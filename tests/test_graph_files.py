@@ -0,0 +1,30 @@
+from collections import OrderedDict
+
+import pytest
+
+from epics_build_analysis_launcher.binary_graph import BinaryGraph, write_binary_graph
+from epics_build_analysis_launcher.sqlite_export import export_sqlite, load_sqlite
+
+DATA = OrderedDict([
+    ("asyn/R4.31-0.1.0", ["base/R7.0.3.1-1.0"]),
+    ("busy/R1.6-0.2.0", ["asyn/R4.31-0.1.0"]),
+    ("base/R7.0.3.1-1.0", []),
+])
+
+
+@pytest.mark.parametrize("transitive_reduction", [False, True])
+def test_sqlite_records_transitive_reduction(tmp_path, transitive_reduction):
+    db_filename = str(tmp_path / "dependencies.sqlite")
+    export_sqlite(db_filename, DATA, {}, "R7.0.3.1-1.0", transitive_reduction=transitive_reduction)
+    data, reduced = load_sqlite(db_filename)
+    assert reduced is transitive_reduction
+    assert sorted(data.items()) == sorted(DATA.items())
+
+
+@pytest.mark.parametrize("transitive_reduction", [False, True])
+def test_binary_graph_records_transitive_reduction(tmp_path, transitive_reduction):
+    filename = str(tmp_path / "dependencies.csr")
+    write_binary_graph(filename, DATA, transitive_reduction=transitive_reduction)
+    with BinaryGraph(filename) as binary_graph:
+        assert binary_graph.transitive_reduction is transitive_reduction
+        assert dict(binary_graph.to_dict()) == dict(DATA)
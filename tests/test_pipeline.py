@@ -0,0 +1,49 @@
+import threading
+
+import pytest
+
+from epics_build_analysis_launcher.pipeline import Pipeline
+
+
+def test_stages_keep_order():
+    pipeline = Pipeline(range(100), queue_size=4)
+    pipeline.add_stage("double", lambda items: (item * 2 for item in items))
+    pipeline.add_stage("increment", lambda items: (item + 1 for item in items))
+    assert list(pipeline) == [item * 2 + 1 for item in range(100)]
+
+
+def test_stage_error_is_raised_in_calling_thread():
+    def fail(items):
+        for item in items:
+            if item == 50:
+                raise ValueError("stage failed")
+            yield item
+
+    pipeline = Pipeline(range(1000), queue_size=4).add_stage("fail", fail).add_stage("copy", lambda items: items)
+    with pytest.raises(ValueError, match="stage failed"):
+        list(pipeline)
+
+
+def test_source_error_is_raised_in_calling_thread():
+    def source():
+        yield 1
+        raise IOError("listing failed")
+
+    with pytest.raises(IOError, match="listing failed"):
+        list(Pipeline(source()).add_stage("copy", lambda items: items))
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_dead_stage_thread_stops_pipeline():
+    # A thread failing before running its stage, as when a second profiler cannot be enabled in it, never ends its
+    # queue
+    def fail_thread_start(frame, event, arg):
+        threading.setprofile(None)
+        raise ValueError("Another profiling tool is already active")
+
+    threading.setprofile(fail_thread_start)
+    try:
+        with pytest.raises(RuntimeError, match="pipeline thread stopped"):
+            list(Pipeline(range(10)).add_stage("copy", lambda items: items))
+    finally:
+        threading.setprofile(None)
@@ -0,0 +1,134 @@
+import os
+
+import pytest
+
+from epics_build_analysis_launcher import build_analyzer
+from epics_build_analysis_launcher import main
+from epics_build_analysis_launcher.build_analyzer import BuildAnalyzer
+from epics_build_analysis_launcher.graph_query import DependencyGraph
+
+
+def _analyze(epics_site):
+    analyzer = BuildAnalyzer(epics_site.epics_version, epics_site_top=epics_site.top, track_changes=True)
+    analyzer.discover()
+    analyzer.resolve_all()
+    analyzer.get_dependency_graph()
+    return analyzer
+
+
+def _assert_same_as_fresh_analysis(analyzer, epics_site):
+    # The patched analysis must be the one of the changed build, analyzed from scratch
+    fresh = _analyze(epics_site)
+    assert dict(analyzer.data) == dict(fresh.data)
+    assert list(analyzer.data) == list(fresh.data)
+    assert analyzer.unresolved == fresh.unresolved
+
+    graph, fresh_graph = analyzer.get_dependency_graph(), DependencyGraph(fresh.data)
+    assert graph.successors == fresh_graph.successors
+    assert dict((node, sorted(nodes)) for node, nodes in graph.predecessors.items()) == \
+        dict((node, sorted(nodes)) for node, nodes in fresh_graph.predecessors.items())
+    assert dict((name, sorted(nodes)) for name, nodes in graph.versions.items()) == \
+        dict((name, sorted(nodes)) for name, nodes in fresh_graph.versions.items())
+    assert graph.search("") == fresh_graph.search("")
+
+
+def test_added_module_satisfies_unresolved_dependency(epics_site):
+    epics_site.add_module("alpha/R1.0", modules=["beta/R1.0"])
+    epics_site.add_module("gamma/R1.0")
+    analyzer = _analyze(epics_site)
+    assert "beta/R1.0" in analyzer.unresolved["module"]
+
+    epics_site.add_module("beta/R1.0", modules=["gamma/R1.0"])
+    added_ids, removed_ids, changed_ids = analyzer.poll()
+    assert (added_ids, removed_ids, changed_ids) == (["beta/R1.0"], [], [])
+
+    resolved_ids = analyzer.update(added_ids)
+    assert resolved_ids == ["alpha/R1.0", "beta/R1.0"]
+    assert analyzer.data["alpha/R1.0"] == ["beta/R1.0", "base/" + epics_site.epics_version]
+    assert "beta/R1.0" not in analyzer.unresolved["module"]
+    assert analyzer.dependents("gamma/R1.0") == ["alpha/R1.0", "beta/R1.0"]
+    _assert_same_as_fresh_analysis(analyzer, epics_site)
+
+
+def test_changed_release_file(epics_site):
+    epics_site.add_module("alpha/R1.0", modules=["beta/R1.0"])
+    epics_site.add_module("beta/R1.0")
+    epics_site.add_module("beta/R2.0", modules=["gamma/R1.0"])
+    epics_site.add_module("gamma/R1.0")
+    epics_site.add_module("delta/R1.0", modules=["alpha/R1.0"])
+    analyzer = _analyze(epics_site)
+
+    epics_site.add_module("alpha/R1.0", modules=["beta/R2.0"])
+    added_ids, removed_ids, changed_ids = analyzer.poll()
+    assert (added_ids, removed_ids, changed_ids) == ([], [], ["alpha/R1.0"])
+
+    # Only the changed module version, and the ones depending on it, are resolved again
+    assert analyzer.update(changed_ids) == ["alpha/R1.0", "delta/R1.0"]
+    assert analyzer.data["alpha/R1.0"] == ["beta/R2.0", "base/" + epics_site.epics_version]
+    assert analyzer.closure("delta/R1.0") == ["alpha/R1.0", "base/" + epics_site.epics_version, "beta/R2.0",
+                                              "gamma/R1.0"]
+    assert analyzer.dependents("beta/R1.0") == []
+    _assert_same_as_fresh_analysis(analyzer, epics_site)
+
+
+def test_removed_module(epics_site):
+    epics_site.add_module("alpha/R1.0", modules=["beta/R1.0"])
+    epics_site.add_module("beta/R1.0")
+    epics_site.add_module("gamma/R1.0", modules=["delta/R1.0"])
+    epics_site.add_module("delta/R1.0")
+    epics_site.add_module("delta/R2.0")
+    analyzer = _analyze(epics_site)
+
+    epics_site.remove_module("beta/R1.0")
+    epics_site.remove_module("delta/R1.0")
+    added_ids, removed_ids, changed_ids = analyzer.poll()
+    assert (added_ids, removed_ids, changed_ids) == ([], ["beta/R1.0", "delta/R1.0"], [])
+
+    assert analyzer.update(removed_ids) == ["alpha/R1.0", "gamma/R1.0"]
+    assert "beta/R1.0" not in analyzer.data
+    assert analyzer.unresolved["module"]["beta/R1.0"] == {"alpha/R1.0"}
+    assert analyzer.unresolved["module"]["delta/R1.0"] == {"gamma/R1.0"}
+    assert analyzer.get_dependency_graph().versions["beta"] == ["beta/R1.0"]
+    _assert_same_as_fresh_analysis(analyzer, epics_site)
+
+
+def test_poll_retries_a_failed_listing(epics_site, monkeypatch):
+    epics_site.add_module("alpha/R1.0")
+    analyzer = _analyze(epics_site)
+
+    # E.g. a module directory removed between the reading of its modification time and its listing
+    epics_site.add_module("beta/R1.0")
+    monkeypatch.setattr(build_analyzer, "_list_directories", lambda path: None)
+    assert analyzer.poll() == ([], [], [])
+    monkeypatch.undo()
+    assert analyzer.poll() == (["beta/R1.0"], [], [])
+
+
+def test_watch_survives_a_failed_poll(epics_site, tmp_path, monkeypatch):
+    epics_site.add_module("alpha/R1.0")
+    analyzer = _analyze(epics_site)
+    epics_site.add_module("beta/R1.0", modules=["alpha/R1.0"])
+
+    poll = analyzer.poll
+    polls = []
+
+    def failing_poll():
+        polls.append(None)
+        if len(polls) == 1:
+            raise OSError("AFS is unavailable")
+        return poll()
+
+    def sleep(seconds):
+        # Stop watching after the third poll
+        if len(polls) == 3:
+            raise KeyboardInterrupt()
+
+    monkeypatch.setattr(analyzer, "poll", failing_poll)
+    monkeypatch.setattr(main.time, "sleep", sleep)
+    module_dependency_filename = str(tmp_path / "module_dependencies.txt")
+    main._watch_module_dependencies(analyzer, 1, module_dependency_filename, render_graphs=False)
+
+    assert len(polls) == 3
+    assert "beta/R1.0" in analyzer.data
+    with open(module_dependency_filename) as module_dependency_file:
+        assert "beta/R1.0" in module_dependency_file.read()